@@ -6,6 +6,7 @@ import json
 # Dodamo root direktorij projekta u sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config.config import AGENT_CONFIGS
+from utils.context_compressor_agent import build_agent_context
 
 async def handle(request, previous_messages=None):
     try:
@@ -32,26 +33,26 @@ async def handle(request, previous_messages=None):
         # Inicijalizacija OpenAI klijenta
         client = OpenAI(api_key=api_key)
         
-        # Priprema poruka za API poziv
-        messages = [
-            {"role": "system", "content": config.get("system_prompt", "You are a programming and coding assistant. You help user write, understand, and debug code.")}
-        ]
-        
-        # Dodaj prethodne poruke ako postoje
-        if previous_messages:
-            # Formatiramo poruke iz sesije u format pogodan za API
-            for prev_msg in previous_messages:
-                if "agent" in prev_msg and prev_msg["agent"] == "code":
-                    if "message" in prev_msg:
-                        messages.append({"role": "user", "content": prev_msg["message"]})
-                    if "response" in prev_msg and "response" in prev_msg["response"]:
-                        messages.append({"role": "assistant", "content": prev_msg["response"]["response"]})
-        
-        # Dodaj trenutnu poruku
+        # Provjeri je li request rječnik ili objekt
         if isinstance(request, dict):
-            messages.append({"role": "user", "content": request["message"]})
+            message_content = request["message"]
+            context_summary = request.get("context_summary", "")
         else:
-            messages.append({"role": "user", "content": request.message})
+            message_content = request.message
+            context_summary = getattr(request, "context_summary", "")
+        
+        # Priprema poruka za API poziv: najnovija historija code agenta unutar
+        # budžeta tokena, a starije poruke zamjenjuje sažetak sesije
+        messages = build_agent_context(
+            "code",
+            config.get("system_prompt", "You are a programming and coding assistant. You help user write, understand, and debug code."),
+            message_content,
+            previous_messages,
+            model=config.get("model", "gpt-4"),
+            max_response_tokens=config.get("max_tokens", 1500),
+            history_tokens=config.get("history_tokens"),
+            session_summary=context_summary
+        )
         
         # Kreiranje odgovora
         response = client.chat.completions.create(
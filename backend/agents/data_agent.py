@@ -5,6 +5,7 @@ from openai import OpenAI
 # Dodamo root direktorij projekta u sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config.config import AGENT_CONFIGS
+from utils.context_compressor_agent import build_agent_context
 
 async def handle(request, previous_messages=None):
     try:
@@ -16,23 +17,23 @@ async def handle(request, previous_messages=None):
         # Provjeri je li request rječnik ili objekt
         if isinstance(request, dict):
             message_content = request["message"]
+            context_summary = request.get("context_summary", "")
         else:
             message_content = request.message
+            context_summary = getattr(request, "context_summary", "")
         
-        # Dodaj prethodne poruke ako postoje
-        messages = [{"role": "system", "content": cfg["system_prompt"]}]
-        
-        if previous_messages:
-            # Formatiramo poruke iz sesije u format pogodan za API
-            for prev_msg in previous_messages:
-                if "agent" in prev_msg and prev_msg["agent"] == "data":
-                    if "message" in prev_msg:
-                        messages.append({"role": "user", "content": prev_msg["message"]})
-                    if "response" in prev_msg and "response" in prev_msg["response"]:
-                        messages.append({"role": "assistant", "content": prev_msg["response"]["response"]})
-        
-        # Dodaj trenutnu poruku
-        messages.append({"role": "user", "content": message_content})
+        # Najnovija historija data agenta unutar budžeta tokena; starije
+        # poruke zamjenjuje sažetak sesije
+        messages = build_agent_context(
+            "data",
+            cfg["system_prompt"],
+            message_content,
+            previous_messages,
+            model=cfg["model"],
+            max_response_tokens=cfg["max_tokens"],
+            history_tokens=cfg.get("history_tokens"),
+            session_summary=context_summary
+        )
         
         res = client.chat.completions.create(
             model=cfg["model"],
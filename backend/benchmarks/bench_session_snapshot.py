@@ -0,0 +1,94 @@
+"""
+Benchmark snapshota sesija: JSON s indent=2 (stari format) naspram binarnog
+snapshota s komprimiranim zapisima (utils.session_snapshot).
+
+Mjeri zauzeće diska i vrijeme učitavanja svih sesija.
+
+Pokretanje (iz backend direktorija):
+    python benchmarks/bench_session_snapshot.py [broj_sesija] [poruka_po_sesiji]
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+
+# Dodamo backend direktorij u sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.session_snapshot import SNAPSHOT_CODEC, CODEC_ZSTD, write_snapshot, read_snapshot
+
+WORDS = ["agent", "sesija", "poruka", "kod", "funkcija", "greška", "model", "token",
+         "def", "return", "import", "class", "self", "print", "lista", "rječnik"]
+
+def make_session(messages: int, rnd: random.Random) -> dict:
+    """Generira sesiju u obliku koji sprema MemoryManager."""
+    agents = ["code", "data", "debugger", "executor"]
+    return {
+        "messages": [
+            {
+                "agent": rnd.choice(agents),
+                "message": " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(10, 60))),
+                "response": {"response": " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(50, 400)))},
+                "timestamp": f"2025-01-01T12:00:{i % 60:02d}"
+            }
+            for i in range(messages)
+        ],
+        "created_at": "2025-01-01T12:00:00",
+        "agents_used": agents,
+        "summary": "Nova sesija započeta.",
+        "next_seq": messages,
+        "summary_watermark": 0,
+        "summary_tiers": []
+    }
+
+def directory_size(directory: str) -> int:
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+def timed_load(paths: list, load) -> float:
+    start = time.perf_counter()
+    for path in paths:
+        load(path)
+    return time.perf_counter() - start
+
+def load_json(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def run(sessions: int = 200, messages: int = 100) -> None:
+    rnd = random.Random(42)
+    json_dir = tempfile.mkdtemp(prefix="bench_json_")
+    snap_dir = tempfile.mkdtemp(prefix="bench_snap_")
+    try:
+        json_paths, snap_paths = [], []
+        for i in range(sessions):
+            session_data = make_session(messages, rnd)
+            json_path = os.path.join(json_dir, f"session-{i}.json")
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(session_data, f, ensure_ascii=False, indent=2)
+            json_paths.append(json_path)
+
+            snap_path = os.path.join(snap_dir, f"session-{i}.snap")
+            write_snapshot(snap_path, session_data)
+            snap_paths.append(snap_path)
+
+        # Provjera da snapshot vraća iste podatke
+        assert read_snapshot(snap_paths[0]) == load_json(json_paths[0])
+
+        json_size, snap_size = directory_size(json_dir), directory_size(snap_dir)
+        json_time = timed_load(json_paths, load_json)
+        snap_time = timed_load(snap_paths, read_snapshot)
+
+        codec = "zstd" if SNAPSHOT_CODEC == CODEC_ZSTD else "zlib"
+        print(f"Sesija: {sessions}, poruka po sesiji: {messages}, codec: {codec}")
+        print(f"JSON (indent=2): {json_size:>12,} B  učitavanje {json_time:.3f}s")
+        print(f"Snapshot:        {snap_size:>12,} B  učitavanje {snap_time:.3f}s")
+        print(f"Omjer veličine: {json_size / snap_size:.1f}x, omjer vremena: {json_time / snap_time:.2f}x")
+    finally:
+        shutil.rmtree(json_dir, ignore_errors=True)
+        shutil.rmtree(snap_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 100)
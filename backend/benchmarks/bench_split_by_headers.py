@@ -0,0 +1,73 @@
+"""
+Benchmark split_by_headers: linearni splitter naspram stare implementacije
+koja za svaki naslov ponovno prolazi kroz sve naslove (O(h²)).
+
+Pokretanje (iz backend direktorija):
+    python benchmarks/bench_split_by_headers.py [broj_naslova]
+"""
+import os
+import re
+import sys
+import time
+
+# Dodamo backend direktorij u sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.chunker import split_by_headers
+
+# Stara implementacija se mjeri samo do ovog broja naslova jer je kvadratna
+LEGACY_MAX_HEADERS = 5000
+
+def legacy_split_by_headers(text: str) -> list:
+    """Stara implementacija split_by_headers, zadržana samo za usporedbu."""
+    matches = list(re.finditer(r'(?:^|\n)(#{1,6} .+)(?:\n|$)', text))
+    if not matches:
+        return [text]
+
+    sections = []
+    start_pos = 0
+    for match in matches:
+        if match.start() > start_pos and start_pos == 0:
+            sections.append(text[start_pos:match.start()])
+        header_end = match.end()
+        next_header_start = None
+        for m in matches:
+            if m.start() > header_end:
+                next_header_start = m.start()
+                break
+        if next_header_start is None:
+            next_header_start = len(text)
+        sections.append(text[match.start():next_header_start])
+        start_pos = next_header_start
+    return [s.strip() for s in sections if s.strip()]
+
+def make_document(headers: int) -> str:
+    """Generira Markdown dokument s zadanim brojem naslova."""
+    parts = ["Uvodni tekst dokumenta.\n"]
+    for i in range(headers):
+        parts.append(f"{'#' * (i % 3 + 1)} Naslov {i}\nTekst sekcije {i}. Još malo teksta.\n")
+        if i % 100 == 0:
+            parts.append("```python\n# komentar, ne naslov\nprint('x')\n```\n")
+    return "\n".join(parts)
+
+def timed(func, text: str):
+    start = time.perf_counter()
+    result = func(text)
+    return result, time.perf_counter() - start
+
+def run(headers: int = 50000) -> None:
+    text = make_document(headers)
+    sections, elapsed = timed(split_by_headers, text)
+    print(f"Naslova: {headers}, znakova: {len(text):,}")
+    print(f"split_by_headers:        {elapsed:.3f}s  ({len(sections)} sekcija)")
+
+    # Stara implementacija na manjim dokumentima pokazuje kvadratni rast
+    size = 1000
+    while size <= min(headers, LEGACY_MAX_HEADERS):
+        small = make_document(size)
+        _, new_time = timed(split_by_headers, small)
+        _, legacy_time = timed(legacy_split_by_headers, small)
+        print(f"{size:>6} naslova: novi {new_time:.4f}s, stari {legacy_time:.4f}s")
+        size *= 2
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -0,0 +1,55 @@
+"""
+Benchmark brojanja tokena: pojedinačni pozivi naspram count_tokens_batch.
+
+Pokretanje (iz backend direktorija):
+    python benchmarks/bench_token_counter.py [broj_poruka]
+"""
+import os
+import sys
+import time
+import random
+
+# Dodamo backend direktorij u sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.token_counter import num_tokens_from_string, count_tokens_batch, clear_token_cache, get_encoder
+
+WORDS = ["agent", "sesija", "poruka", "kod", "funkcija", "greška", "model", "token",
+         "def", "return", "import", "class", "self", "print", "lista", "rječnik"]
+
+def make_messages(n: int, seed: int = 42) -> list:
+    """Generira n poruka nasumične dužine."""
+    rnd = random.Random(seed)
+    return [
+        f"user: {' '.join(rnd.choice(WORDS) for _ in range(rnd.randint(20, 200)))} #{i}"
+        for i in range(n)
+    ]
+
+def run(n: int = 10000) -> None:
+    messages = make_messages(n)
+    # Učitavanje enkodera ne ulazi u mjerenje
+    get_encoder("gpt-4o")
+
+    clear_token_cache()
+    start = time.perf_counter()
+    single = [num_tokens_from_string(m, "gpt-4o") for m in messages]
+    single_time = time.perf_counter() - start
+
+    clear_token_cache()
+    start = time.perf_counter()
+    batch = count_tokens_batch(messages, "gpt-4o")
+    batch_time = time.perf_counter() - start
+
+    # Drugi batch poziv ide u potpunosti iz keša
+    start = time.perf_counter()
+    count_tokens_batch(messages, "gpt-4o")
+    cached_time = time.perf_counter() - start
+
+    assert single == batch, "Batch i pojedinačno brojanje se ne slažu"
+
+    print(f"Poruka: {n}, ukupno tokena: {sum(batch)}")
+    print(f"Pojedinačno:   {single_time:.3f}s  ({n / single_time:,.0f} poruka/s)")
+    print(f"Batch:         {batch_time:.3f}s  ({n / batch_time:,.0f} poruka/s)")
+    print(f"Batch (keš):   {cached_time:.3f}s  ({n / cached_time:,.0f} poruka/s)")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -7,6 +7,7 @@ import shutil
 from pathlib import Path
 
 from utils.mcp_connector import get_mcp_connector
+from utils.chunker import iter_chunks
 
 router = APIRouter(prefix="/api/anthropic", tags=["anthropic"])
 
@@ -132,10 +133,13 @@ async def get_session_history(session_id: str, limit: Optional[int] = None):
 async def upload_file(
     file: UploadFile = File(...),
     session_id: Optional[str] = Form(None),
-    model: Optional[str] = Form(None)
+    model: Optional[str] = Form(None),
+    max_tokens_per_chunk: Optional[int] = Form(None)
 ):
     """
     Omogućuje upload fajla za obradu pomoću Anthropic modela.
+    Ako je zadan max_tokens_per_chunk, spremljeni fajl se chunkira streamingom
+    i u odgovoru se vraćaju metapodaci chunkova.
     """
     mcp_connector = get_mcp_connector()
     anthropic_server = mcp_connector.get_server("Anthropic")
@@ -161,6 +165,22 @@ async def upload_file(
     finally:
         file.file.close()
     
+    # Chunkiraj fajl bez učitavanja cijelog sadržaja u memoriju
+    chunks_info = None
+    if max_tokens_per_chunk:
+        try:
+            with file_path.open("rb") as f:
+                chunks_info = [
+                    {
+                        "chunk_id": chunk.chunk_id,
+                        "token_count": chunk.token_count,
+                        "metadata": chunk.metadata
+                    }
+                    for chunk in iter_chunks(f, max_tokens_per_chunk, model or "gpt-4o")
+                ]
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Greška pri chunkiranju fajla: {str(e)}")
+    
     # Obradi fajl sa modelom ako je potrebno
     try:
         if anthropic_server.can_process_file():
@@ -174,7 +194,8 @@ async def upload_file(
                 "success": True,
                 "file_id": unique_filename,
                 "original_filename": file.filename,
-                "result": result
+                "result": result,
+                "chunks": chunks_info
             }
         else:
             # Ako server ne može obraditi fajl, samo vrati informacije o uploadu
@@ -182,7 +203,8 @@ async def upload_file(
                 "success": True,
                 "file_id": unique_filename,
                 "original_filename": file.filename,
-                "message": "Fajl je uspješno uploadovan, ali server ne podržava direktnu obradu fajlova."
+                "message": "Fajl je uspješno uploadovan, ali server ne podržava direktnu obradu fajlova.",
+                "chunks": chunks_info
             }
     except Exception as e:
         # Ukloni fajl u slučaju greške
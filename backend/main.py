@@ -1,7 +1,7 @@
 import uuid
 import sys
 import os
-from fastapi import FastAPI, Depends, HTTPException, Body
+from fastapi import FastAPI, Depends, HTTPException, Body, Query
 from fastapi.middleware.cors import CORSMiddleware
 import openai
 from openai import OpenAI
@@ -27,7 +27,10 @@ from agents.data_agent import handle as data_agent
 from agents.debugger_agent import handle as debugger_agent
 from agents.mcp_router_agent import handle as mcp_router_agent
 # Uvezi utils module
-from utils.session_store import save_to_session, get_session, session_memory
+from utils.session_store import save_to_session, get_session, get_session_history, delete_session as delete_chat_session, list_sessions_page as list_chat_sessions_page
+from utils.session_order import SESSIONS_PAGE_SIZE, SESSIONS_PAGE_MAX
+from utils.session_cache import get_session_cache_stats
+from utils.memory_manager import memory_manager, CHAT_SESSION_SUMMARY
 # Izmjeni na direktni import
 from endpoints.anthropic_endpoints import router as anthropic_router
 from endpoints.openai_endpoints import router as openai_router
@@ -112,6 +115,11 @@ class ChatRequestExtended(ChatRequest):
     mcp_server: Optional[str] = "anthropic"
     auto_model_selection: Optional[bool] = False
 
+@app.on_event("shutdown")
+async def shutdown_memory():
+    # Sažetci i odgođeni upisi sesija moraju završiti na disku prije izlaska
+    memory_manager.close()
+
 @app.post("/chat")
 async def chat_endpoint(request: ChatRequestExtended):
     # Koristi postojeći session_id iz zahtjeva ili generiraj novi
@@ -121,14 +129,16 @@ async def chat_endpoint(request: ChatRequestExtended):
     if request.agent not in agent_map:
         raise HTTPException(status_code=400, detail=f"Agent '{request.agent}' nije podržan")
     
-    # Dobavi prethodne poruke sesije za kontekst
-    previous_messages = []
-    if session_id in session_memory:
-        previous_messages = session_memory[session_id]
+    # Dobavi prethodne poruke sesije za kontekst (lijeni pogled; agenti čitaju samo što im treba)
+    previous_messages = get_session_history(session_id)
     
     # Kreiraj kopiju zahtjeva za daljnju obradu
     request_dict = request.dict()
     
+    # Sažetak starijih poruka sesije zamjenjuje historiju koja ne stane u budžet agenta;
+    # bez njega agent sam sažima izostavljene poruke (build_agent_context)
+    request_dict["context_summary"] = memory_manager.get_context_summary(session_id) if CHAT_SESSION_SUMMARY else ""
+    
     # Rukovanje s modelom "default" - zamijeni s realnim modelom
     if request_dict.get("model") == "default":
         # Umjesto korištenja AGENT_CONFIGS, postavimo direktno gpt-4o
@@ -175,7 +185,10 @@ async def chat_endpoint(request: ChatRequestExtended):
                 mcp_server=request.mcp_server,
                 auto_model_selection=False  # Isključimo auto_model_selection jer smo već odabrali model
             )
-            code_response = await code_agent(code_request.dict(), previous_messages)
+            code_response = await code_agent(
+                {**code_request.dict(), "context_summary": request_dict["context_summary"]},
+                previous_messages
+            )
             
             # Dodamo i originalni odgovor za kontekst
             response["executor_response"] = response["response"]
@@ -188,6 +201,10 @@ async def chat_endpoint(request: ChatRequestExtended):
     # Sačuvaj rezultat u memoriju sesije
     save_to_session(session_id, request.agent, request.message, response)
     
+    # Memory manager održava sažetak sesije u pozadini (za sljedeće zahtjeve), samo ako je uključen
+    if CHAT_SESSION_SUMMARY:
+        memory_manager.save_to_session(session_id, request.agent, request.message, response)
+    
     # Ako je bio automatski odabir modela, dodajmo tu informaciju u odgovor
     if request.auto_model_selection and request.model == "default":
         response["selected_model"] = request_dict.get("model", "default")
@@ -371,9 +388,27 @@ async def execute_code(request: CodeExecutionRequest):
     return result
 
 @app.get("/sessions")
-async def list_sessions():
-    # Pristup direktno session_memory dictionary-ju umjesto get_session funkciji
-    return {"sessions": list(session_memory.keys())}
+async def list_sessions(
+    limit: int = Query(SESSIONS_PAGE_SIZE, ge=1, le=SESSIONS_PAGE_MAX),
+    after: Optional[str] = None
+):
+    # Stranica sesija (novije prvo) iz sortiranog indeksa store-a sesija;
+    # "next" je kursor za parametar after sljedeće stranice
+    try:
+        sessions, next_cursor = list_chat_sessions_page(limit, after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"sessions": sessions, "next": next_cursor}
+
+@app.delete("/sessions/{session_id}")
+async def delete_session_by_id(session_id: str):
+    # Sesija se briše iz store-a sesija (i njegovog sortiranog indeksa za listanje)
+    # i iz memory managera, koji za istu sesiju čuva poruke i sažetak
+    deleted_chat = delete_chat_session(session_id)
+    deleted_memory = memory_manager.delete_session(session_id)
+    if not (deleted_chat or deleted_memory):
+        raise HTTPException(status_code=404, detail=f"Session sa ID {session_id} nije pronađen")
+    return {"deleted": session_id}
 
 @app.get("/session/{session_id}")
 async def get_session_by_id(session_id: str):
@@ -382,6 +417,11 @@ async def get_session_by_id(session_id: str):
         raise HTTPException(status_code=404, detail=f"Session sa ID {session_id} nije pronađen")
     return session
 
+@app.get("/stats/session-cache")
+async def session_cache_stats():
+    # Pogodci, promašaji i izbacivanja keša sesija za dimenzioniranje workera
+    return get_session_cache_stats()
+
 @app.get("/")
 def read_root():
     return {"message": "AI Agent Platform API", "version": "0.1.0"}
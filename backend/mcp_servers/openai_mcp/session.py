@@ -3,9 +3,12 @@ import json
 import hashlib
 from typing import Dict, Any, Optional, List, Tuple
 
+from utils.session_cache import SessionCache
+
 class SessionManager:
     def __init__(self, cache_enabled: bool = True, cache_ttl: int = 3600):
-        self.sessions: Dict[str, Dict[str, Any]] = {}
+        # Sesije dijele budžet memorije s ostalim kešovima sesija u procesu
+        self.sessions: SessionCache = SessionCache("openai_mcp")
         self.cache: Dict[str, Tuple[float, Any]] = {}
         self.cache_enabled = cache_enabled
         self.cache_ttl = cache_ttl
@@ -32,46 +35,50 @@ class SessionManager:
     
     def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Vraća postojeću sesiju ako postoji"""
-        if session_id in self.sessions:
-            self.sessions[session_id]["last_used"] = time.time()
-            return self.sessions[session_id]
-        return None
+        with self.sessions.pinned(session_id) as session:
+            if session is not None:
+                session["last_used"] = time.time()
+            return session
     
     def add_message(self, session_id: str, role: str, content: str, additional_data: Optional[Dict[str, Any]] = None) -> None:
         """Dodaje poruku u sesiju"""
-        if session_id not in self.sessions:
-            self.create_session(session_id)
+        # Sesija je prikvačena: između dohvaćanja i promjene je drugi thread ne može
+        # izbaciti iz memorije (promjena bi završila na zastarjeloj kopiji)
+        with self.sessions.pinned(session_id) as session:
+            if session is None:
+                session = self.create_session(session_id)
             
-        message = {
-            "role": role,
-            "content": content,
-            "timestamp": time.time()
-        }
+            message = {
+                "role": role,
+                "content": content,
+                "timestamp": time.time()
+            }
         
-        if additional_data:
-            message.update(additional_data)
+            if additional_data:
+                message.update(additional_data)
             
-            # Prati korištenje tokena ako je dostupno u dodatnim podacima
-            if "usage" in additional_data:
-                usage = additional_data["usage"]
-                tokens_prompt = usage.get("prompt_tokens", 0)
-                tokens_completion = usage.get("completion_tokens", 0)
-                tokens_total = usage.get("total_tokens", 0)
+                # Prati korištenje tokena ako je dostupno u dodatnim podacima
+                if "usage" in additional_data:
+                    usage = additional_data["usage"]
+                    tokens_prompt = usage.get("prompt_tokens", 0)
+                    tokens_completion = usage.get("completion_tokens", 0)
+                    tokens_total = usage.get("total_tokens", 0)
                 
-                if session_id in self.token_usage:
-                    self.token_usage[session_id]["prompt"] += tokens_prompt
-                    self.token_usage[session_id]["completion"] += tokens_completion
-                    self.token_usage[session_id]["total"] += tokens_total
+                    if session_id in self.token_usage:
+                        self.token_usage[session_id]["prompt"] += tokens_prompt
+                        self.token_usage[session_id]["completion"] += tokens_completion
+                        self.token_usage[session_id]["total"] += tokens_total
                     
-                    # Ažuriraj token usage i u sesiji
-                    self.sessions[session_id]["token_usage"] = {
-                        "prompt": self.token_usage[session_id]["prompt"],
-                        "completion": self.token_usage[session_id]["completion"],
-                        "total": self.token_usage[session_id]["total"]
-                    }
+                        # Ažuriraj token usage i u sesiji
+                        session["token_usage"] = {
+                            "prompt": self.token_usage[session_id]["prompt"],
+                            "completion": self.token_usage[session_id]["completion"],
+                            "total": self.token_usage[session_id]["total"]
+                        }
             
-        self.sessions[session_id]["messages"].append(message)
-        self.sessions[session_id]["last_used"] = time.time()
+            session["messages"].append(message)
+            session["last_used"] = time.time()
+            self.sessions.grow(session_id, message)
     
     def get_messages(self, session_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
         """Dohvaća poruke iz sesije"""
@@ -120,9 +127,10 @@ class SessionManager:
     def cleanup_sessions(self, max_age: int = 86400) -> int:
         """Briše stare sesije koje nisu korištene određeno vrijeme"""
         current_time = time.time()
+        # Metapodaci izbačenih sesija su u memoriji, pa se sesije ne učitavaju s diska
         expired_sessions = [
-            session_id for session_id, session in self.sessions.items()
-            if current_time - session["last_used"] > max_age
+            session_id for session_id in list(self.sessions)
+            if current_time - self.sessions.info(session_id, {}).get("last_used", current_time) > max_age
         ]
         
         for session_id in expired_sessions:
@@ -0,0 +1,30 @@
+"""
+Pretvara JSON snapshote sesija MemoryManagera (<session_id>.json) u binarne
+snapshote (utils/session_snapshot.py). Journali sesija ostaju netaknuti.
+
+Skripta importa samo modul session_snapshot, ne paket utils, pa ne kreira
+globalni MemoryManager nad istim direktorijem.
+
+Pokretanje (iz backend direktorija, dok server ne radi):
+    python scripts/convert_snapshots.py [direktorij] [--keep-json]
+"""
+import os
+import sys
+
+# Dodamo utils direktorij u sys.path (bez importa paketa utils)
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "utils"))
+from session_snapshot import convert_json_snapshots
+
+def main(argv):
+    args = [arg for arg in argv if arg != "--keep-json"]
+    memory_dir = args[0] if args else os.path.join(BACKEND_DIR, "memory")
+    try:
+        count, before, after = convert_json_snapshots(memory_dir, keep_json="--keep-json" in argv)
+    except Exception as e:
+        print(f"Greška pri pretvaranju snapshota u {memory_dir}: {e}")
+        return
+    print(f"Pretvoreno {count} sesija: {before:,} B JSON -> {after:,} B snapshot")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Testovi importaju module iz backend direktorija (kao main.py i benchmarki)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,84 @@
+import io
+import time
+
+from utils.chunker import (Chunk, chunk_text_by_structure, chunk_by_sentences, chunk_by_token_windows, iter_chunks,
+                           merge_chunks)
+from utils.token_counter import num_tokens_from_string
+
+def _words(text):
+    return text.split()
+
+def test_unterminated_tail_is_kept():
+    text = "Prva rečenica. Druga rečenica? Treći dio bez interpunkcije na kraju"
+    chunks = chunk_by_sentences(text, 4, "gpt-4o")
+    assert _words(" ".join(chunk.text for chunk in chunks)) == _words(text)
+    assert chunks[-1].text.endswith("kraju")
+
+def test_unpunctuated_paragraph_is_chunked_in_linear_time():
+    text = " ".join(f"riječ{i % 97}" for i in range(20000))
+    start = time.perf_counter()
+    chunks = chunk_text_by_structure(text, 500)
+    elapsed = time.perf_counter() - start
+
+    assert chunks
+    assert _words(" ".join(chunk.text for chunk in chunks)) == _words(text)
+    assert all(num_tokens_from_string(chunk.text) <= 500 for chunk in chunks)
+    assert elapsed < 5
+
+def test_token_windows_of_empty_text():
+    assert chunk_by_token_windows("", 10) == []
+    assert chunk_by_token_windows(" \n\t ", 10) == []
+    assert chunk_text_by_structure("", 10) == []
+    assert chunk_text_by_structure(" \n\t ", 10) == []
+
+def test_repeated_content_gets_unique_ids():
+    section = "# Napomena\n\nIsti paragraf koji se ponavlja u dokumentu.\n\n"
+    text = section * 20
+    chunks = chunk_text_by_structure(text, 10)
+
+    ids = [chunk.chunk_id for chunk in chunks]
+    assert len(ids) == len(set(ids))
+    # Hash sadržaja ostaje isti za isti tekst (ključ keša)
+    assert len({chunk.content_hash for chunk in chunks}) < len(chunks)
+
+    # I drugi poziv (raspored iz keša) daje iste ID-eve
+    assert [chunk.chunk_id for chunk in chunk_text_by_structure(text, 10)] == ids
+
+def test_streamed_repeated_content_gets_unique_ids():
+    text = "Isti paragraf koji se ponavlja u dokumentu.\n\n" * 20
+    ids = [chunk.chunk_id for chunk in iter_chunks(io.StringIO(text), 10, read_size=64)]
+    assert len(ids) == 20
+    assert len(ids) == len(set(ids))
+
+def test_explicit_chunk_id_is_kept():
+    chunk = Chunk("tekst", chunk_id="moj_chunk_3")
+    assert chunk.chunk_id == "moj_chunk_3"
+    assert merge_chunks([chunk], 100, "gpt-4o")[0].chunk_id == "moj_chunk_3"
+
+class _CountingReader(io.StringIO):
+    """StringIO koji pamti koliko je znakova pročitano."""
+
+    def read(self, size=-1):
+        block = super().read(size)
+        self.consumed = self.tell()
+        return block
+
+def test_unpunctuated_stream_yields_before_end_of_input():
+    text = "".join(f"{i},vrijednost,{i * 3},oznaka_{i % 7}\n" for i in range(100000))
+    reader = _CountingReader(text)
+    chunks = iter_chunks(reader, 200, read_size=4096)
+
+    first = next(chunks)
+    assert reader.consumed < len(text) / 10
+    assert num_tokens_from_string(first.text) <= 200
+
+    start = time.perf_counter()
+    rest = list(chunks)
+    elapsed = time.perf_counter() - start
+    assert _words(" ".join(chunk.text for chunk in [first] + rest)) == _words(text)
+    assert elapsed < 10
+
+def test_stream_without_whitespace_is_cut():
+    text = "x" * 50000
+    chunks = list(iter_chunks(io.StringIO(text), 100, read_size=1024))
+    assert "".join("".join(chunk.text.split()) for chunk in chunks) == text
@@ -0,0 +1,89 @@
+import re
+
+import pytest
+
+import utils.context_compressor_agent as compressor
+from utils.summary_cache import SummaryCache
+from utils.token_counter import count_tokens_batch
+
+@pytest.fixture
+def fake_model(monkeypatch, tmp_path):
+    """Zamjenjuje poziv modela i keš sažetaka; vraća listu sažetih tekstova."""
+    calls = []
+
+    def llm_summary(text, max_tokens, previous_summary):
+        calls.append(text)
+        return f"sažetak {len(calls)}"
+
+    monkeypatch.setattr(compressor, "_llm_summary", llm_summary)
+    monkeypatch.setattr(compressor, "summary_cache", SummaryCache(str(tmp_path / "summaries.db")))
+    monkeypatch.setattr(compressor, "SUMMARY_INPUT_MAX_TOKENS", 200)
+    monkeypatch.setattr(compressor, "SUMMARY_CHUNK_TOKENS", 100)
+    return calls
+
+def test_map_reduce_falls_back_to_token_windows(fake_model, monkeypatch):
+    monkeypatch.setattr(compressor, "chunk_text_by_structure", lambda *args, **kwargs: [])
+    text = " ".join(f"riječ{i}" for i in range(1000))
+
+    summary = compressor._map_reduce_summary(text, 50, None)
+
+    assert summary.startswith("sažetak")
+    # Chunkovi se sažimaju paralelno; poredani po položaju pokrivaju cijeli tekst
+    mapped = sorted(fake_model[:-1], key=text.index)
+    assert len(mapped) > 1
+    assert "".join(mapped) == text
+
+def test_map_reduce_on_empty_input(fake_model):
+    assert compressor._map_reduce_summary("", 50, None) == ""
+    assert compressor._map_reduce_summary(" \n\n ", 50, "Stari sažetak.") == "Stari sažetak."
+    assert fake_model == []
+
+def _entry(n, agent="code"):
+    return {"agent": agent, "message": f"pitanje {n} " + "riječ " * 40,
+            "response": {"response": f"odgovor {n} " + "tekst " * 40}}
+
+def _history_tokens(messages):
+    # Isto brojanje kao budžet historije (entry_tokens): sadržaj + 4 tokena po poruci
+    history = messages[1:-1]
+    return sum(count_tokens_batch([m["content"] for m in history], "gpt-4o")) + 4 * len(history)
+
+@pytest.fixture
+def local_summary(fake_model, monkeypatch):
+    # Sažetak modela se ne zakazuje u pozadini
+    monkeypatch.setattr(compressor, "_schedule_llm_summary", lambda *args: None)
+    return fake_model
+
+def test_build_agent_context_untruncated(local_summary):
+    history = [_entry(n, agent="code" if n % 2 else "data") for n in range(6)]
+    messages = compressor.build_agent_context("code", "sustav", "novo pitanje", history,
+                                              history_tokens=10000, session_summary="Sažetak sesije.")
+
+    # Sve stane: nema sažetka, samo poruke agenta redom
+    assert messages[0] == {"role": "system", "content": "sustav"}
+    assert messages[-1] == {"role": "user", "content": "novo pitanje"}
+    assert [m["content"].split()[1] for m in messages[1:-1]] == ["1", "1", "3", "3", "5", "5"]
+    assert local_summary == []
+
+def test_build_agent_context_inserts_session_summary(local_summary):
+    history = [_entry(n) for n in range(20)]
+    messages = compressor.build_agent_context("code", "sustav", "novo pitanje", history,
+                                              history_tokens=600, session_summary="Sažetak sesije.")
+
+    assert messages[1]["role"] == "system" and "Sažetak sesije." in messages[1]["content"]
+    assert messages[-2]["content"].startswith("odgovor 19")
+    assert len(messages) < 2 + 1 + 2 * 20
+    assert _history_tokens(messages) <= 600
+
+def test_build_agent_context_summarizes_dropped_messages(local_summary):
+    history = [_entry(n) for n in range(20)]
+    messages = compressor.build_agent_context("code", "sustav", "novo pitanje", history, history_tokens=600)
+
+    # Bez sažetka sesije izostavljene poruke se sažimaju lokalno, unutar budžeta
+    summary = messages[1]
+    assert summary["role"] == "system" and summary["content"].startswith("Sažetak prethodne konverzacije")
+    kept = [int(m["content"].split()[1]) for m in messages[2:-1:2]]
+    summarized = [int(n) for n in re.findall(r"pitanje (\d+)", summary["content"])]
+    assert kept == list(range(kept[0], 20))
+    assert summarized and max(summarized) < kept[0]
+    assert _history_tokens(messages) <= 600
+    assert local_summary == []
@@ -0,0 +1,150 @@
+import json
+import os
+import threading
+
+import pytest
+
+from utils.memory_storage import FileMemoryStorage, SQLiteMemoryStorage, INDEX_FILE, JOURNAL_COMPACT_EVERY, create_memory_storage
+from utils.session_cache import SessionCache, SessionCachePool
+
+def _entry(n, agent="code"):
+    return {"agent": agent, "message": f"pitanje {n}", "response": {"response": f"odgovor {n}"}, "timestamp": "t"}
+
+@pytest.fixture
+def legacy_dir(tmp_path):
+    """Direktorij sa sesijom u starom JSON formatu, bez indeksa."""
+    session = {
+        "messages": [_entry(0), _entry(1)],
+        "created_at": "2025-01-01T12:00:00",
+        "agents_used": ["code"],
+        "summary": "Stari sažetak."
+    }
+    (tmp_path / "legacy.json").write_text(json.dumps(session), encoding="utf-8")
+    return tmp_path
+
+def test_loading_creates_no_files_until_first_write(legacy_dir):
+    storage = FileMemoryStorage(str(legacy_dir), flush_interval=3600)
+    assert storage.get_summary("legacy") == "Stari sažetak."
+    assert [s["session_id"] for s in storage.list_sessions()] == ["legacy"]
+    assert sorted(os.listdir(legacy_dir)) == ["legacy.json"]
+
+    # Sesija iz starog formata se upisuje u indeks jednom, pri prvom upisu (i pri close)
+    storage.close()
+    assert INDEX_FILE in os.listdir(legacy_dir)
+
+    reloaded = FileMemoryStorage(str(legacy_dir), flush_interval=0)
+    assert not reloaded.index.unsaved
+    assert reloaded.index.read_summary("legacy") == "Stari sažetak."
+    reloaded.append_message("nova", _entry(0), "2025-02-01T12:00:00")
+    reloaded.close()
+
+    again = FileMemoryStorage(str(legacy_dir), flush_interval=0)
+    assert not again.index.unsaved
+    assert [s["session_id"] for s in again.list_sessions()] == ["nova", "legacy"]
+    assert again.list_sessions()[1]["message_count"] == 2
+
+def test_migrated_index_is_saved_by_first_flush(legacy_dir, monkeypatch):
+    storage = FileMemoryStorage(str(legacy_dir), flush_interval=3600)
+    storage.flush()
+    assert not storage.index.unsaved
+
+    # Drugo pokretanje ne čita ponovno fajl sesije iz starog formata
+    loaded = []
+    monkeypatch.setattr(FileMemoryStorage, "_load_session", lambda self, session_id: loaded.append(session_id))
+    reloaded = FileMemoryStorage(str(legacy_dir), flush_interval=0)
+    assert loaded == []
+    assert reloaded.get_summary("legacy") == "Stari sažetak."
+    storage.close()
+
+def test_sqlite_import_leaves_files_untouched(legacy_dir):
+    storage = FileMemoryStorage(str(legacy_dir), flush_interval=0)
+    storage.append_message("nova", _entry(0), "2025-02-01T12:00:00")
+    storage.close()
+    # Fajl obrisan izvana ostaje u indeksu, a prijenos ga preskače
+    os.remove(legacy_dir / "nova.jsonl")
+    before = {name: (legacy_dir / name).read_bytes() for name in os.listdir(legacy_dir)}
+
+    sqlite = create_memory_storage("sqlite", str(legacy_dir), str(legacy_dir / "_memory.db"))
+    assert isinstance(sqlite, SQLiteMemoryStorage)
+    assert [s["session_id"] for s in sqlite.list_sessions()] == ["legacy"]
+    assert len(sqlite.get_messages("legacy")) == 2
+
+    after = {name: (legacy_dir / name).read_bytes() for name in os.listdir(legacy_dir) if not name.startswith("_memory.db")}
+    assert after == before
+    assert not [t for t in threading.enumerate() if t.name == "write-behind"]
+
+@pytest.mark.parametrize("snapshot_format, snapshot_ext", [("binary", ".snap"), ("json", ".json")])
+def test_journal_and_snapshot_reload(tmp_path, snapshot_format, snapshot_ext):
+    storage = FileMemoryStorage(str(tmp_path), snapshot_format=snapshot_format, flush_interval=0)
+    for n in range(JOURNAL_COMPACT_EVERY + 5):
+        storage.append_message("s", _entry(n), "2025-01-01T12:00:00")
+    storage.set_summary("s", "Sažetak.", keep_last=10)
+    storage.append_message("s", _entry("zadnja", agent="web"), "2025-01-01T12:00:00")
+    storage.close()
+
+    # Journal je barem jednom kompaktiran u snapshot, a novi zapisi su ponovno u journalu
+    assert (tmp_path / f"s{snapshot_ext}").exists()
+    assert (tmp_path / "s.jsonl").exists()
+
+    reloaded = FileMemoryStorage(str(tmp_path), snapshot_format=snapshot_format, flush_interval=0)
+    messages = reloaded.get_messages("s")
+    assert [m["message"] for m in messages] == [f"pitanje {n}" for n in range(45, 55)] + ["pitanje zadnja"]
+    assert reloaded.get_summary("s") == "Sažetak."
+    assert reloaded.list_sessions()[0]["agents_used"] == ["code", "web"]
+
+def test_truncated_journal_tail_is_discarded(tmp_path):
+    storage = FileMemoryStorage(str(tmp_path), flush_interval=0)
+    for n in range(3):
+        storage.append_message("s", _entry(n), "2025-01-01T12:00:00")
+    storage.close()
+
+    journal = tmp_path / "s.jsonl"
+    with open(journal, "ab") as f:
+        f.write(b'{"op": "message", "entry": {"agent"')
+
+    reloaded = FileMemoryStorage(str(tmp_path), flush_interval=0)
+    assert len(reloaded.get_messages("s")) == 3
+    reloaded.append_message("s", _entry(3), "2025-01-01T12:00:00")
+    reloaded.close()
+
+    # Novi zapis nije nastavak oštećenog reda
+    again = FileMemoryStorage(str(tmp_path), flush_interval=0)
+    assert [m["message"] for m in again.get_messages("s")][-1] == "pitanje 3"
+    assert len(again.get_messages("s")) == 4
+
+def test_eviction_during_append(tmp_path, monkeypatch):
+    storage = FileMemoryStorage(str(tmp_path), flush_interval=0)
+    pool = SessionCachePool(max_bytes=1)
+    storage.sessions = SessionCache("memory_manager", on_evict=lambda session_id, session_data: None, pool=pool)
+    other = SessionCache("other", pool=pool)
+
+    # Drugi keš u istom poolu izbacuje sesiju usred spremanja poruke
+    append_journal = storage._append_journal
+    def evicting_append_journal(session_id, record):
+        append_journal(session_id, record)
+        other[session_id] = {"messages": ["x" * 100]}
+    monkeypatch.setattr(storage, "_append_journal", evicting_append_journal)
+
+    for n in range(5):
+        assert storage.append_message("s", _entry(n), "2025-01-01T12:00:00") == n + 1
+        assert "s" not in storage.sessions
+    assert storage.list_sessions()[0]["message_count"] == 5
+    assert len(storage.get_messages("s")) == 5
+    storage.close()
+
+    reloaded = FileMemoryStorage(str(tmp_path), flush_interval=0)
+    assert reloaded.list_sessions()[0]["message_count"] == 5
+    assert len(reloaded.get_messages("s")) == 5
+
+def test_pending_records_are_visible_before_flush(tmp_path):
+    storage = FileMemoryStorage(str(tmp_path), flush_interval=3600)
+    storage.append_message("s", _entry(0), "2025-01-01T12:00:00")
+    storage.append_message("s", _entry(1), "2025-01-01T12:00:00")
+
+    # Sesija izbačena iz memorije prije upisa učitava se s diska i zapisa koji čekaju
+    storage.sessions.pop("s")
+    assert [m["message"] for m in storage.get_messages("s")] == ["pitanje 0", "pitanje 1"]
+    storage.close()
+
+    reloaded = FileMemoryStorage(str(tmp_path), flush_interval=0)
+    assert len(reloaded.get_messages("s")) == 2
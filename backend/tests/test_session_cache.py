@@ -0,0 +1,144 @@
+import os
+import sys
+import pickle
+import threading
+
+import pytest
+
+import utils.session_cache as session_cache
+from utils.session_cache import SessionCache, SessionCachePool
+from utils.session_store import InMemorySessionStore
+
+THREADS = 6
+MESSAGES = 300
+
+def _run(worker):
+    # Kratki interval prebacivanja threadova da se izbacivanje dogodi usred upisa
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        _start_all(worker)
+    finally:
+        sys.setswitchinterval(interval)
+
+def _start_all(worker):
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+@pytest.fixture
+def small_pool():
+    # Budžet manji od jedne sesije: svaki upis izbacuje (zapisuje na disk) ostale sesije
+    return SessionCachePool(max_bytes=1)
+
+def test_in_memory_store_append_survives_eviction(small_pool):
+    store = InMemorySessionStore()
+    store.sessions = SessionCache("test_session_store", pool=small_pool)
+
+    def worker(i):
+        for n in range(MESSAGES):
+            store.append(f"s{i}", {"agent": "code", "message": f"{i}-{n}", "response": {"response": "ok"}})
+
+    _run(worker)
+
+    assert small_pool.evictions > 0
+    for i in range(THREADS):
+        messages = store.get(f"s{i}")
+        assert [m["message"] for m in messages] == [f"{i}-{n}" for n in range(MESSAGES)]
+        assert len(store.sessions.get(f"s{i}")["by_agent"]["code"]) == MESSAGES
+
+@pytest.mark.parametrize("module", ["openai_mcp", "anthropic_mcp"])
+def test_mcp_add_message_survives_eviction(small_pool, module):
+    session_module = pytest.importorskip(f"mcp_servers.{module}.session")
+    manager = session_module.SessionManager()
+    manager.sessions = SessionCache(f"test_{module}", pool=small_pool)
+
+    def worker(i):
+        for n in range(MESSAGES):
+            manager.add_message(f"s{i}", "user", f"{i}-{n}")
+
+    _run(worker)
+
+    assert small_pool.evictions > 0
+    for i in range(THREADS):
+        assert [m["content"] for m in manager.get_messages(f"s{i}")] == [f"{i}-{n}" for n in range(MESSAGES)]
+
+def _session(n):
+    return {"created_at": 1.0, "last_used": 2.0, "messages": [f"poruka {i}" for i in range(n)]}
+
+@pytest.fixture
+def blocked_spill(monkeypatch):
+    """Zapisivanje izbačene sesije čeka dok test ne otvori vrata."""
+    gate = threading.Event()
+    started = threading.Event()
+    dump = pickle.dump
+
+    def slow_dump(*args, **kwargs):
+        started.set()
+        assert gate.wait(5)
+        dump(*args, **kwargs)
+
+    monkeypatch.setattr(session_cache.pickle, "dump", slow_dump)
+    return gate, started
+
+def test_spill_runs_outside_pool_lock(small_pool, blocked_spill):
+    gate, started = blocked_spill
+    cache = SessionCache("test_spill", pool=small_pool)
+    other = SessionCache("test_other", pool=SessionCachePool())
+
+    cache["a"] = _session(3)
+    writer = threading.Thread(target=cache.__setitem__, args=("b", _session(1)))
+    writer.start()
+    assert started.wait(5)
+
+    # Dok se "a" zapisuje, lock poola je slobodan i ostale sesije su dostupne
+    assert small_pool.lock.acquire(timeout=1)
+    small_pool.lock.release()
+    assert cache.get("b")["messages"] == ["poruka 0"]
+    other["x"] = _session(1)
+    assert cache.info("a") == {"created_at": 1.0, "last_used": 2.0, "message_count": 3}
+
+    # Tko treba baš "a" čeka da zapisivanje završi, a zatim je učitava
+    result = []
+    reader = threading.Thread(target=lambda: result.append(cache.get("a")))
+    reader.start()
+    reader.join(0.2)
+    assert reader.is_alive()
+    gate.set()
+    writer.join()
+    reader.join()
+    assert result == [_session(3)]
+    assert cache.stats()["reloads"] == 1
+
+def test_delete_during_spill_leaves_no_file(small_pool, blocked_spill):
+    gate, started = blocked_spill
+    cache = SessionCache("test_delete", pool=small_pool)
+
+    cache["a"] = _session(3)
+    writer = threading.Thread(target=cache.__setitem__, args=("b", _session(1)))
+    writer.start()
+    assert started.wait(5)
+    del cache["a"]
+    gate.set()
+    writer.join()
+
+    assert "a" not in cache and cache.get("a") is None
+    assert cache.info("a") is None
+    assert os.listdir(cache._spill_dir) == []
+
+def test_info_and_listing_do_not_reload_spilled_sessions(small_pool, monkeypatch):
+    store = InMemorySessionStore()
+    store.sessions = SessionCache("test_listing", pool=small_pool)
+    for i in range(5):
+        for n in range(i + 1):
+            store.append(f"s{i}", {"agent": "code", "message": f"{i}-{n}", "response": {"response": "ok"}})
+    assert store.sessions.stats()["spilled"] == 4
+
+    def no_load(*args, **kwargs):
+        raise AssertionError("izbačena sesija se ne smije učitavati")
+
+    monkeypatch.setattr(session_cache.pickle, "load", no_load)
+    page, _ = store.list_sessions_page(10)
+    assert {s["session_id"]: s["message_count"] for s in page} == {f"s{i}": i + 1 for i in range(5)}
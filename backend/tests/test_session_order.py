@@ -0,0 +1,61 @@
+import pytest
+
+from utils.session_order import SessionOrder, encode_cursor, decode_cursor
+from utils.session_store import InMemorySessionStore, SQLiteSessionStore
+
+def test_cursor_round_trip():
+    for created_at in ("2025-01-01T12:00:00", 1735732800.25, 0):
+        assert decode_cursor(encode_cursor(created_at, "sesija-ć")) == (created_at, "sesija-ć")
+
+@pytest.mark.parametrize("cursor", ["", "nije-kursor", encode_cursor("x", "y")[:-3], "W10", "WzEsMl0"])
+def test_bad_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+def test_pages_cover_all_sessions_newest_first():
+    order = SessionOrder((f"s{i}", i // 2) for i in range(25))
+    seen, after = [], None
+    while True:
+        items, after = order.page(10, after)
+        seen.extend(session_id for _, session_id in items)
+        if after is None:
+            break
+    assert seen == list(reversed(order))
+    assert len(seen) == len(set(seen)) == 25
+
+def test_page_survives_removal_of_cursor_session():
+    order = SessionOrder((f"s{i}", i) for i in range(10))
+    items, after = order.page(3)
+    order.remove(items[-1][1])
+    next_items, _ = order.page(3, after)
+    assert [session_id for _, session_id in next_items] == ["s6", "s5", "s4"]
+
+@pytest.mark.parametrize("make_store", [
+    lambda tmp_path: InMemorySessionStore(),
+    lambda tmp_path: SQLiteSessionStore(str(tmp_path / "sessions.db")),
+])
+def test_store_pages_and_delete(tmp_path, make_store):
+    store = make_store(tmp_path)
+    for i in range(7):
+        store.append(f"s{i}", {"agent": "code", "message": "m", "response": {"response": "r"}})
+
+    first, after = store.list_sessions_page(4)
+    rest, last = store.list_sessions_page(4, after)
+    assert last is None
+    ids = [s["session_id"] for s in first + rest]
+    assert sorted(ids) == sorted(f"s{i}" for i in range(7)) and len(ids) == 7
+
+    assert store.delete(ids[0])
+    page, _ = store.list_sessions_page(10)
+    assert ids[0] not in [s["session_id"] for s in page]
+
+    with pytest.raises(ValueError):
+        store.list_sessions_page(4, "nije-kursor")
+
+def test_sessions_endpoint_rejects_bad_cursor():
+    pytest.importorskip("fastapi.testclient")
+    main = pytest.importorskip("main")
+    from fastapi.testclient import TestClient
+
+    response = TestClient(main.app).get("/sessions", params={"after": "nije-kursor"})
+    assert response.status_code == 400
@@ -0,0 +1,50 @@
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+from utils.session_snapshot import write_snapshot, read_snapshot, CODEC_ZLIB, SNAPSHOT_BLOCK_MESSAGES
+
+def _entry(n, agent="code"):
+    return {"agent": agent, "message": f"pitanje {n}", "response": {"response": f"odgovor {n}"}, "timestamp": "t"}
+
+def test_snapshot_round_trip(tmp_path):
+    session = {
+        "messages": [_entry(n) for n in range(SNAPSHOT_BLOCK_MESSAGES * 2 + 3)],
+        "created_at": "2025-01-01T12:00:00",
+        "agents_used": ["code"],
+        "summary": "Sažetak čćžšđ."
+    }
+    path = str(tmp_path / "s.snap")
+    write_snapshot(path, session, codec=CODEC_ZLIB)
+    assert read_snapshot(path) == session
+
+    with open(path, "r+b") as f:
+        f.write(b"XXXX")
+    with pytest.raises(ValueError):
+        read_snapshot(path)
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts", "convert_snapshots.py")
+
+def test_convert_script_imports_only_session_snapshot(tmp_path):
+    session = {"messages": [_entry(n) for n in range(3)], "created_at": "2025-01-01T12:00:00"}
+    (tmp_path / "s.json").write_text(json.dumps(session), encoding="utf-8")
+
+    check = f"import runpy, sys; sys.argv = ['x', {str(tmp_path)!r}]; runpy.run_path({SCRIPT!r}, run_name='__main__'); " \
+            "print('utils' in sys.modules)"
+    result = subprocess.run([sys.executable, "-W", "error::RuntimeWarning", "-c", check],
+                            capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+    # Paket utils (i globalni MemoryManager) se ne importa
+    lines = result.stdout.splitlines()
+    assert lines[0].startswith("Pretvoreno 1 sesija") and lines[-1] == "False"
+    assert read_snapshot(str(tmp_path / "s.snap"))["messages"] == session["messages"]
+    assert not (tmp_path / "s.json").exists()
+
+def test_convert_script_reports_errors_without_failing(tmp_path):
+    result = subprocess.run([sys.executable, SCRIPT, str(tmp_path / "nema")], capture_output=True, text=True)
+    assert result.returncode == 0
+    assert result.stdout.startswith("Greška pri pretvaranju snapshota")
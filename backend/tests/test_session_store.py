@@ -0,0 +1,214 @@
+import json
+import sqlite3
+
+import pytest
+
+import utils.session_store as session_store
+from utils.session_store import InMemorySessionStore, SQLiteSessionStore, RedisSessionStore
+
+class FakeRedis:
+    """Redis u memoriji s naredbama koje koristi RedisSessionStore (kao fakeredis, bez ovisnosti)."""
+
+    def __init__(self):
+        self.data = {}
+
+    def ping(self):
+        return True
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+    def delete(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def rpush(self, key, value):
+        self.data.setdefault(key, []).append(value)
+        return len(self.data[key])
+
+    def lrange(self, key, start, end):
+        items = self.data.get(key, [])
+        start = max(start + len(items) if start < 0 else start, 0)
+        end = end + len(items) if end < 0 else end
+        return items[start:end + 1]
+
+    def llen(self, key):
+        return len(self.data.get(key, []))
+
+    def sadd(self, key, member):
+        members = self.data.setdefault(key, set())
+        added = member not in members
+        members.add(member)
+        return int(added)
+
+    def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    def zadd(self, key, mapping, nx=False):
+        zset = self.data.setdefault(key, {})
+        added = 0
+        for member, score in mapping.items():
+            if nx and member in zset:
+                continue
+            added += member not in zset
+            zset[member] = float(score)
+        return added
+
+    def zrem(self, key, member):
+        return int(self.data.get(key, {}).pop(member, None) is not None)
+
+    def zscore(self, key, member):
+        return self.data.get(key, {}).get(member)
+
+    def _descending(self, key):
+        # Isti score: obrnuti leksikografski redoslijed, kao u Redisu
+        return sorted(self.data.get(key, {}).items(), key=lambda item: (item[1], item[0]), reverse=True)
+
+    def zrange(self, key, start, end):
+        return [member for member, _ in reversed(self._descending(key))][start:None if end == -1 else end + 1]
+
+    def zrevrange(self, key, start, end, withscores=False):
+        items = self._descending(key)[start:None if end == -1 else end + 1]
+        return items if withscores else [member for member, _ in items]
+
+    def zrevrank(self, key, member):
+        members = [item for item, _ in self._descending(key)]
+        return members.index(member) if member in members else None
+
+    def zrevrangebyscore(self, key, max, min, start=None, num=None, withscores=False):
+        def bound(value):
+            value = str(value)
+            return (float(value[1:]), True) if value.startswith("(") else (float(value), False)
+
+        high, high_open = bound(max)
+        low, low_open = bound(min)
+        items = [
+            (member, score) for member, score in self._descending(key)
+            if (score < high or not high_open and score == high) and (score > low or not low_open and score == low)
+        ]
+        if start is not None:
+            items = items[start:start + num]
+        return items if withscores else [member for member, _ in items]
+
+class _FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+        return call
+
+    def execute(self):
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+def _entry(n, agent="code"):
+    return {"agent": agent, "message": f"pitanje {n}", "response": {"response": f"odgovor {n}"}}
+
+STORES = {
+    "memory": lambda tmp_path: InMemorySessionStore(),
+    "sqlite": lambda tmp_path: SQLiteSessionStore(str(tmp_path / "sessions.db")),
+    "redis": lambda tmp_path: RedisSessionStore(client=FakeRedis(), prefix="test:"),
+}
+
+@pytest.fixture(params=sorted(STORES))
+def store(request, tmp_path):
+    return STORES[request.param](tmp_path)
+
+def test_append_and_read(store):
+    for n in range(5):
+        store.append("s", _entry(n, agent="code" if n % 2 else "data"))
+
+    assert store.has_session("s") and "s" in store
+    assert not store.has_session("nema")
+    assert [m["message"] for m in store.get("s")] == [f"pitanje {n}" for n in range(5)]
+    assert store.count("s") == 5
+    assert [m["message"] for m in store.get_recent("s", 2)] == ["pitanje 3", "pitanje 4"]
+    assert store.list_sessions() == ["s"]
+
+def test_agent_window(store, monkeypatch):
+    # Mala stranica indeksa agenta da se čita preko više stranica
+    monkeypatch.setattr(session_store, "AGENT_HISTORY_PAGE", 2)
+    for n in range(9):
+        store.append("s", _entry(n, agent="code" if n % 3 else "data"))
+
+    window, truncated = store.get_agent_window("s", "code", max_tokens=None)
+    assert [m["message"] for m in window] == [f"pitanje {n}" for n in range(9) if n % 3]
+    assert not truncated
+
+    tokens = session_store.entry_tokens(_entry(8))
+    window, truncated = store.get_agent_window("s", "code", max_tokens=2 * tokens)
+    assert [m["message"] for m in window] == ["pitanje 7", "pitanje 8"]
+    assert truncated
+
+    history = store.get_agent_history("s", "data", max_tokens=None)
+    assert [m["role"] for m in history] == ["user", "assistant"] * 3
+
+def test_pages_continue_after_deleted_cursor_session(store, monkeypatch):
+    # Šest sesija s istim vremenom kreiranja i dvije starije
+    for session_id, created_at in [("a", 100), ("b", 100), ("c", 100), ("d", 100), ("e", 100), ("f", 100),
+                                   ("g", 50), ("h", 50)]:
+        monkeypatch.setattr(session_store.time, "time", lambda created_at=created_at: float(created_at))
+        store.append(session_id, _entry(0))
+    monkeypatch.undo()
+
+    page, after = store.list_sessions_page(2)
+    assert [s["session_id"] for s in page] == ["f", "e"]
+    assert all(s["message_count"] == 1 for s in page)
+
+    # Sesija iz kursora je obrisana: sljedeća stranica ne preskače sesije s istim vremenom
+    assert store.delete("e")
+    seen = []
+    while after is not None:
+        page, after = store.list_sessions_page(2, after)
+        seen.extend(s["session_id"] for s in page)
+    assert seen == ["d", "c", "b", "a", "h", "g"]
+
+    with pytest.raises(ValueError):
+        store.list_sessions_page(2, "nije-kursor")
+
+def test_delete(store):
+    store.append("s", _entry(0))
+    store.append("s", _entry(1, agent="data"))
+    store.append("t", _entry(0))
+
+    assert store.delete("s")
+    assert not store.delete("s")
+    assert not store.has_session("s") and store.get("s") == []
+    assert store.get_agent_window("s", "data", None) == ([], False)
+    assert store.list_sessions() == ["t"]
+
+def test_redis_delete_removes_all_keys():
+    client = FakeRedis()
+    store = RedisSessionStore(client=client, prefix="test:")
+    store.append("s", _entry(0))
+    store.append("s", _entry(1, agent="data"))
+    store.delete("s")
+    assert [key for key, value in client.data.items() if value] == []
+
+def test_sqlite_migration_stores_token_counts(tmp_path, monkeypatch):
+    # Baza iz verzije bez indeksa agenata
+    db_path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE chat_sessions (session_id TEXT PRIMARY KEY, created_at REAL NOT NULL);
+        CREATE TABLE chat_messages (id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, data TEXT NOT NULL);
+    """)
+    conn.execute("INSERT INTO chat_sessions VALUES ('s', 1.0)")
+    for n in range(3):
+        conn.execute("INSERT INTO chat_messages (session_id, data) VALUES ('s', ?)", (json.dumps(_entry(n)),))
+    conn.commit()
+    conn.close()
+
+    store = SQLiteSessionStore(db_path)
+    rows = store._conn.execute("SELECT agent, tokens FROM chat_messages ORDER BY id").fetchall()
+    assert rows == [("code", session_store.entry_tokens(_entry(n))) for n in range(3)]
+
+    # Čitanje više ne broji tokene
+    def no_count(entry):
+        raise AssertionError("broj tokena se ne smije računati pri čitanju")
+
+    monkeypatch.setattr(session_store, "entry_tokens", no_count)
+    window, _ = store.get_agent_window("s", "code", max_tokens=None)
+    assert len(window) == 3
+    SQLiteSessionStore(db_path)
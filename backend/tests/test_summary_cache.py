@@ -0,0 +1,35 @@
+import time
+
+from utils.summary_cache import SummaryCache, summary_key, prefix_keys
+
+def test_summary_key_depends_on_all_inputs():
+    key = summary_key("tekst", 100, "model")
+    assert key == summary_key("tekst", 100, "model")
+    assert key != summary_key("tekst", 200, "model")
+    assert key != summary_key("tekst", 100, "model", previous_summary="sažetak")
+
+def test_longest_cached_prefix(tmp_path):
+    cache = SummaryCache(str(tmp_path / "summaries.db"))
+    keys = prefix_keys(["a", "b", "c", "d"], 100, "model")
+    assert prefix_keys(["a", "b"], 100, "model") == keys[:2]
+
+    assert cache.get_longest(keys) is None
+    cache.set(keys[0], "sažetak a")
+    cache.set(keys[2], "sažetak abc")
+    assert cache.get_longest(keys) == (2, "sažetak abc")
+    assert cache.stats()["prefix_hits"] == 1
+
+def test_ttl_and_lru_eviction(tmp_path):
+    cache = SummaryCache(str(tmp_path / "summaries.db"), max_entries=2, ttl=3600)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    time.sleep(0.01)
+    assert cache.get("a") == "1"
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+
+    expired = SummaryCache(str(tmp_path / "expired.db"), ttl=0)
+    expired.set("a", "1")
+    time.sleep(0.01)
+    assert expired.get("a") is None
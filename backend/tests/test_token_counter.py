@@ -0,0 +1,9 @@
+from utils.token_counter import num_tokens_from_string, get_token_cache_stats, clear_token_cache
+
+def test_token_counts_are_cached():
+    clear_token_cache()
+    text = "Ovo je tekst čiji se tokeni broje samo jednom."
+    count = num_tokens_from_string(text)
+    assert num_tokens_from_string(text) == count > 0
+    stats = get_token_cache_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
@@ -2,23 +2,32 @@
 # Eksportujemo važne module za lakši import
 
 # Prvo importujemo osnovne module
-from .session_store import save_to_session, get_session, session_memory
+from .session_cache import SessionCache, session_cache_pool, get_session_cache_stats
+from .session_snapshot import write_snapshot, read_snapshot, convert_json_snapshots
+from .session_store import save_to_session, get_session, session_memory, SessionStore, create_session_store
 from .token_counter import (
     num_tokens_from_string, 
+    count_tokens_batch,
     count_message_tokens, 
     get_max_tokens,
     can_fit_in_context,
-    truncate_text_to_fit
+    truncate_text_to_fit,
+    get_encoder,
+    get_token_cache_stats,
+    clear_token_cache
 )
 
 # Onda importujemo chunker koji koristi token_counter
-from .chunker import chunk_text_by_structure, Chunk, merge_chunks
+from .chunk_cache import chunk_cache, content_hash
+from .summary_cache import summary_cache, SummaryCache
+from .extractive_summarizer import extractive_summary
+from .chunker import chunk_text_by_structure, Chunk, merge_chunks, iter_chunks, chunk_by_token_windows, chunk_code
 
 # Zatim memory_manager koji ne bi trebao biti cirkularno ovisan
 from .memory_manager import memory_manager
 
 # Na kraju importujemo context_compressor koji može koristiti memory_manager
-from .context_compressor_agent import compress_context, create_compact_context, format_context_for_model
+from .context_compressor_agent import compress_context, create_compact_context, format_context_for_model, build_agent_context
 
 # Definiramo verziju modula
 __version__ = "0.1.0" 
\ No newline at end of file
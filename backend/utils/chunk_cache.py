@@ -0,0 +1,89 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Union
+
+# Maksimalni broj hasheva sadržaja koje keš pamti
+CHUNK_CACHE_SIZE = 16384
+
+def content_hash(content: Union[str, bytes]) -> str:
+    """
+    Vraća brzi hash sadržaja (16 hex znakova) koji se koristi kao ID chunka
+    i kao ključ u kešu chunkova.
+
+    Args:
+        content: Tekst ili bajtovi
+
+    Returns:
+        Hex string hasha
+    """
+    if isinstance(content, str):
+        content = content.encode("utf-8", "surrogatepass")
+    return hashlib.blake2b(content, digest_size=8).hexdigest()
+
+class ChunkCache:
+    """
+    Procesni LRU keš koji hash sadržaja mapira na broj tokena i na
+    artefakte izvedene iz tog sadržaja (sažetak, embedding, raspored chunkova).
+
+    Isti tekst chunkiran ponovno (npr. ponovni upload istog fajla ili isti kod
+    zalijepljen u novu sesiju) tako preskače tokenizaciju i sažimanje.
+    """
+
+    def __init__(self, maxsize: int = CHUNK_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest: str, name: str) -> Optional[Any]:
+        """Dohvaća artefakt za hash sadržaja ili None ako ne postoji."""
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None or name not in entry:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return entry[name]
+
+    def set(self, digest: str, name: str, value: Any) -> None:
+        """Sprema artefakt za hash sadržaja i izbacuje najstarije unose ako je keš pun."""
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                entry = {}
+                self._entries[digest] = entry
+            entry[name] = value
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_token_count(self, digest: str, encoding_name: str) -> Optional[int]:
+        """Dohvaća broj tokena sadržaja za dano enkodiranje."""
+        return self.get(digest, f"tokens:{encoding_name}")
+
+    def set_token_count(self, digest: str, encoding_name: str, count: int) -> None:
+        """Sprema broj tokena sadržaja za dano enkodiranje."""
+        self.set(digest, f"tokens:{encoding_name}", count)
+
+    def clear(self) -> None:
+        """Briše keš i resetira brojače."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Vraća statistiku korištenja keša."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize
+            }
+
+# Globalni keš chunkova
+chunk_cache = ChunkCache()
@@ -1,24 +1,213 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Iterator, IO, Union, Callable
 import re
-from .token_counter import num_tokens_from_string
+import codecs
+import sys
+import bisect
+import ast
+from .token_counter import num_tokens_from_string, count_tokens_batch, get_encoder, get_encoding_name
+from .chunk_cache import chunk_cache, content_hash
+
+# Tipovi chunkova, u Chunk objektu se čuvaju kao indeks u ovoj listi
+CHUNK_TYPES = ("section", "paragraphs", "sentences", "sentence_part", "mixed", "window")
+_CHUNK_TYPE_CODES = {name: code for code, name in enumerate(CHUNK_TYPES)}
+
+# ID oblika "<prefiks>_<broj>" čuva se kao zajednički prefiks i cijeli broj
+_CHUNK_ID_PATTERN = re.compile(r'(.*_)([1-9]\d*|0)')
+
+# Regexi za strukturu teksta
+# Oznake strukture: fence linije (``` ili ~~~), Markdown naslovi i HTML <h1>-<h6>
+_SECTION_MARK_PATTERN = re.compile(
+    r'^ {0,3}(?P<fence>`{3,}|~{3,})|^#{1,6} (?=.)|<h[1-6](?=[\s>/])',
+    re.M | re.I
+)
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+# Rečenica završava s jednim ili više znakova ., ! ili ?; tekst iza zadnjeg znaka je
+# zadnja rečenica. Svaka pozicija se čita jednom, i kada tekst nema interpunkcije.
+_SENTENCE_PATTERN = re.compile(r'[^.!?]*[.!?]+|[^.!?]+$')
+_WORD_PATTERN = re.compile(r'\S+')
+
+Span = Tuple[int, int]
 
 class Chunk:
-    """Klasa koja predstavlja chunk teksta."""
+    """
+    Klasa koja predstavlja chunk teksta.
+    
+    Chunkovi koje stvara chunker ne kopiraju tekst, nego čuvaju (start, end)
+    pomak u zajednički izvorni tekst (str, bytes ili memoryview) i metapodatke
+    kao male cijele brojeve. Tekst se stvara tek pri pristupu, a rječnik
+    metapodataka pri prvom pristupu atributu metadata.
+    """
+    
+    __slots__ = (
+        "_source", "_start", "_end", "_metadata",
+        "_type", "_section_index", "_paragraph_index", "_sentence_index",
+        "_paragraph_indices", "_sentence_indices", "_token_span",
+        "_id_prefix", "_id_number", "_content_hash", "token_count"
+    )
     
     def __init__(self, text: str, metadata: Optional[Dict[str, Any]] = None, chunk_id: Optional[str] = None):
-        self.text = text
-        self.metadata = metadata or {}
-        self.chunk_id = chunk_id or f"chunk_{id(self)}"
+        self._source = text
+        self._start = None
+        self._end = None
+        self._metadata = metadata or {}
+        self._type = None
+        self._section_index = None
+        self._paragraph_index = None
+        self._sentence_index = None
+        self._paragraph_indices = None
+        self._sentence_indices = None
+        self._token_span = None
+        self._content_hash = None
+        self.chunk_id = chunk_id
         self.token_count = None
     
+    @classmethod
+    def from_source(cls, source: Union[str, bytes, memoryview], start: int, end: int,
+                    chunk_type: Optional[str] = None,
+                    section_index: Optional[int] = None,
+                    paragraph_index: Optional[int] = None,
+                    sentence_index: Optional[int] = None,
+                    paragraph_indices: Optional[range] = None,
+                    sentence_indices: Optional[range] = None,
+                    token_span: Optional[Span] = None,
+                    token_count: Optional[int] = None,
+                    chunk_id: Optional[str] = None) -> "Chunk":
+        """
+        Kreira chunk kao pogled u izvorni tekst bez kopiranja.
+        Pomaci su u znakovima za str, odnosno u bajtovima (UTF-8) za bytes i memoryview.
+        """
+        chunk = cls.__new__(cls)
+        chunk._source = source
+        chunk._start = start
+        chunk._end = end
+        chunk._metadata = None
+        chunk._type = _CHUNK_TYPE_CODES[chunk_type] if chunk_type is not None else None
+        chunk._section_index = section_index
+        chunk._paragraph_index = paragraph_index
+        chunk._sentence_index = sentence_index
+        chunk._paragraph_indices = paragraph_indices
+        chunk._sentence_indices = sentence_indices
+        chunk._token_span = token_span
+        chunk._content_hash = None
+        chunk.chunk_id = chunk_id
+        chunk.token_count = token_count
+        return chunk
+    
+    @property
+    def text(self) -> str:
+        """Tekst chunka; za chunk iz izvornog teksta stvara se pri svakom pristupu."""
+        if self._start is None:
+            return self._source
+        if isinstance(self._source, str):
+            return self._source[self._start:self._end]
+        return bytes(self._source[self._start:self._end]).decode("utf-8")
+    
+    @text.setter
+    def text(self, value: str) -> None:
+        self._source = value
+        self._start = None
+        self._end = None
+        self._content_hash = None
+    
+    @property
+    def content_hash(self) -> str:
+        """Hash sadržaja chunka, računa se jednom pri prvom pristupu."""
+        if self._content_hash is None:
+            self._content_hash = content_hash(self.text)
+        return self._content_hash
+    
+    @property
+    def span(self) -> Optional[Span]:
+        """(start, end) pomak u izvorni tekst ili None ako chunk ima vlastiti tekst."""
+        if self._start is None:
+            return None
+        return (self._start, self._end)
+    
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        if self._metadata is None:
+            metadata = {}
+            if self._section_index is not None:
+                metadata["section_index"] = self._section_index
+            if self._paragraph_index is not None:
+                metadata["paragraph_index"] = self._paragraph_index
+            if self._paragraph_indices is not None:
+                metadata["paragraph_indices"] = list(self._paragraph_indices)
+            if self._sentence_index is not None:
+                metadata["sentence_index"] = self._sentence_index
+            if self._sentence_indices is not None:
+                metadata["sentence_indices"] = list(self._sentence_indices)
+            if self._token_span is not None:
+                metadata["token_start"], metadata["token_end"] = self._token_span
+            if self._type is not None:
+                metadata["type"] = CHUNK_TYPES[self._type]
+            self._metadata = metadata
+        return self._metadata
+    
+    @metadata.setter
+    def metadata(self, value: Dict[str, Any]) -> None:
+        self._metadata = value
+    
+    @property
+    def chunk_type(self) -> Optional[str]:
+        """Tip chunka bez stvaranja rječnika metapodataka."""
+        if self._metadata is not None:
+            return self._metadata.get("type")
+        return CHUNK_TYPES[self._type] if self._type is not None else None
+    
+    @property
+    def chunk_id(self) -> str:
+        if self._id_prefix is None:
+            # Bez zadanog ID-a: hash sadržaja i redni broj chunka u dokumentu,
+            # jer se isti sadržaj može ponoviti (hash sam je ključ keša, ne ID)
+            if self._id_number is None:
+                return f"chunk_{self.content_hash}"
+            return f"chunk_{self.content_hash}_{self._id_number}"
+        if self._id_number is not None:
+            return f"{self._id_prefix}{self._id_number}"
+        return self._id_prefix
+    
+    @chunk_id.setter
+    def chunk_id(self, value: Optional[str]) -> None:
+        match = _CHUNK_ID_PATTERN.fullmatch(value) if value else None
+        if match:
+            self._id_prefix = sys.intern(match.group(1))
+            self._id_number = int(match.group(2))
+        else:
+            self._id_prefix = value
+            self._id_number = None
+    
     def get_token_count(self, model: str = "gpt-4o") -> int:
-        """Vraća broj tokena u chunka, s cachiranjem."""
+        """Vraća broj tokena u chunka, s cachiranjem (i u procesnom kešu chunkova)."""
         if self.token_count is None:
-            self.token_count = num_tokens_from_string(self.text, model)
+            encoding_name = get_encoding_name(model)
+            count = chunk_cache.get_token_count(self.content_hash, encoding_name)
+            if count is None:
+                count = num_tokens_from_string(self.text, model)
+                chunk_cache.set_token_count(self.content_hash, encoding_name, count)
+            self.token_count = count
         return self.token_count
     
     def __str__(self) -> str:
-        return f"Chunk({self.chunk_id}, {len(self.text)} chars, metadata: {self.metadata})"
+        length = len(self._source) if self._start is None else self._end - self._start
+        return f"Chunk({self.chunk_id}, {length} chars, metadata: {self.metadata})"
+    
+    def _layout(self) -> tuple:
+        """Kompaktni zapis chunka iz izvornog teksta za keš rasporeda."""
+        return (self._start, self._end, self._type, self._section_index, self._paragraph_index,
+                self._sentence_index, self._paragraph_indices, self._sentence_indices,
+                self._token_span, self.token_count)
+    
+    @classmethod
+    def _from_layout(cls, source: str, layout: tuple) -> "Chunk":
+        start, end, type_code, section, paragraph, sentence, paragraph_indices, sentence_indices, token_span, count = layout
+        return cls.from_source(
+            source, start, end,
+            chunk_type=CHUNK_TYPES[type_code] if type_code is not None else None,
+            section_index=section, paragraph_index=paragraph, sentence_index=sentence,
+            paragraph_indices=paragraph_indices, sentence_indices=sentence_indices,
+            token_span=token_span, token_count=count
+        )
     
     def to_dict(self) -> Dict[str, Any]:
         """Konvertira chunk u riječnik."""
@@ -29,258 +218,836 @@ class Chunk:
             "token_count": self.token_count
         }
 
+def _number_chunks(chunks: List[Chunk], first: int = 0) -> List[Chunk]:
+    """Chunkovi bez zadanog ID-a dobivaju redni broj u dokumentu, pa su im ID-evi jedinstveni."""
+    for ordinal, chunk in enumerate(chunks, first):
+        if chunk._id_prefix is None and chunk._id_number is None:
+            chunk._id_number = ordinal
+    return chunks
+
 def chunk_text_by_structure(text: str, max_tokens_per_chunk: int = 1500, model: str = "gpt-4o") -> List[Chunk]:
     """
     Dijeli tekst na smislene chunkove bazirano na strukturi.
     
+    Svaka jedinica (sekcija, paragraf, rečenica) se tokenizira samo jednom,
+    a chunkovi se grade zbrajanjem njihovih brojeva tokena. Stvarni broj
+    tokena spojenog teksta provjerava se samo na granici chunka, pa je
+    vrijeme obrade linearno u dužini teksta. Chunkovi su pogledi u ulazni
+    tekst i ne kopiraju ga.
+    
+    Raspored chunkova pamti se u kešu chunkova po hashu teksta, pa ponovno
+    chunkiranje istog teksta (npr. ponovni upload fajla) preskače tokenizaciju.
+    
     Args:
         text: Tekst za podjelu
         max_tokens_per_chunk: Maksimalni broj tokena po chunku
         model: Model za brojanje tokena
         
     Returns:
-        Lista Chunk objekata
+        Lista Chunk objekata (prazna ako tekst nema sadržaja)
     """
+    digest = content_hash(text)
+    encoding_name = get_encoding_name(model)
+    layout_key = f"structure:{max_tokens_per_chunk}:{encoding_name}"
+    
+    layout = chunk_cache.get(digest, layout_key)
+    if layout is not None:
+        return _number_chunks([Chunk._from_layout(text, item) for item in layout])
+    
+    chunks = _structure_chunks(text, max_tokens_per_chunk, model)
+    chunk_cache.set(digest, layout_key, tuple(chunk._layout() for chunk in chunks))
+    
+    # Pamtimo i broj tokena svakog chunka da ga isti sadržaj u drugom kontekstu ne broji ponovno
+    for chunk in chunks:
+        if chunk.token_count is not None:
+            chunk_cache.set_token_count(chunk.content_hash, encoding_name, chunk.token_count)
+    
+    return _number_chunks(chunks)
+
+def _structure_chunks(text: str, max_tokens_per_chunk: int, model: str) -> List[Chunk]:
+    """Dijeli tekst po strukturi (naslovi, paragrafi, rečenice, riječi)."""
+    # Prazan tekst nema chunkova
+    if not text.strip():
+        return []
+    
     # Ako je tekst manji od maksimalnog broja tokena, vraćamo ga kao jedan chunk
-    if num_tokens_from_string(text, model) <= max_tokens_per_chunk:
-        return [Chunk(text)]
+    total_tokens = num_tokens_from_string(text, model)
+    if total_tokens <= max_tokens_per_chunk:
+        return [Chunk.from_source(text, 0, len(text), token_count=total_tokens)]
     
     # Inače, dijelimo tekst na logičke sekcije
     chunks = []
+    paragraph_separator_tokens = num_tokens_from_string("\n\n", model)
     
     # 1. Prvo pokušavamo podijeliti po većim strukturama (naslovi, paragrafi)
-    sections = split_by_headers(text)
+    section_spans = _section_spans(text)
+    section_tokens = count_tokens_batch([text[a:b] for a, b in section_spans], model)
     
-    for i, section in enumerate(sections):
+    for i, ((section_start, section_end), section_count) in enumerate(zip(section_spans, section_tokens)):
         # Ako je sekcija manja od maksimalnog broja tokena, dodajemo je kao chunk
-        if num_tokens_from_string(section, model) <= max_tokens_per_chunk:
-            chunks.append(Chunk(
-                text=section,
-                metadata={"section_index": i, "type": "section"}
+        if section_count <= max_tokens_per_chunk:
+            chunks.append(Chunk.from_source(
+                text, section_start, section_end,
+                chunk_type="section", section_index=i, token_count=section_count
             ))
-        else:
-            # Ako je sekcija prevelika, dalje je dijelimo na paragrafe
-            paragraphs = split_by_paragraphs(section)
-            
-            # Iteriramo kroz paragrafe i grupiramo ih da stanu u maksimalni broj tokena
-            current_chunk_text = ""
-            current_chunk_paragraphs = []
+            continue
+        
+        # Ako je sekcija prevelika, dalje je dijelimo na paragrafe
+        paragraph_spans = _paragraph_spans(text, section_start, section_end)
+        paragraph_tokens = count_tokens_batch([text[a:b] for a, b in paragraph_spans], model)
+        
+        # Paragrafe grupiramo u nizove između paragrafa koji su sami preveliki
+        run_start = 0
+        for j in range(len(paragraph_spans) + 1):
+            if j < len(paragraph_spans) and paragraph_tokens[j] <= max_tokens_per_chunk:
+                continue
             
-            for j, paragraph in enumerate(paragraphs):
-                # Ako trenutni chunk + novi paragraf ne prelazi limit, dodajemo paragraf
-                potential_chunk = current_chunk_text + paragraph + "\n\n"
-                if num_tokens_from_string(potential_chunk, model) <= max_tokens_per_chunk:
-                    current_chunk_text = potential_chunk
-                    current_chunk_paragraphs.append(paragraph)
-                else:
-                    # Ako bi prelazio limit, prvo spremamo trenutni chunk
-                    if current_chunk_text:
-                        chunks.append(Chunk(
-                            text=current_chunk_text.strip(),
-                            metadata={"section_index": i, "paragraph_indices": list(range(j-len(current_chunk_paragraphs), j)), "type": "paragraphs"}
-                        ))
-                    
-                    # Ako je sam paragraf prevelik, moramo ga dalje dijeliti na rečenice
-                    if num_tokens_from_string(paragraph, model) > max_tokens_per_chunk:
-                        sentence_chunks = chunk_by_sentences(paragraph, max_tokens_per_chunk, model)
-                        for sc in sentence_chunks:
-                            sc.metadata.update({
-                                "section_index": i,
-                                "paragraph_index": j,
-                                "type": "sentences"
-                            })
-                            chunks.append(sc)
-                        
-                        # Resetiramo trenutni chunk
-                        current_chunk_text = ""
-                        current_chunk_paragraphs = []
-                    else:
-                        # Inače, započinjemo novi chunk s ovim paragrafom
-                        current_chunk_text = paragraph + "\n\n"
-                        current_chunk_paragraphs = [paragraph]
+            for first, last, start, end, count in _pack_units(
+                text, paragraph_spans[run_start:j], paragraph_tokens[run_start:j],
+                paragraph_separator_tokens, max_tokens_per_chunk, model
+            ):
+                chunks.append(Chunk.from_source(
+                    text, start, end,
+                    chunk_type="paragraphs", section_index=i,
+                    paragraph_indices=range(run_start + first, run_start + last),
+                    token_count=count
+                ))
             
-            # Dodajemo zadnji chunk ako postoji
-            if current_chunk_text:
-                chunks.append(Chunk(
-                    text=current_chunk_text.strip(),
-                    metadata={
-                        "section_index": i,
-                        "paragraph_indices": list(range(len(paragraphs)-len(current_chunk_paragraphs), len(paragraphs))),
-                        "type": "paragraphs"
-                    }
+            # Ako je sam paragraf prevelik, moramo ga dalje dijeliti na rečenice
+            if j < len(paragraph_spans):
+                paragraph_start, paragraph_end = paragraph_spans[j]
+                chunks.extend(_sentence_chunks(
+                    text, paragraph_start, paragraph_end, max_tokens_per_chunk, model,
+                    section_index=i, paragraph_index=j
                 ))
-    
-    # Dodjeljujemo konačne ID-ove
-    for i, chunk in enumerate(chunks):
-        chunk.chunk_id = f"chunk_{i+1}"
+            
+            run_start = j + 1
     
     return chunks
 
-def split_by_headers(text: str) -> List[str]:
-    """Dijeli tekst po naslovima (# za Markdown, <h1>-<h6> za HTML)."""
-    # Markdown naslovi
-    header_pattern = r'(?:^|\n)(#{1,6} .+)(?:\n|$)'
-    
-    # Pokušavamo pronaći naslove
-    matches = list(re.finditer(header_pattern, text))
-    
-    if not matches:
-        # Ako nema naslova, vraćamo cijeli tekst kao jednu sekciju
-        return [text]
+def _pack_units(source: str, spans: List[Span], unit_tokens: List[int], separator_tokens: int, max_tokens: int, model: str) -> List[Tuple[int, int, int, int, Optional[int]]]:
+    """
+    Grupira susjedne jedinice teksta u chunkove koji ne prelaze max_tokens.
     
-    sections = []
-    start_pos = 0
+    Broj tokena grupe procjenjuje se kao zbroj tokena jedinica i separatora.
+    Tek kada procjena pređe limit (ili mu se približi na kraju grupe), broji se
+    stvarni tekst grupe, pa se svaka jedinica enkodira samo jednom.
     
-    for match in matches:
-        # Ako postoji tekst prije prvog naslova, dodajemo ga kao uvod
-        if match.start() > start_pos and start_pos == 0:
-            sections.append(text[start_pos:match.start()])
+    Args:
+        source: Izvorni tekst
+        spans: (start, end) pomaci jedinica (paragrafi, rečenice, riječi) u izvornom tekstu
+        unit_tokens: Broj tokena svake jedinice
+        separator_tokens: Procijenjeni broj tokena razmaka između jedinica
+        max_tokens: Maksimalni broj tokena po grupi
+        model: Model za brojanje tokena
         
-        # Tražimo kraj sekcije (početak sljedećeg naslova ili kraj teksta)
-        header_end = match.end()
-        next_header_start = None
+    Returns:
+        Lista (prva jedinica, zadnja jedinica + 1, start, end, broj tokena ili None ako nije provjeren)
+    """
+    groups = []
+    n = len(spans)
+    first = 0
+    
+    while first < n:
+        running = unit_tokens[first]
+        verified = False
+        last = first + 1
         
-        # Tražimo sljedeći naslov
-        for m in matches:
-            if m.start() > header_end:
-                next_header_start = m.start()
+        while last < n:
+            estimate = running + separator_tokens + unit_tokens[last]
+            if estimate <= max_tokens:
+                running = estimate
+                verified = False
+                last += 1
+                continue
+            
+            # Procjena prelazi limit - provjeravamo stvarni broj tokena na granici
+            actual = num_tokens_from_string(source[spans[first][0]:spans[last][1]], model)
+            if actual > max_tokens:
                 break
+            running = actual
+            verified = True
+            last += 1
         
-        # Ako nema sljedećeg naslova, sekcija ide do kraja teksta
-        if next_header_start is None:
-            next_header_start = len(text)
+        # Grupa blizu limita koja nije provjerena - korigiramo procjenu na granici
+        if not verified and last - first > 1 and running > max_tokens * 0.9:
+            running = num_tokens_from_string(source[spans[first][0]:spans[last - 1][1]], model)
+            while running > max_tokens and last - first > 1:
+                last -= 1
+                running = num_tokens_from_string(source[spans[first][0]:spans[last - 1][1]], model)
+            verified = True
         
-        # Dodajemo sekciju s naslovom
-        section = text[match.start():next_header_start]
-        sections.append(section)
+        count = running if verified or last - first == 1 else None
+        groups.append((first, last, spans[first][0], spans[last - 1][1], count))
+        first = last
+    
+    return groups
+
+def _strip_span(source: str, start: int, end: int) -> Span:
+    """Pomiče granice tako da isključe razmake, kao str.strip()."""
+    while start < end and source[start].isspace():
+        start += 1
+    while end > start and source[end - 1].isspace():
+        end -= 1
+    return (start, end)
+
+def _header_positions(text: str, fence: Optional[str] = None) -> Tuple[List[int], Optional[str]]:
+    """
+    Jednim prolazom pronalazi početke naslova (Markdown i HTML) izvan fenced blokova koda.
+    
+    Args:
+        text: Tekst za pretragu
+        fence: Otvoreni fence (``` ili ~~~) s kojim tekst počinje, ili None
         
-        # Ažuriramo početnu poziciju za sljedeću iteraciju
-        start_pos = next_header_start
+    Returns:
+        (pozicije naslova, otvoreni fence na kraju teksta ili None)
+    """
+    positions = []
+    for match in _SECTION_MARK_PATTERN.finditer(text):
+        marker = match.group("fence")
+        if marker:
+            if fence is None:
+                fence = marker
+            elif marker[0] == fence[0] and len(marker) >= len(fence):
+                fence = None
+        elif fence is None:
+            positions.append(match.start())
+    return positions, fence
+
+def _section_spans(text: str) -> List[Span]:
+    """Vraća (start, end) pomake sekcija koje vraća split_by_headers."""
+    positions, _ = _header_positions(text)
+    
+    if not positions:
+        # Ako nema naslova, vraćamo cijeli tekst kao jednu sekciju
+        return [(0, len(text))]
+    
+    # Tekst prije prvog naslova je uvod, a svaka sekcija traje do sljedećeg naslova
+    boundaries = [0] + positions + [len(text)]
+    spans = [_strip_span(text, boundaries[i], boundaries[i + 1]) for i in range(len(boundaries) - 1)]
     
     # Vraćamo samo neprazne sekcije
-    return [s.strip() for s in sections if s.strip()]
+    return [(start, end) for start, end in spans if start < end]
 
-def split_by_paragraphs(text: str) -> List[str]:
-    """Dijeli tekst na paragrafe temeljene na praznim redovima."""
+def split_by_headers(text: str) -> List[str]:
+    """
+    Dijeli tekst po naslovima (# za Markdown, <h1>-<h6> za HTML).
+    Naslovi unutar fenced blokova koda (``` ili ~~~) se ignoriraju.
+    """
+    return [text[start:end] for start, end in _section_spans(text)]
+
+def _paragraph_spans(source: str, start: int, end: int) -> List[Span]:
+    """Vraća (start, end) pomake paragrafa unutar source[start:end]."""
+    spans = []
+    pos = start
+    
     # Dijelimo po dvostrukom novom redu (prazan red)
-    paragraphs = re.split(r'\n\s*\n', text)
+    for match in _PARAGRAPH_BREAK.finditer(source, start, end):
+        spans.append(_strip_span(source, pos, match.start()))
+        pos = match.end()
+    spans.append(_strip_span(source, pos, end))
     
     # Filtriramo prazne paragrafe
-    return [p.strip() for p in paragraphs if p.strip()]
+    return [(a, b) for a, b in spans if a < b]
+
+def split_by_paragraphs(text: str) -> List[str]:
+    """Dijeli tekst na paragrafe temeljene na praznim redovima."""
+    return [text[start:end] for start, end in _paragraph_spans(text, 0, len(text))]
+
+def _sentence_chunks(source: str, start: int, end: int, max_tokens: int, model: str,
+                     section_index: Optional[int] = None, paragraph_index: Optional[int] = None) -> List[Chunk]:
+    """
+    Dijeli source[start:end] na chunkove po rečenicama.
+    Ako je zadan section_index, chunkovi dobivaju položaj paragrafa i tip "sentences".
+    """
+    # Jednostavni regex za rečenice (završavaju s ., !, ili ?, a zadnja može biti i bez njih)
+    sentence_spans = [_strip_span(source, m.start(), m.end()) for m in _SENTENCE_PATTERN.finditer(source, start, end)]
+    sentence_spans = [(a, b) for a, b in sentence_spans if a < b]
+    sentence_tokens = count_tokens_batch([source[a:b] for a, b in sentence_spans], model)
+    space_tokens = num_tokens_from_string(" ", model)
+    part_type = "sentence_part" if section_index is None else "sentences"
+    
+    chunks = []
+    run_start = 0
+    
+    for i in range(len(sentence_spans) + 1):
+        if i < len(sentence_spans) and sentence_tokens[i] <= max_tokens:
+            continue
+        
+        # Rečenice do ove grupiramo u chunkove
+        for first, last, chunk_start, chunk_end, count in _pack_units(
+            source, sentence_spans[run_start:i], sentence_tokens[run_start:i], space_tokens, max_tokens, model
+        ):
+            chunks.append(Chunk.from_source(
+                source, chunk_start, chunk_end,
+                chunk_type="sentences", section_index=section_index, paragraph_index=paragraph_index,
+                sentence_indices=range(run_start + first, run_start + last),
+                token_count=count
+            ))
+        
+        # Ako je sama rečenica prevelika, dijelimo je na riječi
+        if i < len(sentence_spans):
+            word_spans = [m.span() for m in _WORD_PATTERN.finditer(source, *sentence_spans[i])]
+            word_tokens = count_tokens_batch([source[a:b] for a, b in word_spans], model)
+            for _, _, chunk_start, chunk_end, count in _pack_units(
+                source, word_spans, word_tokens, space_tokens, max_tokens, model
+            ):
+                chunks.append(Chunk.from_source(
+                    source, chunk_start, chunk_end,
+                    chunk_type=part_type, section_index=section_index, paragraph_index=paragraph_index,
+                    sentence_index=i, token_count=count
+                ))
+        
+        run_start = i + 1
+    
+    return chunks
 
 def chunk_by_sentences(text: str, max_tokens: int, model: str) -> List[Chunk]:
     """Dijeli tekst na chunkove po rečenicama."""
-    # Jednostavni regex za rečenice (završavaju s ., !, ili ?)
-    sentence_pattern = r'[^.!?]*[.!?]'
-    sentences = re.findall(sentence_pattern, text)
+    return _number_chunks(_sentence_chunks(text, 0, len(text), max_tokens, model))
+
+def token_char_offsets(text: str, model: str = "gpt-4o") -> Tuple[List[int], List[int], str]:
+    """
+    Enkodira tekst jednom i vraća mapu tokena na pozicije znakova.
+    
+    Args:
+        text: Tekst za enkodiranje
+        model: Model za enkodiranje
+        
+    Returns:
+        (tokeni, pozicija prvog znaka svakog tokena, dekodirani tekst);
+        dekodirani tekst je isti kao ulazni osim ako ulaz nije ispravan UTF-8
+    """
+    encoder = get_encoder(model)
+    tokens = encoder.encode(text, disallowed_special=())
+    decoded, offsets = encoder.decode_with_offsets(tokens)
+    return tokens, offsets, decoded
+
+def chunk_by_token_windows(text: str, max_tokens_per_chunk: int = 1500, overlap_tokens: int = 0, model: str = "gpt-4o") -> List[Chunk]:
+    """
+    Dijeli tekst na prozore od točno max_tokens_per_chunk tokena (zadnji može biti kraći),
+    gdje se susjedni prozori preklapaju za overlap_tokens tokena.
+    
+    Tekst se enkodira samo jednom; granice prozora se preko mape tokena
+    preslikavaju na pozicije znakova, pa su chunkovi pogledi u isti tekst
+    i ništa se ne dekodira po prozoru. Metapodaci sadrže token_start i token_end.
     
+    Args:
+        text: Tekst za podjelu
+        max_tokens_per_chunk: Broj tokena po prozoru
+        overlap_tokens: Broj tokena preklapanja između susjednih prozora
+        model: Model za enkodiranje
+        
+    Returns:
+        Lista Chunk objekata tipa "window" (prazna ako tekst nema sadržaja)
+    """
+    if max_tokens_per_chunk <= 0 or not 0 <= overlap_tokens < max_tokens_per_chunk:
+        raise ValueError("Preklapanje mora biti nenegativno i manje od veličine prozora")
+    
+    if not text.strip():
+        return []
+    
+    try:
+        tokens, offsets, source = token_char_offsets(text, model)
+        total = len(tokens)
+    except Exception as e:
+        # Fallback na procjenu: otprilike 4 karaktera = 1 token
+        print(f"Greška pri enkodiranju teksta: {e}. Koristim aproksimaciju.")
+        source = text
+        total = (len(text) + 3) // 4
+        offsets = list(range(0, len(text), 4))
+    
+    step = max_tokens_per_chunk - overlap_tokens
     chunks = []
-    current_chunk_text = ""
-    current_chunk_sentences = []
-    
-    for i, sentence in enumerate(sentences):
-        # Ako je sama rečenica prevelika, moramo je skratiti
-        if num_tokens_from_string(sentence, model) > max_tokens:
-            if current_chunk_text:
-                chunks.append(Chunk(
-                    text=current_chunk_text.strip(),
-                    metadata={"type": "sentences", "sentence_indices": list(range(i-len(current_chunk_sentences), i))}
-                ))
-            
-            # Dijelimo rečenicu na manje dijelove
-            words = sentence.split()
-            current_part = ""
-            
-            for word in words:
-                if num_tokens_from_string(current_part + " " + word, model) <= max_tokens:
-                    current_part += " " + word if current_part else word
-                else:
-                    if current_part:
-                        chunks.append(Chunk(
-                            text=current_part.strip(),
-                            metadata={"type": "sentence_part", "sentence_index": i}
-                        ))
-                    current_part = word
-            
-            if current_part:
-                chunks.append(Chunk(
-                    text=current_part.strip(),
-                    metadata={"type": "sentence_part", "sentence_index": i}
-                ))
+    
+    for token_start in range(0, max(total - overlap_tokens, 1), step):
+        token_end = min(token_start + max_tokens_per_chunk, total)
+        char_start = offsets[token_start] if token_start < total else len(source)
+        char_end = offsets[token_end] if token_end < total else len(source)
+        chunks.append(Chunk.from_source(
+            source, char_start, char_end,
+            chunk_type="window", token_span=(token_start, token_end),
+            token_count=token_end - token_start
+        ))
+    
+    return _number_chunks(chunks)
+
+# Tokeni za prepoznavanje blokova u C-sličnim jezicima (JS, TS, Java, C, Go...):
+# stringovi i komentari se preskaču, zagrade i novi redovi se broje
+_BRACE_TOKEN_PATTERN = re.compile(
+    r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|`(?:\\.|[^`\\])*`|//[^\n]*|/\*.*?(?:\*/|\Z)|[{}()\[\]\n]',
+    re.S
+)
+
+# Ime funkcije, klase ili varijable na početku bloka u C-sličnim jezicima
+_BLOCK_NAME_PATTERN = re.compile(
+    r'\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?(?:function\*?\s+([\w$]+)|class\s+([\w$]+)|(?:const|let|var)\s+([\w$]+)\s*=)'
+)
+
+def chunk_code(code: str, language: str = "python", max_tokens_per_chunk: int = 1500, model: str = "gpt-4o") -> List[Chunk]:
+    """
+    Dijeli izvorni kod na chunkove po granicama funkcija, klasa i blokova.
+    
+    Python se dijeli po čvorovima iz ast modula (funkcije, klase i ostale naredbe
+    najviše razine), a JS i ostali jezici po blokovima s uravnoteženim vitičastim
+    zagradama na najvišoj razini. Susjedne male jedinice se grupiraju do limita
+    tokena; prevelika klasa ili funkcija dijeli se po svom tijelu, a tek onda po
+    linijama. Spojeni chunkovi daju točno izvorni kod pa se mogu obrađivati
+    neovisno i paralelno.
+    
+    Args:
+        code: Izvorni kod
+        language: Jezik koda ("python", "javascript", ...)
+        max_tokens_per_chunk: Maksimalni broj tokena po chunku
+        model: Model za brojanje tokena
+        
+    Returns:
+        Lista Chunk objekata s metapodacima type, language, symbols, start_line i end_line
+    """
+    line_starts = [0] + [m.end() for m in re.finditer(r'\n', code)]
+    lines = code.split("\n")
+    
+    units = None
+    if language.lower() in ("python", "py"):
+        try:
+            tree = ast.parse(code)
+            units = _python_units(code, line_starts, lines, tree.body, 0, len(code), 1)
+        except (SyntaxError, ValueError):
+            units = None
+    if units is None:
+        units = _brace_units(code, 0, len(code))
+    
+    chunks = []
+    for start, end, symbols, count in _pack_code_units(code, line_starts, lines, units, max_tokens_per_chunk, model):
+        chunk = Chunk.from_source(code, start, end, token_count=count)
+        chunk.metadata = {
+            "type": "code",
+            "language": language,
+            "symbols": symbols,
+            "start_line": bisect.bisect_right(line_starts, start),
+            "end_line": bisect.bisect_right(line_starts, max(start, end - 1))
+        }
+        chunks.append(chunk)
+    
+    return _number_chunks(chunks)
+
+def _python_units(code: str, line_starts: List[int], lines: List[str], body: List[ast.stmt], start: int, end: int, first_line: int) -> List[Tuple[int, int, Optional[str], Optional[ast.AST]]]:
+    """
+    Dijeli code[start:end] na susjedne jedinice po naredbama iz body.
+    Dekoratori i komentari neposredno iznad naredbe pripadaju toj naredbi,
+    a tekst prije prve naredbe (zaglavlje klase/funkcije) je zasebna jedinica.
+    """
+    boundaries = []
+    previous_end_line = first_line - 1
+    
+    for node in body:
+        node_line = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+        while node_line - 1 > previous_end_line and lines[node_line - 2].lstrip().startswith("#"):
+            node_line -= 1
+        previous_end_line = node.end_lineno or node.lineno
+        boundaries.append(max(line_starts[node_line - 1], start))
+    
+    units = []
+    if not boundaries or boundaries[0] > start:
+        units.append((start, boundaries[0] if boundaries else end, None, None))
+    
+    boundaries.append(end)
+    for i, node in enumerate(body):
+        units.append((boundaries[i], boundaries[i + 1], getattr(node, "name", None), node))
+    
+    return [unit for unit in units if unit[0] < unit[1]]
+
+def _brace_units(code: str, start: int, end: int) -> List[Tuple[int, int, Optional[str], Optional[ast.AST]]]:
+    """Dijeli code[start:end] na linije i blokove s uravnoteženim zagradama na najvišoj razini."""
+    boundaries = [start]
+    depth = 0
+    
+    for match in _BRACE_TOKEN_PATTERN.finditer(code, start, end):
+        token = match.group()
+        if token in "{([":
+            depth += 1
+        elif token in "})]":
+            depth = max(0, depth - 1)
+        elif token == "\n" and depth == 0:
+            boundaries.append(match.end())
+    
+    boundaries.append(end)
+    units = []
+    for i in range(len(boundaries) - 1):
+        if boundaries[i] < boundaries[i + 1]:
+            match = _BLOCK_NAME_PATTERN.match(code, boundaries[i], boundaries[i + 1])
+            name = next((group for group in match.groups() if group), None) if match else None
+            units.append((boundaries[i], boundaries[i + 1], name, None))
+    return units
+
+def _line_units(line_starts: List[int], start: int, end: int) -> List[Tuple[int, int, Optional[str], Optional[ast.AST]]]:
+    """Dijeli code[start:end] na linije."""
+    first = bisect.bisect_right(line_starts, start)
+    boundaries = [start] + [offset for offset in line_starts[first:] if offset < end] + [end]
+    return [(boundaries[i], boundaries[i + 1], None, None) for i in range(len(boundaries) - 1)]
+
+def _pack_code_units(code: str, line_starts: List[int], lines: List[str], units, max_tokens: int, model: str) -> List[Tuple[int, int, List[str], Optional[int]]]:
+    """Grupira susjedne jedinice koda do limita tokena, a prevelike jedinice dijeli dalje."""
+    counts = count_tokens_batch([code[a:b] for a, b, _, _ in units], model)
+    groups = []
+    run_start = 0
+    
+    for i in range(len(units) + 1):
+        if i < len(units) and counts[i] <= max_tokens:
+            continue
+        
+        run = units[run_start:i]
+        for first, last, start, end, count in _pack_units(
+            code, [(a, b) for a, b, _, _ in run], counts[run_start:i], 0, max_tokens, model
+        ):
+            groups.append((start, end, [name for _, _, name, _ in run[first:last] if name], count))
+        
+        if i < len(units):
+            start, end, name, node = units[i]
+            body = getattr(node, "body", None)
+            if isinstance(body, list) and body and isinstance(body[0], ast.stmt):
+                # Prevelika klasa, funkcija ili blok - dijelimo je po naredbama tijela
+                sub_units = _python_units(code, line_starts, lines, body, start, end, node.lineno + 1)
+            else:
+                # Prevelik blok bez strukture - dijelimo ga na linije
+                sub_units = _line_units(line_starts, start, end)
             
-            current_chunk_text = ""
-            current_chunk_sentences = []
-        else:
-            # Ako trenutni chunk + nova rečenica ne prelazi limit
-            potential_chunk = current_chunk_text + " " + sentence if current_chunk_text else sentence
-            if num_tokens_from_string(potential_chunk, model) <= max_tokens:
-                current_chunk_text = potential_chunk
-                current_chunk_sentences.append(sentence)
+            if len(sub_units) > 1:
+                for sub_start, sub_end, sub_symbols, count in _pack_code_units(code, line_starts, lines, sub_units, max_tokens, model):
+                    if name:
+                        sub_symbols = [f"{name}.{symbol}" for symbol in sub_symbols] or [name]
+                    groups.append((sub_start, sub_end, sub_symbols, count))
             else:
-                # Ako bi prelazio limit, spremamo trenutni chunk i započinjemo novi
-                if current_chunk_text:
-                    chunks.append(Chunk(
-                        text=current_chunk_text.strip(),
-                        metadata={"type": "sentences", "sentence_indices": list(range(i-len(current_chunk_sentences), i))}
-                    ))
-                current_chunk_text = sentence
-                current_chunk_sentences = [sentence]
-    
-    # Dodajemo zadnji chunk ako postoji
-    if current_chunk_text:
-        chunks.append(Chunk(
-            text=current_chunk_text.strip(),
-            metadata={"type": "sentences", "sentence_indices": list(range(len(sentences)-len(current_chunk_sentences), len(sentences)))}
-        ))
+                groups.append((start, end, [name] if name else [], counts[i]))
+        
+        run_start = i + 1
     
-    return chunks
+    return groups
+
+# Koliko tokena spajanje može odstupiti od zbroja dijelova na granici;
+# spojeni tekst se broji samo kada je procjena toliko blizu limita
+MERGE_VERIFY_MARGIN = 4
 
-def merge_chunks(chunks: List[Chunk], max_tokens: int, model: str) -> List[Chunk]:
+def merge_chunks(chunks: List[Chunk], max_tokens: int, model: str, mode: str = "adjacent") -> List[Chunk]:
     """
-    Pokušava spojiti susjedne chunkove ako zajedno ne prelaze maksimalni broj tokena.
+    Pokušava spojiti chunkove ako zajedno ne prelaze maksimalni broj tokena.
+    
+    Broj tokena spojenog chunka računa se iz cachiranih brojeva dijelova i
+    cijene separatora; spojeni tekst se broji samo blizu limita.
     
     Args:
         chunks: Lista Chunk objekata za spajanje
         max_tokens: Maksimalni broj tokena po chunku
         model: Model za brojanje tokena
+        mode: "adjacent" spaja samo susjedne chunkove redom,
+              "pack" pakira chunkove (best-fit decreasing) tako da svaki bude što puniji;
+              unutar spojenog chunka dijelovi ostaju u izvornom redoslijedu
         
     Returns:
         Nova lista spojenih Chunk objekata
     """
+    if mode not in ("adjacent", "pack"):
+        raise ValueError(f"Nepoznat način spajanja: {mode}")
+    
     if not chunks:
         return []
     
+    # Brojimo tokene svih chunkova bez cachiranog broja jednim batch pozivom
+    uncounted = [chunk for chunk in chunks if chunk.token_count is None]
+    if uncounted:
+        for chunk, count in zip(uncounted, count_tokens_batch([c.text for c in uncounted], model)):
+            chunk.token_count = count
+    
+    separator_tokens = num_tokens_from_string("\n\n", model)
+    
+    def fits(estimate: int, get_parts: Callable[[], List[Chunk]]) -> bool:
+        # Daleko od limita vjerujemo procjeni, blizu limita brojimo spojeni tekst
+        if estimate <= max_tokens - MERGE_VERIFY_MARGIN:
+            return True
+        if estimate > max_tokens + MERGE_VERIFY_MARGIN:
+            return False
+        return num_tokens_from_string("\n\n".join(c.text for c in get_parts()), model) <= max_tokens
+    
+    if mode == "adjacent":
+        groups = []
+        current_parts = [chunks[0]]
+        current_tokens = chunks[0].token_count
+        
+        for next_chunk in chunks[1:]:
+            # Provjeravamo možemo li spojiti trenutni i sljedeći chunk
+            estimate = current_tokens + separator_tokens + next_chunk.token_count
+            if fits(estimate, lambda: current_parts + [next_chunk]):
+                current_parts.append(next_chunk)
+                current_tokens = estimate
+            else:
+                # Ne možemo ih spojiti, zatvaramo trenutnu grupu i prelazimo na sljedeći
+                groups.append((current_parts, current_tokens))
+                current_parts = [next_chunk]
+                current_tokens = next_chunk.token_count
+        
+        # Dodajemo zadnju grupu
+        groups.append((current_parts, current_tokens))
+    else:
+        groups = _pack_chunks(chunks, max_tokens, separator_tokens, fits)
+    
     merged_chunks = []
-    current_chunk = chunks[0]
-    
-    for next_chunk in chunks[1:]:
-        # Provjeravamo možemo li spojiti trenutni i sljedeći chunk
-        combined_text = current_chunk.text + "\n\n" + next_chunk.text
-        if num_tokens_from_string(combined_text, model) <= max_tokens:
-            # Možemo ih spojiti
-            combined_metadata = {**current_chunk.metadata}
-            # Ažuriramo metapodatke za spojeni chunk
-            if "type" in current_chunk.metadata and "type" in next_chunk.metadata:
-                if current_chunk.metadata["type"] == next_chunk.metadata["type"]:
-                    combined_metadata["type"] = current_chunk.metadata["type"]
-                else:
-                    combined_metadata["type"] = "mixed"
-            
-            current_chunk = Chunk(
-                text=combined_text,
-                metadata=combined_metadata,
-                chunk_id=current_chunk.chunk_id
+    for parts, tokens in groups:
+        if len(parts) == 1:
+            chunk = parts[0]
+        else:
+            chunk = Chunk(
+                text="\n\n".join(c.text for c in parts),
+                metadata=_merge_metadata(parts)
             )
+            chunk.token_count = tokens
+        merged_chunks.append(chunk)
+    
+    # Spojeni chunkovi su novi chunkovi dokumenta; nespojeni zadržavaju svoj ID
+    return _number_chunks(merged_chunks)
+
+def _merge_metadata(parts: List[Chunk]) -> Dict[str, Any]:
+    """Metapodaci spojenog chunka: metapodaci prvog dijela i zajednički ili "mixed" tip."""
+    combined_metadata = {**parts[0].metadata}
+    for part in parts[1:]:
+        part_type = part.chunk_type
+        if "type" in combined_metadata and part_type is not None:
+            if combined_metadata["type"] != part_type:
+                combined_metadata["type"] = "mixed"
+    return combined_metadata
+
+def _pack_chunks(chunks: List[Chunk], max_tokens: int, separator_tokens: int, fits: Callable[[int, Callable[[], List[Chunk]]], bool]) -> List[Tuple[List[Chunk], int]]:
+    """
+    Pakira chunkove u grupe metodom best-fit decreasing.
+    Grupe se vraćaju poredane po prvom chunku, a dijelovi u izvornom redoslijedu.
+    """
+    # Otvorene grupe sortirane po preostalom kapacitetu: (preostalo, redni broj grupe)
+    open_bins: List[Tuple[int, int]] = []
+    bins: List[List[int]] = []
+    bin_tokens: List[int] = []
+    
+    order = sorted(range(len(chunks)), key=lambda i: chunks[i].token_count, reverse=True)
+    for i in order:
+        need = chunks[i].token_count + separator_tokens
+        
+        # Najpunija grupa u koju chunk stane
+        pos = bisect.bisect_left(open_bins, (need - MERGE_VERIFY_MARGIN, -1))
+        placed = False
+        while pos < len(open_bins):
+            remaining, bin_id = open_bins[pos]
+            estimate = bin_tokens[bin_id] + need
+            if fits(estimate, lambda: [chunks[j] for j in sorted(bins[bin_id] + [i])]):
+                del open_bins[pos]
+                bins[bin_id].append(i)
+                bin_tokens[bin_id] = estimate
+                bisect.insort(open_bins, (max_tokens - estimate, bin_id))
+                placed = True
+                break
+            pos += 1
+        
+        if not placed:
+            bin_id = len(bins)
+            bins.append([i])
+            bin_tokens.append(chunks[i].token_count)
+            bisect.insort(open_bins, (max_tokens - chunks[i].token_count, bin_id))
+    
+    groups = [(sorted(indices), tokens) for indices, tokens in zip(bins, bin_tokens)]
+    groups.sort(key=lambda group: group[0][0])
+    return [([chunks[j] for j in indices], tokens) for indices, tokens in groups]
+
+# Veličina bloka koji se čita iz fajla pri streaming chunkiranju
+STREAM_READ_SIZE = 64 * 1024
+
+# Granice na kojima iter_chunks reže predugačak paragraf
+_SENTENCE_END = re.compile(r'[.!?](?=\s)')
+
+class _StreamChunker:
+    """
+    Pomoćna klasa za iter_chunks koja prima paragrafe jedan po jedan
+    i vraća chunkove čim se zatvori granica sekcije ili chunka.
+    U memoriji drži samo paragrafe trenutnog chunka.
+    """
+    
+    def __init__(self, max_tokens: int, model: str):
+        self.max_tokens = max_tokens
+        self.model = model
+        self.separator_tokens = num_tokens_from_string("\n\n", model)
+        
+        self.section_index = 0
+        self.paragraph_index = 0
+        self.section_started = False
+        self.section_flushed = False
+        
+        self.paragraphs: List[str] = []
+        self.paragraph_tokens: List[int] = []
+        self.fence: Optional[str] = None
+        self.first_paragraph_index = 0
+        self.running_tokens = 0
+    
+    def _new_chunk(self, source: str, start: int, end: int, token_count: Optional[int], **position) -> Chunk:
+        return Chunk.from_source(
+            source, start, end, section_index=self.section_index,
+            token_count=token_count, **position
+        )
+    
+    def _flush(self, section_end: bool = False) -> List[Chunk]:
+        """Zatvara trenutni chunk (ili više njih ako procjena nije bila točna)."""
+        if not self.paragraphs:
+            return []
+        
+        # Paragrafi chunka spajaju se u jedan izvorni tekst koji chunkovi dijele
+        source = "\n\n".join(self.paragraphs)
+        spans = []
+        pos = 0
+        for paragraph in self.paragraphs:
+            spans.append((pos, pos + len(paragraph)))
+            pos += len(paragraph) + 2
+        
+        groups = _pack_units(source, spans, self.paragraph_tokens, self.separator_tokens, self.max_tokens, self.model)
+        chunks = []
+        
+        # Cijela sekcija stala je u jedan chunk - isti tip kao kod chunk_text_by_structure
+        if section_end and not self.section_flushed and len(groups) == 1:
+            _, _, start, end, count = groups[0]
+            chunks.append(self._new_chunk(source, start, end, count, chunk_type="section"))
         else:
-            # Ne možemo ih spojiti, dodajemo trenutni chunk i prelazimo na sljedeći
-            merged_chunks.append(current_chunk)
-            current_chunk = next_chunk
+            for first, last, start, end, count in groups:
+                chunks.append(self._new_chunk(
+                    source, start, end, count, chunk_type="paragraphs",
+                    paragraph_indices=range(self.first_paragraph_index + first, self.first_paragraph_index + last)
+                ))
+        
+        self.section_flushed = True
+        self.paragraphs = []
+        self.paragraph_tokens = []
+        self.running_tokens = 0
+        return chunks
     
-    # Dodajemo zadnji chunk
-    merged_chunks.append(current_chunk)
+    def feed(self, paragraph: str, starts_section: bool = False) -> List[Chunk]:
+        """Dodaje jedan kompletan paragraf i vraća chunkove koji su se zatvorili."""
+        chunks = []
+        
+        # Naslov otvara novu sekciju
+        if starts_section:
+            chunks.extend(self._flush(section_end=True))
+            if self.section_started:
+                self.section_index += 1
+            self.paragraph_index = 0
+            self.section_flushed = False
+        self.section_started = True
+        
+        count = num_tokens_from_string(paragraph, self.model)
+        
+        if count > self.max_tokens:
+            # Ako je sam paragraf prevelik, dijelimo ga na rečenice
+            chunks.extend(self._flush())
+            chunks.extend(_sentence_chunks(paragraph, 0, len(paragraph), self.max_tokens, self.model,
+                                           section_index=self.section_index, paragraph_index=self.paragraph_index))
+        else:
+            if self.paragraphs:
+                estimate = self.running_tokens + self.separator_tokens + count
+                if estimate > self.max_tokens:
+                    # Procjena prelazi limit - provjeravamo stvarni broj tokena na granici
+                    actual = num_tokens_from_string("\n\n".join(self.paragraphs + [paragraph]), self.model)
+                    if actual > self.max_tokens:
+                        chunks.extend(self._flush())
+                        estimate = count
+                    else:
+                        estimate = actual
+            else:
+                estimate = count
+            
+            if not self.paragraphs:
+                self.first_paragraph_index = self.paragraph_index
+            self.paragraphs.append(paragraph)
+            self.paragraph_tokens.append(count)
+            self.running_tokens = estimate
+        
+        self.paragraph_index += 1
+        return chunks
+    
+    def finish(self) -> List[Chunk]:
+        """Zatvara zadnji chunk na kraju ulaza."""
+        return self._flush(section_end=True)
+
+def iter_chunks(fileobj: IO, max_tokens_per_chunk: int = 1500, model: str = "gpt-4o", read_size: int = STREAM_READ_SIZE) -> Iterator[Chunk]:
+    """
+    Čita fajl (ili bilo koji file-like objekt) inkrementalno i vraća chunkove
+    čim naslov, paragraf ili rečenica zatvori chunk.
+    
+    Memorija je ograničena veličinom chunka i bloka za čitanje, a ne veličinom fajla.
+    Metapodaci chunkova prate format chunk_text_by_structure.
+    
+    Args:
+        fileobj: Tekstualni ili binarni (UTF-8) file-like objekt s metodom read()
+        max_tokens_per_chunk: Maksimalni broj tokena po chunku
+        model: Model za brojanje tokena
+        read_size: Broj znakova/bajtova koji se čita odjednom
+        
+    Yields:
+        Chunk objekti redom kako se zatvaraju
+    """
+    for ordinal, chunk in enumerate(_stream_chunks(fileobj, max_tokens_per_chunk, model, read_size)):
+        yield _number_chunks([chunk], ordinal)[0]
+
+def _stream_chunks(fileobj: IO, max_tokens_per_chunk: int, model: str, read_size: int) -> Iterator[Chunk]:
+    """Generator chunkova za iter_chunks, bez rednih brojeva."""
+    chunker = _StreamChunker(max_tokens_per_chunk, model)
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    
+    # Ako tekst nema praznih redova, rezanje na rečenicama (ili redovima) drži buffer ograničenim
+    max_buffer = max(read_size, max_tokens_per_chunk * 16)
+    buffer = ""
+    # Dio buffera već pretražen za prazne redove i kraj zadnje rečenice u bufferu,
+    # tako da se svaki znak pretražuje samo jednom
+    scanned = 0
+    sentence_end = 0
+    
+    def paragraphs_from(text: str) -> List[Tuple[str, bool]]:
+        # Naslov bez praznog reda ispred također započinje novi paragraf;
+        # stanje fenced bloka koda prenosi se između dijelova
+        positions, chunker.fence = _header_positions(text, chunker.fence)
+        boundaries = [0] + positions + [len(text)]
+        pieces = [(text[boundaries[i]:boundaries[i + 1]].strip(), i > 0) for i in range(len(boundaries) - 1)]
+        return [(piece, is_header) for piece, is_header in pieces if piece]
+    
+    while True:
+        block = fileobj.read(read_size)
+        if not block:
+            break
+        buffer += decoder.decode(block) if isinstance(block, bytes) else block
+        
+        # Prazan red može početi samo u bjelinama na kraju već pretraženog dijela
+        parts = []
+        start = 0
+        for match in _PARAGRAPH_BREAK.finditer(buffer, scanned):
+            parts.append(buffer[start:match.start()])
+            start = match.end()
+        for match in _SENTENCE_END.finditer(buffer, max(start, scanned - 1)):
+            sentence_end = match.end()
+        if start:
+            buffer = buffer[start:]
+            sentence_end = max(sentence_end - start, 0)
+        
+        if len(buffer) > max_buffer:
+            # Predugačak paragraf zatvaramo na zadnjoj završenoj rečenici, a ako je
+            # nema (CSV, logovi, minificirani kod) na zadnjem redu ili razmaku
+            cut = sentence_end or buffer.rfind("\n") + 1
+            if not cut:
+                cut = max(map(buffer.rfind, " \t\r\f\v")) + 1 or len(buffer)
+            parts.append(buffer[:cut])
+            buffer = buffer[cut:]
+            sentence_end = 0
+        
+        scanned = len(buffer)
+        while scanned and buffer[scanned - 1].isspace():
+            scanned -= 1
+        
+        for part in parts:
+            for paragraph, is_header in paragraphs_from(part):
+                yield from chunker.feed(paragraph, is_header)
     
-    # Dodjeljujemo nove ID-ove
-    for i, chunk in enumerate(merged_chunks):
-        chunk.chunk_id = f"merged_chunk_{i+1}"
+    buffer += decoder.decode(b"", final=True)
+    for paragraph, is_header in paragraphs_from(buffer):
+        yield from chunker.feed(paragraph, is_header)
     
-    return merged_chunks
\ No newline at end of file
+    yield from chunker.finish()
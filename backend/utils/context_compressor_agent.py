@@ -1,32 +1,81 @@
 import os
-from typing import Dict, List, Any, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Set
 
-def compress_context(conversation_text: str, max_tokens: int = 1500) -> str:
+from .summary_cache import summary_cache, summary_key, prefix_keys
+from .extractive_summarizer import extractive_summary
+from .chunker import chunk_text_by_structure, chunk_by_token_windows
+from .token_counter import num_tokens_from_string
+
+# Model koji sažima konverzacije i zadani limit tokena sažetka
+SUMMARY_MODEL = "gpt-3.5-turbo"
+SUMMARY_MAX_TOKENS = 1500
+
+# Najdulji tekst (u tokenima) koji se sažima jednim pozivom modela; dulji tekst
+# se sažima map-reduceom (gpt-3.5-turbo ima kontekst od 16k tokena)
+SUMMARY_INPUT_MAX_TOKENS = int(os.getenv("SUMMARY_INPUT_MAX_TOKENS", "12000"))
+
+# Veličina chunka pri map-reduce sažimanju i najmanji sažetak jednog chunka
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "6000"))
+SUMMARY_PARTIAL_MIN_TOKENS = 200
+
+# Maksimalni broj chunkova koji se istovremeno sažimaju (za sve pozive zajedno)
+SUMMARY_MAP_WORKERS = int(os.getenv("SUMMARY_MAP_WORKERS", "4"))
+
+# Prvi izvor sažetka: "llm" čeka sažetak modela, "local" odmah vraća lokalni
+# (ekstraktivni) sažetak, a sažetak modela se radi u pozadini i zamjenjuje ga
+# kroz keš sažetaka
+TIER_LLM = "llm"
+TIER_LOCAL = "local"
+SUMMARY_PRIMARY_TIER = os.getenv("SUMMARY_PRIMARY_TIER", TIER_LLM)
+
+# Maksimalni broj sažetaka modela koji se istovremeno rade u pozadini
+SUMMARY_BACKGROUND_WORKERS = 2
+
+_background_executor: Optional[ThreadPoolExecutor] = None
+_background_keys: Set[str] = set()
+_background_lock = threading.Lock()
+_map_executor: Optional[ThreadPoolExecutor] = None
+
+def _llm_summary(conversation_text: str, max_tokens: int, previous_summary: Optional[str]) -> str:
     """
-    Komprimira kontekst konverzacije u sažetak korištenjem LLM-a.
-    
-    Args:
-        conversation_text: Tekst konverzacije za sažimanje
-        max_tokens: Maksimalni broj tokena za sažetak
-        
-    Returns:
-        Sažetak konverzacije
+    Sažima tekst pozivom modela.
+
+    Raises:
+        RuntimeError: Ako 'openai' paket nije instaliran ili OPENAI_API_KEY nije postavljen
     """
     # Provjeri da li je instaliran openai
     try:
         from openai import OpenAI
     except ImportError:
-        return "Nije moguće stvoriti sažetak jer 'openai' paket nije instaliran."
+        raise RuntimeError("'openai' paket nije instaliran")
     
     # Inicijalizacija OpenAI klijenta
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
-        return "Kreiran jednostavan sažetak jer OPENAI_API_KEY nije postavljen."
+        raise RuntimeError("OPENAI_API_KEY nije postavljen")
     
-    try:
-        client = OpenAI(api_key=api_key)
-        
-        # Pripremi prompt za sažimanje
+    client = OpenAI(api_key=api_key)
+    
+    # Pripremi prompt za sažimanje
+    if previous_summary:
+        compress_prompt = f"""
+Ažuriraj postojeći sažetak konverzacije tako da uključi nove poruke.
+Zadrži sve ključne informacije iz postojećeg sažetka, dodaj nove teme, zaključke
+i tehničke detalje, a zastarjele informacije zamijeni novima.
+
+Sažetak treba ostati kratak, ali sadržajan.
+
+POSTOJEĆI SAŽETAK:
+{previous_summary}
+
+NOVE PORUKE:
+{conversation_text}
+
+AŽURIRANI SAŽETAK:
+"""
+    else:
         compress_prompt = f"""
 Sažmi sljedeću konverzaciju u SAŽET i INFORMATIVAN rezime.
 Fokusiraj se na:
@@ -42,38 +91,158 @@ KONVERZACIJA:
 
 SAŽETAK:
 """
+    
+    # Poziv OpenAI API-ja za sažimanje
+    response = client.chat.completions.create(
+        model=SUMMARY_MODEL,  # Možemo koristiti i drugi model
+        messages=[
+            {"role": "system", "content": "Ti si stručnjak za sažimanje kompleksnih konverzacija. Tvoj zadatak je napraviti koncizni sažetak koji zadržava sve ključne informacije."},
+            {"role": "user", "content": compress_prompt}
+        ],
+        max_tokens=max_tokens,
+        temperature=0.3,  # Niža temperatura za konzistentniji output
+    )
+    
+    # Dohvati i vrati sažetak
+    return response.choices[0].message.content.strip()
+
+def _get_map_executor() -> ThreadPoolExecutor:
+    global _map_executor
+    with _background_lock:
+        if _map_executor is None:
+            _map_executor = ThreadPoolExecutor(max_workers=SUMMARY_MAP_WORKERS, thread_name_prefix="summary-map")
+        return _map_executor
+
+def _chunk_summary(text: str, max_tokens: int) -> str:
+    """Sažetak jednog chunka; chunkovi koji se nisu promijenili dolaze iz keša."""
+    key = summary_key(text, max_tokens, SUMMARY_MODEL)
+    cached = summary_cache.get(key)
+    if cached is not None:
+        return cached
+    summary = _llm_summary(text, max_tokens, None)
+    summary_cache.set(key, summary)
+    return summary
+
+def _map_reduce_summary(conversation_text: str, max_tokens: int, previous_summary: Optional[str]) -> str:
+    """
+    Sažima tekst modelom; tekst koji ne stane u jedan poziv se sažima map-reduceom.
+    
+    Tekst se dijeli po strukturi (chunk_text_by_structure), chunkovi se sažimaju
+    paralelno (najviše SUMMARY_MAP_WORKERS istovremeno), a djelomični sažetci se
+    zatim sažimaju u jedan. Budžet djelomičnih sažetaka je takav da zajedno stanu
+    u jedan poziv; ako ne stanu, redukcija se ponavlja nad njima.
+    
+    Raises:
+        Exception: Ako sažimanje bilo kojeg dijela ne uspije
+    """
+    if not conversation_text.strip():
+        # Nema novog teksta za sažimanje - ne zovemo model
+        return previous_summary or ""
+    
+    input_tokens = num_tokens_from_string(conversation_text, SUMMARY_MODEL)
+    if previous_summary:
+        input_tokens += num_tokens_from_string(previous_summary, SUMMARY_MODEL)
+    if input_tokens <= SUMMARY_INPUT_MAX_TOKENS:
+        return _llm_summary(conversation_text, max_tokens, previous_summary)
+    
+    chunk_tokens = min(SUMMARY_CHUNK_TOKENS, SUMMARY_INPUT_MAX_TOKENS)
+    chunks = chunk_text_by_structure(conversation_text, chunk_tokens, SUMMARY_MODEL)
+    if not chunks:
+        # Tekst koji se ne da podijeliti po strukturi dijelimo po tokenima, da ne ispadne iz sažetka
+        chunks = chunk_by_token_windows(conversation_text, chunk_tokens, model=SUMMARY_MODEL)
+    partial_tokens = max(SUMMARY_PARTIAL_MIN_TOKENS,
+                         min(max_tokens, SUMMARY_INPUT_MAX_TOKENS // len(chunks), chunk_tokens // 2))
+    
+    executor = _get_map_executor()
+    futures = [executor.submit(_chunk_summary, chunk.text, partial_tokens) for chunk in chunks]
+    partials = [future.result() for future in futures]
+    
+    # Prethodni sažetak se ugrađuje tek u redukciji, nad sažetcima chunkova
+    return _map_reduce_summary("\n\n".join(partials), max_tokens, previous_summary)
+
+def _cache_llm_summary(key: str, conversation_text: str, max_tokens: int,
+                       previous_summary: Optional[str], prefix_key: Optional[str]) -> str:
+    summary = _map_reduce_summary(conversation_text, max_tokens, previous_summary)
+    
+    # U keš idu samo sažetci modela, ne lokalni sažetci
+    summary_cache.set(key, summary)
+    if prefix_key is not None:
+        summary_cache.set(prefix_key, summary)
+    return summary
+
+def _schedule_llm_summary(key: str, conversation_text: str, max_tokens: int,
+                          previous_summary: Optional[str], prefix_key: Optional[str]) -> None:
+    """Zakazuje sažetak modela u pozadini; isti ključ se ne sažima dvaput istovremeno."""
+    global _background_executor
+    
+    if not os.getenv("OPENAI_API_KEY"):
+        return
+    
+    def work():
+        try:
+            _cache_llm_summary(key, conversation_text, max_tokens, previous_summary, prefix_key)
+        except Exception as e:
+            print(f"Greška pri sažimanju konteksta u pozadini: {e}")
+        finally:
+            with _background_lock:
+                _background_keys.discard(key)
+    
+    with _background_lock:
+        if key in _background_keys:
+            return
+        _background_keys.add(key)
+        if _background_executor is None:
+            _background_executor = ThreadPoolExecutor(max_workers=SUMMARY_BACKGROUND_WORKERS,
+                                                      thread_name_prefix="context-summary")
+        _background_executor.submit(work)
+
+def compress_context(conversation_text: str, max_tokens: int = SUMMARY_MAX_TOKENS,
+                     previous_summary: Optional[str] = None, prefix_key: Optional[str] = None,
+                     tier: Optional[str] = None) -> str:
+    """
+    Komprimira kontekst konverzacije u sažetak korištenjem LLM-a.
+    Sažetci iz LLM-a se spremaju u keš sažetaka, pa isti ulaz ne poziva model ponovno.
+    
+    Tekst dulji od SUMMARY_INPUT_MAX_TOKENS se sažima map-reduceom: chunkovi
+    se sažimaju paralelno, a zatim se njihovi sažetci sažimaju u jedan.
+    
+    Ako model nije dostupan, vraća se lokalni ekstraktivni sažetak. S tierom
+    "local" lokalni sažetak se vraća odmah, a sažetak modela se radi u pozadini;
+    kada završi, sljedeći poziv s istim ulazom ga dobiva iz keša.
+    
+    Args:
+        conversation_text: Tekst konverzacije za sažimanje
+        max_tokens: Maksimalni broj tokena za sažetak
+        previous_summary: Postojeći sažetak; ako je zadan, u njega se ugrađuje
+            samo novi tekst umjesto sažimanja cijele konverzacije ispočetka
+        prefix_key: Ključ prefiksa (prefix_keys) pod kojim se sažetak dodatno sprema
+        tier: "llm" ili "local" (zadano SUMMARY_PRIMARY_TIER)
         
-        # Poziv OpenAI API-ja za sažimanje
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",  # Možemo koristiti i drugi model
-            messages=[
-                {"role": "system", "content": "Ti si stručnjak za sažimanje kompleksnih konverzacija. Tvoj zadatak je napraviti koncizni sažetak koji zadržava sve ključne informacije."},
-                {"role": "user", "content": compress_prompt}
-            ],
-            max_tokens=max_tokens,
-            temperature=0.3,  # Niža temperatura za konzistentniji output
-        )
-        
-        # Dohvati i vrati sažetak
-        summary = response.choices[0].message.content.strip()
-        return summary
+    Returns:
+        Sažetak konverzacije
+    """
+    # Isti ulaz je možda već sažet (keš je adresiran sadržajem)
+    key = summary_key(conversation_text, max_tokens, SUMMARY_MODEL, previous_summary)
+    cached = summary_cache.get(key)
+    if cached is not None:
+        if prefix_key is not None:
+            summary_cache.set(prefix_key, cached)
+        return cached
+    
+    if (tier or SUMMARY_PRIMARY_TIER) == TIER_LOCAL:
+        # Ne čekamo mrežu: sažetak modela stiže u keš kasnije
+        _schedule_llm_summary(key, conversation_text, max_tokens, previous_summary, prefix_key)
+        return extractive_summary(conversation_text, max_tokens, previous_summary)
     
+    try:
+        return _cache_llm_summary(key, conversation_text, max_tokens, previous_summary, prefix_key)
     except Exception as e:
         print(f"Greška pri sažimanju konteksta: {e}")
-        # Fallback na jednostavni sažetak
-        # Analiziraj tekst da pronađeš ključne riječi
-        words = conversation_text.split()
-        top_words = set()
-        
-        # Uzmi 20 najdužih riječi kao ključne riječi (pojednostavljeno)
-        for word in sorted(set(words), key=len, reverse=True)[:20]:
-            if len(word) > 4:  # Ignoriraj kraće riječi
-                top_words.add(word.lower())
-        
-        # Kreiraj jednostavan sažetak
-        return f"Konverzacija sadrži ove ključne riječi: {', '.join(top_words)}. Razgovor ima otprilike {len(words)} riječi."
+        # Fallback na lokalni sažetak
+        return extractive_summary(conversation_text, max_tokens, previous_summary)
 
-def create_compact_context(session_messages: List[Dict[str, Any]], max_messages: int = 5) -> Dict[str, Any]:
+def create_compact_context(session_messages: List[Dict[str, Any]], max_messages: int = 5,
+                           tier: Optional[str] = None, max_tokens: int = SUMMARY_MAX_TOKENS) -> Dict[str, Any]:
     """
     Stvara kompaktni kontekst koji uključuje:
     1. Sažetak starijih poruka
@@ -82,6 +251,8 @@ def create_compact_context(session_messages: List[Dict[str, Any]], max_messages:
     Args:
         session_messages: Lista poruka iz sesije
         max_messages: Broj zadnjih poruka koje treba zadržati u cijelosti
+        tier: Prvi izvor sažetka, "llm" ili "local" (vidi compress_context)
+        max_tokens: Maksimalni broj tokena za sažetak
         
     Returns:
         Rječnik s sažetkom starijih poruka i zadnjim porukama
@@ -94,21 +265,30 @@ def create_compact_context(session_messages: List[Dict[str, Any]], max_messages:
         }
     
     # Odvoji starije poruke za sažimanje
-    older_messages = session_messages[:-max_messages]
-    recent_messages = session_messages[-max_messages:]
+    split = len(session_messages) - max_messages
+    older_messages = session_messages[:split]
+    recent_messages = session_messages[split:]
     
-    # Formatiraj starije poruke za sažimanje
-    conversation_text = ""
+    # Formatiraj starije poruke za sažimanje, svaku kao zaseban blok
+    blocks = []
     for msg in older_messages:
         agent_name = msg.get("agent", "Agent")
         message_text = msg.get("message", "")
         response_text = msg.get("response", {}).get("response", "")
         
-        conversation_text += f"KORISNIK: {message_text}\n"
-        conversation_text += f"{agent_name.upper()}: {response_text}\n\n"
+        blocks.append(f"KORISNIK: {message_text}\n{agent_name.upper()}: {response_text}\n\n")
     
-    # Sažmi starije poruke
-    summary = compress_context(conversation_text)
+    # Najdulji već sažeti prefiks starijih poruka postaje početni sažetak,
+    # pa se sažimaju samo poruke koje su stigle nakon njega
+    keys = prefix_keys(blocks, max_tokens, SUMMARY_MODEL)
+    found = summary_cache.get_longest(keys)
+    if found is None:
+        summary = compress_context("".join(blocks), max_tokens, prefix_key=keys[-1], tier=tier)
+    elif found[0] == len(blocks) - 1:
+        summary = found[1]
+    else:
+        summary = compress_context("".join(blocks[found[0] + 1:]), max_tokens, previous_summary=found[1],
+                                   prefix_key=keys[-1], tier=tier)
     
     return {
         "summary": summary,
@@ -150,4 +330,70 @@ def format_context_for_model(context: Dict[str, Any], model_format: str = "opena
         formatted_messages.append({"role": "user", "content": user_message})
         formatted_messages.append({"role": "assistant", "content": agent_response})
     
-    return formatted_messages 
\ No newline at end of file
+    return formatted_messages
+
+
+def build_agent_context(agent: str, system_prompt: str, user_message: str,
+                        previous_messages=None, model: str = "gpt-4o",
+                        max_response_tokens: int = 1500, history_tokens: Optional[int] = None,
+                        session_summary: Optional[str] = None) -> List[Dict[str, str]]:
+    """
+    Slaže poruke za poziv agenta unutar budžeta tokena.
+    
+    Historija agenta se puni od najnovije poruke dok ne potroši budžet
+    (manji od history_tokens i mjesta koje ostaje u kontekstu modela nakon
+    system prompta, trenutne poruke i odgovora). Ako starije poruke ne stanu,
+    umjesto njih ide sažetak sesije, pa veličina prompta ne raste s dužinom sesije.
+    Bez sažetka sesije izostavljene poruke agenta sažima create_compact_context
+    (lokalni sažetak odmah, sažetak modela u pozadini), unutar četvrtine budžeta.
+    
+    Args:
+        agent: Naziv agenta čija se historija koristi
+        system_prompt: System prompt agenta
+        user_message: Trenutna poruka korisnika
+        previous_messages: SessionHistory ili lista poruka sesije
+        model: Model za koji se računa kontekst
+        max_response_tokens: Tokeni rezervirani za odgovor modela
+        history_tokens: Budžet tokena za historiju (zadano AGENT_HISTORY_MAX_TOKENS)
+        session_summary: Sažetak sesije koji zamjenjuje izostavljene poruke
+        
+    Returns:
+        Lista poruka spremna za chat API
+    """
+    # Import ovdje da se izbjegne cirkularni import
+    from .token_counter import estimate_tokens_left, count_message_tokens
+    from .session_store import agent_window, agent_chat_messages, AGENT_HISTORY_MAX_TOKENS
+    
+    system = {"role": "system", "content": system_prompt}
+    user = {"role": "user", "content": user_message}
+    if not previous_messages:
+        return [system, user]
+    
+    budget = AGENT_HISTORY_MAX_TOKENS if history_tokens is None else history_tokens
+    budget = min(budget, estimate_tokens_left([system, user], model) - max_response_tokens)
+    
+    # Mjesto za sažetak se rezervira unaprijed kako prompt ne bi prešao budžet
+    summary_messages = format_context_for_model({"summary": session_summary}) if session_summary else []
+    if summary_messages:
+        budget -= count_message_tokens(summary_messages, model)
+    
+    window, truncated = agent_window(previous_messages, agent, max(0, budget))
+    
+    if truncated and not summary_messages:
+        # Izostavljene poruke se sažimaju ovdje; dio budžeta ide sažetku, ostatak zadnjim porukama
+        summary_tokens = min(SUMMARY_MAX_TOKENS, max(0, budget) // 4)
+        summary_tokens -= count_message_tokens(format_context_for_model({"summary": " "}), model)
+        if summary_tokens > 0:
+            window, _ = agent_window(previous_messages, agent, budget - budget // 4)
+            entries, _ = agent_window(previous_messages, agent, None)
+            compact = create_compact_context(entries, max_messages=len(window), tier=TIER_LOCAL,
+                                             max_tokens=summary_tokens)
+            summary_messages = format_context_for_model({"summary": compact["summary"]})
+    
+    messages = [system]
+    if truncated:
+        messages.extend(summary_messages)
+    for entry in window:
+        messages.extend(agent_chat_messages(entry))
+    messages.append(user)
+    return messages
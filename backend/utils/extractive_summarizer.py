@@ -0,0 +1,174 @@
+import re
+import math
+from typing import Dict, List, Optional
+
+# NumPy ubrzava bodovanje dugih tekstova, ali je opcionalan; bez njega se računa u čistom Pythonu
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .token_counter import num_tokens_from_string
+
+# Rečenice kraće od ovoliko riječi se ne uzimaju u sažetak
+EXTRACTIVE_MIN_WORDS = 4
+
+# Najdulja rečenica (u znakovima) koja ulazi u sažetak; dulje se skraćuju
+EXTRACTIVE_MAX_SENTENCE_CHARS = 400
+
+# Česte riječi (hrvatski i engleski) koje ne nose temu rečenice
+STOPWORDS = frozenset("""
+    ali ako bi bih bio bila bilo biti će ćemo ćete ću da do ga gdje i ih ili iz ja je
+    jer još kako kao kad kada koja koje koji kojim li mi mogu može na nad ne nije nisu od
+    oni ono po pod pa sam samo se si smo ste su sve svi ta taj te to treba u uz vam vas već
+    za što the and for that this with are was were you your have has not but can will
+    from they them then there their what when which would could should into about also
+    korisnik agent
+""".split())
+
+_FENCE = re.compile(r"```.*?(?:```|$)", re.S)
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"\w+", re.U)
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Dijeli tekst na rečenice: po redovima i po interpunkciji na kraju rečenice.
+    Blokovi koda (```) se izostavljaju jer ne ulaze u sažetak kao rečenice.
+
+    Args:
+        text: Tekst za podjelu
+
+    Returns:
+        Lista rečenica redom kojim se pojavljuju
+    """
+    sentences = []
+    for line in _FENCE.sub("\n", text).splitlines():
+        for sentence in _SENTENCE_END.split(line.strip()):
+            sentence = sentence.strip()
+            if sentence:
+                sentences.append(sentence)
+    return sentences
+
+def _terms(sentence: str) -> List[str]:
+    return [word for word in _WORD.findall(sentence.lower())
+            if len(word) > 2 and word not in STOPWORDS and not word.isdigit()]
+
+def score_sentences(sentences: List[List[str]]) -> List[float]:
+    """
+    Boduje rečenice TF-IDF sličnošću s centroidom teksta.
+
+    Svaka rečenica je vektor težina (1 + log tf) * idf; rečenica je to važnija
+    što je njen normirani vektor bliži prosjeku svih rečenica, tj. što više
+    pokriva teme koje se u tekstu ponavljaju. Računa se u O(broj riječi), bez
+    matrice sličnosti rečenica.
+
+    Args:
+        sentences: Pojmovi svake rečenice (rezultat tokenizacije)
+
+    Returns:
+        Bod svake rečenice (0 za rečenice bez pojmova)
+    """
+    vocabulary: Dict[str, int] = {}
+    rows: List[int] = []
+    columns: List[int] = []
+    counts: List[int] = []
+    for row, terms in enumerate(sentences):
+        tf: Dict[int, int] = {}
+        for term in terms:
+            column = vocabulary.setdefault(term, len(vocabulary))
+            tf[column] = tf.get(column, 0) + 1
+        rows.extend([row] * len(tf))
+        columns.extend(tf.keys())
+        counts.extend(tf.values())
+
+    n = len(sentences)
+    if not counts:
+        return [0.0] * n
+
+    if numpy is not None:
+        return _score_numpy(n, len(vocabulary), rows, columns, counts)
+
+    # Isti izračun bez NumPy-a
+    df = [0] * len(vocabulary)
+    for column in columns:
+        df[column] += 1
+    idf = [math.log((1 + n) / (1 + d)) + 1 for d in df]
+    weights = [(1 + math.log(count)) * idf[column] for column, count in zip(columns, counts)]
+
+    norms = [0.0] * n
+    for row, weight in zip(rows, weights):
+        norms[row] += weight * weight
+    norms = [math.sqrt(norm) or 1.0 for norm in norms]
+
+    centroid = [0.0] * len(vocabulary)
+    for row, column, weight in zip(rows, columns, weights):
+        centroid[column] += weight / norms[row]
+
+    scores = [0.0] * n
+    for row, column, weight in zip(rows, columns, weights):
+        scores[row] += weight * centroid[column]
+    return [score / (norm * n) for score, norm in zip(scores, norms)]
+
+def _score_numpy(n: int, size: int, rows: List[int], columns: List[int], counts: List[int]) -> List[float]:
+    # Rijetka matrica u obliku (redak, stupac, vrijednost); sve sume su bincount
+    rows = numpy.asarray(rows, dtype=numpy.int64)
+    columns = numpy.asarray(columns, dtype=numpy.int64)
+    counts = numpy.asarray(counts, dtype=numpy.float64)
+
+    df = numpy.bincount(columns, minlength=size)
+    idf = numpy.log((1 + n) / (1 + df)) + 1
+    weights = (1 + numpy.log(counts)) * idf[columns]
+
+    norms = numpy.sqrt(numpy.bincount(rows, weights * weights, minlength=n))
+    norms[norms == 0] = 1.0
+    centroid = numpy.bincount(columns, weights / norms[rows], minlength=size)
+    scores = numpy.bincount(rows, weights * centroid[columns], minlength=n)
+    return (scores / (norms * n)).tolist()
+
+def extractive_summary(text: str, max_tokens: int = 1500, previous_summary: Optional[str] = None,
+                       model: str = "gpt-4o") -> str:
+    """
+    Lokalni sažetak teksta: najvažnije rečenice, bez poziva modela.
+
+    Rečenice se boduju (score_sentences) i uzimaju od najvažnije dok ne
+    potroše max_tokens, a u sažetku stoje redom kojim su se pojavile u
+    tekstu. Ponovljene rečenice ulaze samo jednom.
+
+    Args:
+        text: Tekst za sažimanje
+        max_tokens: Maksimalni broj tokena sažetka
+        previous_summary: Postojeći sažetak koji se sažima zajedno s tekstom
+        model: Model prema kojem se broje tokeni
+
+    Returns:
+        Sažetak (prazan string ako tekst nema rečenica)
+    """
+    if previous_summary:
+        text = f"{previous_summary}\n{text}"
+
+    sentences = []
+    seen = set()
+    for sentence in split_sentences(text):
+        if len(sentence) > EXTRACTIVE_MAX_SENTENCE_CHARS:
+            sentence = sentence[:EXTRACTIVE_MAX_SENTENCE_CHARS].rsplit(" ", 1)[0] + "..."
+        key = sentence.lower()
+        if key in seen or len(sentence.split()) < EXTRACTIVE_MIN_WORDS:
+            continue
+        seen.add(key)
+        sentences.append(sentence)
+
+    scores = score_sentences([_terms(sentence) for sentence in sentences])
+
+    # Kod jednakih bodova prednost imaju kasnije (novije) rečenice
+    ranked = sorted(range(len(sentences)), key=lambda i: (scores[i], i), reverse=True)
+    chosen = []
+    used = 0
+    for index in ranked:
+        if max_tokens - used < EXTRACTIVE_MIN_WORDS:
+            break
+        tokens = num_tokens_from_string(sentences[index], model) + 1
+        if used + tokens > max_tokens:
+            continue
+        chosen.append(index)
+        used += tokens
+    return "\n".join(sentences[index] for index in sorted(chosen))
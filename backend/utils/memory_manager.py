@@ -1,13 +1,37 @@
 import os
 import json
 import time
+import atexit
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 import uuid
 
+from .memory_storage import MemoryStorage, create_memory_storage
+from .summary_queue import SummaryQueue
+from .session_order import SESSIONS_PAGE_SIZE
+
 # Lokacija za čuvanje memorije
 MEMORY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "memory")
 
+# Backend za pohranu sesija: "file" (zadano) ili "sqlite"
+MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "file")
+
+# Putanja do SQLite baze (zadano memory/_memory.db)
+MEMORY_DB_PATH = os.getenv("MEMORY_DB_PATH")
+
+# Vodi li /chat sažetak sesije kroz MemoryManager ("true" uključuje); tada se svaka
+# sesija dodatno sprema u MEMORY_DIR i sažima u pozadini nakon 10 poruka
+CHAT_SESSION_SUMMARY = os.getenv("CHAT_SESSION_SUMMARY", "false").lower() == "true"
+
+# Nakon koliko ugradnji se razina sažetka ugrađuje u sljedeću (0 isključuje razine)
+SUMMARY_TIER_FOLDS = 8
+
+# Maksimalni broj razina sažetka; najgrublja razina se samo ažurira
+SUMMARY_MAX_TIERS = 3
+
+# Koliko sekundi pri gašenju čekamo na sažimanja koja su u tijeku
+SHUTDOWN_SUMMARY_TIMEOUT = 10.0
+
 class MemoryManager:
     """
     Upravlja memorijom agenata i sesijama konverzacija.
@@ -16,40 +40,50 @@ class MemoryManager:
     - Sažimanje dugih sesija
     - Pristup povijesti konverzacija
     - Perzistentno čuvanje razgovora
+    
+    Sesije se čuvaju kroz zamjenjivu pohranu (MemoryStorage): fajlove sa
+    snapshotom i journalom po sesiji ili SQLite bazu.
     """
     
-    def __init__(self):
-        """Inicijalizira MemoryManager."""
+    def __init__(self, storage: Optional[MemoryStorage] = None):
+        """
+        Inicijalizira MemoryManager.
+        
+        Args:
+            storage: Pohrana sesija; ako nije zadana, bira se prema MEMORY_BACKEND
+        """
         # Osiguraj da direktorij za memoriju postoji
         if not os.path.exists(MEMORY_DIR):
             os.makedirs(MEMORY_DIR)
         
-        # Aktivne sesije u memoriji
-        self.sessions = {}
+        self.storage = storage or create_memory_storage(MEMORY_BACKEND, MEMORY_DIR, MEMORY_DB_PATH)
         
-        # Sažetci sesija
-        self.session_summaries = {}
+        # Sažimanje dugih sesija ide u pozadini, izvan obrade zahtjeva
+        self.summary_queue = SummaryQueue(self._summarize_session)
         
-        # Učitaj postojeće sesije
-        self._load_sessions()
+        # Pohrana upisuje promjene odgođeno, pa se pri izlasku iz procesa sve upisuje
+        self._closed = False
+        atexit.register(self.close)
     
-    def _load_sessions(self):
-        """Učitava postojeće sesije iz datoteka."""
+    def flush(self) -> None:
+        """Upisuje na disk sve promjene sesija koje još čekaju u memoriji."""
+        self.storage.flush()
+    
+    def close(self) -> None:
+        """
+        Završava zakazana sažimanja i upisuje sve promjene na disk.
+        Poziva se pri gašenju aplikacije (i automatski pri izlasku iz procesa).
+        """
+        if self._closed:
+            return
+        self._closed = True
+        
+        if not self.summary_queue.flush(timeout=SHUTDOWN_SUMMARY_TIMEOUT):
+            print("Sažimanje sesija nije završilo prije gašenja")
         try:
-            for filename in os.listdir(MEMORY_DIR):
-                if filename.endswith(".json"):
-                    session_id = filename.split(".")[0]
-                    file_path = os.path.join(MEMORY_DIR, filename)
-                    
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        session_data = json.load(f)
-                        self.sessions[session_id] = session_data
-                        
-                        # Ako sesija ima sažetak, učitaj ga
-                        if 'summary' in session_data:
-                            self.session_summaries[session_id] = session_data['summary']
+            self.storage.close()
         except Exception as e:
-            print(f"Greška pri učitavanju sesija: {e}")
+            print(f"Greška pri zatvaranju pohrane memorije: {e}")
     
     def save_to_session(self, session_id: str, agent: str, message: str, response: Dict[str, Any]) -> None:
         """
@@ -64,67 +98,56 @@ class MemoryManager:
         if not session_id:
             session_id = str(uuid.uuid4())
         
-        # Provjeri postoji li sesija, ako ne postoji, kreiraj novu
-        if session_id not in self.sessions:
-            self.sessions[session_id] = {
-                'messages': [],
-                'created_at': datetime.now().isoformat(),
-                'agents_used': set(),
-                'summary': "Nova sesija započeta."
-            }
-        
-        # Dodaj agenta u set korištenih agenata
-        if 'agents_used' in self.sessions[session_id]:
-            if isinstance(self.sessions[session_id]['agents_used'], set):
-                self.sessions[session_id]['agents_used'].add(agent)
-            else:
-                self.sessions[session_id]['agents_used'] = {agent}
-        else:
-            self.sessions[session_id]['agents_used'] = {agent}
-        
-        # Dodaj poruku u sesiju
-        self.sessions[session_id]['messages'].append({
+        # Dodaj poruku u sesiju (sesija se kreira ako ne postoji)
+        entry = {
             'agent': agent,
             'message': message,
             'response': response,
             'timestamp': datetime.now().isoformat()
-        })
-        
-        # Spremi sesiju u datoteku
-        self._save_session(session_id)
+        }
+        try:
+            message_count = self.storage.append_message(session_id, entry, datetime.now().isoformat())
+        except Exception as e:
+            print(f"Greška pri spremanju sesije {session_id}: {e}")
+            return
         
-        # Ako je sesija postala prevelika, napravi sažetak
-        if len(self.sessions[session_id]['messages']) > 10:
-            self._summarize_session(session_id)
+        # Ako je sesija postala prevelika, zakaži sažetak (ne čekamo ga)
+        if message_count > 10:
+            self.summary_queue.schedule(session_id)
     
-    def _save_session(self, session_id: str) -> None:
-        """Sprema sesiju u datoteku."""
+    def _fold_summary(self, previous: str, text: str, fallback: str) -> str:
+        """Ugrađuje novi tekst u postojeći sažetak jednim pozivom kompresora."""
+        # Import ovdje da se izbjegne cirkularni import
+        from .context_compressor_agent import compress_context, TIER_LLM
+        
+        # Sažimanje sesije je već u pozadini, pa čeka sažetak modela i kada je
+        # lokalni sažetak prvi izvor; kompresor sam pada na lokalni sažetak
         try:
-            file_path = os.path.join(MEMORY_DIR, f"{session_id}.json")
-            
-            # Pretvorimo set u listu za json serijalizaciju
-            session_data = self.sessions[session_id].copy()
-            if 'agents_used' in session_data and isinstance(session_data['agents_used'], set):
-                session_data['agents_used'] = list(session_data['agents_used'])
-            
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(session_data, f, ensure_ascii=False, indent=2)
+            summary = compress_context(text, previous_summary=previous or None, tier=TIER_LLM)
         except Exception as e:
-            print(f"Greška pri spremanju sesije {session_id}: {e}")
+            print(f"Greška pri sažimanju sesije: {e}")
+            return fallback
+        return summary or fallback
     
     def _summarize_session(self, session_id: str) -> None:
         """
         Stvara sažetak sesije kada postane prevelika.
         Ovo je ključno za očuvanje konteksta bez prekoračenja limita tokena.
-        """
-        # Import ovdje da se izbjegne cirkularni import
-        from .context_compressor_agent import compress_context
+        Poziva se iz pozadinskog reda za sažimanje (SummaryQueue).
         
-        if session_id not in self.sessions:
+        Sažetak je inkrementalan: u postojeći sažetak se ugrađuju samo poruke
+        iza watermarka. Sažetak je podijeljen u razine; najfinija razina prima
+        nove poruke, a nakon SUMMARY_TIER_FOLDS ugradnji se sama ugrađuje u
+        sljedeću, grublju razinu. Trošak po sažimanju tako ne raste s dužinom sesije.
+        """
+        state = self.storage.get_summary_state(session_id)
+        if state is None:
             return
         
-        # Dohvati sve poruke sesije
-        messages = self.sessions[session_id]['messages']
+        # Dohvati samo poruke koje još nisu u sažetku
+        messages, watermark = self.storage.get_unsummarized_messages(session_id)
+        if not messages:
+            return
         
         # Pripremimo tekst za sažimanje
         conversation_text = "\n\n".join([
@@ -133,23 +156,38 @@ class MemoryManager:
             for msg in messages
         ])
         
-        # Privremeni mock implementacija dok ne stvorimo pravi kompressor
-        if 'compress_context' not in globals():
-            # Ako funkcija compress_context još nije dostupna, koristimo jednostavni sažetak
-            summary = f"Razgovor ima {len(messages)} poruka. Teme uključuju: {', '.join([msg['agent'] for msg in messages[:5]])}..."
-        else:
-            # Inače koristimo pravu implementaciju
-            summary = compress_context(conversation_text)
+        tiers = state['tiers']
+        if not tiers:
+            # Postojeći sažetak (ako ga ima) postaje najfinija razina
+            tiers = [{'summary': state['summary'] if state['watermark'] else "", 'folds': 0}]
         
-        # Sažetak spremi u sesiju
-        self.sessions[session_id]['summary'] = summary
-        self.session_summaries[session_id] = summary
+        topics = ', '.join([msg['agent'] for msg in messages[:5]])
+        tiers[0]['summary'] = self._fold_summary(
+            tiers[0]['summary'], conversation_text,
+            f"Razgovor ima {watermark} poruka. Teme uključuju: {topics}..."
+        )
+        tiers[0]['folds'] += 1
         
-        # Također spremi i komprimirani set poruka (zadrži samo zadnjih 15)
-        self.sessions[session_id]['messages'] = messages[-15:]
+        # Puna razina se ugrađuje u sljedeću razinu i kreće ispočetka
+        level = 0
+        while (SUMMARY_TIER_FOLDS and level + 1 < SUMMARY_MAX_TIERS
+               and tiers[level]['folds'] >= SUMMARY_TIER_FOLDS):
+            if level + 1 == len(tiers):
+                tiers.append({'summary': "", 'folds': 0})
+            upper = tiers[level + 1]
+            upper['summary'] = self._fold_summary(upper['summary'], tiers[level]['summary'], tiers[level]['summary'])
+            upper['folds'] += 1
+            tiers[level] = {'summary': "", 'folds': 0}
+            level += 1
         
-        # Spremi ažuriranu sesiju
-        self._save_session(session_id)
+        # Ukupni sažetak ide od najgrublje (najstarije) prema najfinijoj razini
+        summary = "\n\n".join(tier['summary'] for tier in reversed(tiers) if tier['summary'])
+        
+        # Sažetak spremi u sesiju i zadrži samo zadnjih 15 poruka
+        try:
+            self.storage.set_summary(session_id, summary, keep_last=15, watermark=watermark, tiers=tiers)
+        except Exception as e:
+            print(f"Greška pri spremanju sažetka sesije {session_id}: {e}")
     
     def get_session_messages(self, session_id: str) -> List[Dict[str, Any]]:
         """
@@ -161,9 +199,7 @@ class MemoryManager:
         Returns:
             Lista poruka u sesiji
         """
-        if session_id in self.sessions and 'messages' in self.sessions[session_id]:
-            return self.sessions[session_id]['messages']
-        return []
+        return self.storage.get_messages(session_id)
     
     def get_session_summary(self, session_id: str) -> str:
         """
@@ -175,11 +211,24 @@ class MemoryManager:
         Returns:
             Sažetak sesije ili prazan string ako sesija ne postoji
         """
-        if session_id in self.sessions and 'summary' in self.sessions[session_id]:
-            return self.sessions[session_id]['summary']
-        return ""
+        return self.storage.get_summary(session_id) or ""
+    
+    def get_context_summary(self, session_id: str) -> str:
+        """
+        Dohvaća sažetak sesije za kontekst agenta.
+        
+        Args:
+            session_id: ID sesije
+            
+        Returns:
+            Sažetak već sažetih poruka ili prazan string ako sesija još nije sažeta
+        """
+        state = self.storage.get_summary_state(session_id)
+        if not state or not state['watermark']:
+            return ""
+        return state['summary'] or ""
     
-    def get_recent_context(self, session_id: str, max_messages: int = 5) -> Dict[str, Any]:
+    def get_recent_context(self, session_id: str, max_messages: int = 5, max_tokens: Optional[int] = None, model: str = "gpt-4o") -> Dict[str, Any]:
         """
         Dohvaća kontekst za nastavak konverzacije:
         - Sažetak sesije
@@ -188,6 +237,8 @@ class MemoryManager:
         Args:
             session_id: ID sesije
             max_messages: Maksimalni broj poruka za uključivanje
+            max_tokens: Opcionalni limit tokena za zadnje poruke (novije poruke imaju prednost)
+            model: Model za brojanje tokena
             
         Returns:
             Rječnik s kontekstom koji sadrži sažetak i zadnje poruke
@@ -197,10 +248,31 @@ class MemoryManager:
             'recent_messages': []
         }
         
-        if session_id in self.sessions and 'messages' in self.sessions[session_id]:
-            # Uzmi zadnjih N poruka
-            messages = self.sessions[session_id]['messages']
-            context['recent_messages'] = messages[-max_messages:] if len(messages) > max_messages else messages
+        # Uzmi zadnjih N poruka (pohrana čita samo njih)
+        context['recent_messages'] = self.storage.get_messages(session_id, limit=max_messages)
+        
+        if max_tokens is not None and context['recent_messages']:
+            # Import ovdje da se izbjegne cirkularni import
+            from .token_counter import count_tokens_batch
+            
+            # Sve poruke brojimo jednim batch pozivom
+            recent = context['recent_messages']
+            counts = count_tokens_batch([
+                f"{msg.get('message', '')}\n{msg.get('response', {}).get('response', '')}"
+                for msg in recent
+            ], model)
+            
+            # Punimo kontekst od najnovije poruke dok ne potrošimo budžet
+            used_tokens = 0
+            keep = 0
+            for count in reversed(counts):
+                if used_tokens + count > max_tokens:
+                    break
+                used_tokens += count
+                keep += 1
+            
+            context['recent_messages'] = recent[len(recent) - keep:]
+            context['token_count'] = used_tokens
         
         return context
     
@@ -214,51 +286,35 @@ class MemoryManager:
         Returns:
             True ako je sesija uspješno obrisana, False inače
         """
-        if session_id in self.sessions:
-            del self.sessions[session_id]
-            
-            if session_id in self.session_summaries:
-                del self.session_summaries[session_id]
-            
-            # Obriši datoteku sesije
-            file_path = os.path.join(MEMORY_DIR, f"{session_id}.json")
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            
-            return True
-        return False
+        try:
+            return self.storage.delete_session(session_id)
+        except Exception as e:
+            print(f"Greška pri brisanju sesije {session_id}: {e}")
+            return False
     
     def list_sessions(self) -> List[Dict[str, Any]]:
         """
         Lista sve dostupne sesije s osnovnim informacijama.
+        Podaci dolaze iz indeksa pohrane, pa se poruke sesija ne učitavaju.
         
         Returns:
-            Lista sesija s njihovim osnovnim metapodacima
+            Lista sesija s njihovim osnovnim metapodacima (novije prvo)
+        """
+        return self.storage.list_sessions()
+    
+    def list_sessions_page(self, limit: int = SESSIONS_PAGE_SIZE, after: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
         """
-        result = []
+        Lista jednu stranicu sesija, novije prvo. Cijena ovisi o veličini
+        stranice, a ne o ukupnom broju sesija.
         
-        for session_id, session_data in self.sessions.items():
-            summary = session_data.get('summary', 'Nema sažetka')
-            created_at = session_data.get('created_at', 'Nepoznato vrijeme')
-            
-            agents = []
-            if 'agents_used' in session_data:
-                agents = list(session_data['agents_used']) if isinstance(session_data['agents_used'], set) else session_data['agents_used']
-            
-            num_messages = len(session_data.get('messages', []))
+        Args:
+            limit: Broj sesija na stranici
+            after: Kursor iz prethodne stranice (None za prvu stranicu)
             
-            result.append({
-                'session_id': session_id,
-                'created_at': created_at,
-                'summary': summary,
-                'agents_used': agents,
-                'message_count': num_messages
-            })
-        
-        # Sortiraj po vremenu kreiranja (novije prvo)
-        result.sort(key=lambda x: x['created_at'], reverse=True)
-        
-        return result
+        Returns:
+            Metapodaci sesija i kursor sljedeće stranice (None ako je zadnja)
+        """
+        return self.storage.list_sessions_page(limit, after)
 
 # Instanciraj globalni memory manager
 memory_manager = MemoryManager() 
\ No newline at end of file
@@ -0,0 +1,1184 @@
+import os
+import json
+import sqlite3
+import threading
+import functools
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple, Callable
+
+from .session_cache import SessionCache
+from .session_snapshot import SNAPSHOT_EXTENSION, write_snapshot, read_snapshot
+from .write_behind import WriteBehindQueue
+from .session_order import SessionOrder, SESSIONS_PAGE_SIZE, encode_cursor, decode_cursor
+
+# Nakon koliko zapisa u journalu se sesija kompaktira u snapshot
+JOURNAL_COMPACT_EVERY = 50
+
+# Format snapshota sesija u fajlovima: "binary" (komprimirani zapisi) ili "json"
+SNAPSHOT_FORMAT = os.getenv("MEMORY_SNAPSHOT_FORMAT", "binary")
+
+# Trajnost upisa: "fsync" (svaki grupni upis se sinkronizira na disk) ili "os"
+# (podaci se predaju operativnom sustavu, bez fsync-a)
+MEMORY_DURABILITY = os.getenv("MEMORY_DURABILITY", "os")
+
+# Indeks sesija i log sažetaka (imena počinju s "_" da se ne miješaju sa sesijama)
+INDEX_FILE = "_index.jsonl"
+SUMMARIES_PREFIX = "_summaries"
+
+# Indeks se prepisuje kada broj zapisa premaši ovaj faktor broja sesija
+INDEX_COMPACT_FACTOR = 4
+
+def _sync(f) -> None:
+    """Sinkronizira otvoreni fajl na disk."""
+    f.flush()
+    os.fsync(f.fileno())
+
+class SessionIndex:
+    """
+    Kompaktni indeks sesija na disku.
+    
+    Za svaku sesiju pamti created_at, broj poruka, korištene agente te offset i
+    dužinu sažetka u logu sažetaka, pa se lista sesija može vratiti bez čitanja
+    poruka. Sesije su u memoriji sortirane po created_at (SessionOrder) za
+    listanje po stranicama. Indeks je append-only (jedan red po promjeni, zadnji zapis pobjeđuje),
+    a sažetci se dodaju na kraj zasebnog loga. Kada se nakupi previše zastarjelih
+    zapisa, oba fajla se prepisuju i indeks se atomski zamjenjuje.
+    
+    Ako je zadan writer, redovi indeksa se predaju njemu (odgođeni upis), a
+    kompakciju pokreće vlasnik indeksa kada needs_compaction() to zatraži.
+    
+    Fajlovi indeksa nastaju tek pri prvom upisu. Zapisi dodani s persist=False
+    (sesije pronađene pri učitavanju, kojih još nema u indeksu) drže se samo u
+    memoriji i upisuju se zajedno s prvom sljedećom promjenom indeksa ili kroz
+    save_unsaved(), pa samo pokretanje (ili import) ne stvara fajlove u
+    direktoriju memorije.
+    """
+    
+    def __init__(self, directory: str, writer: Optional[Callable[[str], None]] = None, fsync: bool = False):
+        self.directory = directory
+        self.path = os.path.join(directory, INDEX_FILE)
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.order = SessionOrder()
+        self.records = 0
+        self.summaries_file = f"{SUMMARIES_PREFIX}.0.log"
+        self.exists = False
+        self.writer = writer
+        self.fsync = fsync
+        
+        # Sesije dodane u indeks bez upisa na disk i njihovi sažetci (None ako nema novog)
+        self.unsaved: Dict[str, Optional[str]] = {}
+    
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self.entries
+    
+    def load(self) -> None:
+        """Učitava indeks s diska; nepotpun zadnji red se odbacuje."""
+        self.entries = {}
+        self.unsaved = {}
+        self.records = 0
+        self.exists = os.path.exists(self.path)
+        if not self.exists:
+            return
+        
+        valid_bytes = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("nepotpun zapis")
+                    record = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    break
+                valid_bytes += len(line)
+                self.records += 1
+                
+                if 'summaries' in record:
+                    self.summaries_file = record['summaries']
+                elif record.get('deleted'):
+                    self.entries.pop(record['session_id'], None)
+                else:
+                    self.entries[record.pop('session_id')] = record
+        
+        if valid_bytes < os.path.getsize(self.path):
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_bytes)
+        
+        self.order = SessionOrder((session_id, entry.get('created_at', 'Nepoznato vrijeme')) for session_id, entry in self.entries.items())
+    
+    def _summaries_path(self, name: Optional[str] = None) -> str:
+        return os.path.join(self.directory, name or self.summaries_file)
+    
+    def _append(self, record: Dict[str, Any]) -> None:
+        unsaved = self._unsaved_lines()
+        lines = []
+        if not self.exists:
+            # Novi indeks počinje zapisom koji imenuje log sažetaka
+            lines.append(json.dumps({'summaries': self.summaries_file}) + "\n")
+            self.exists = True
+        lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+        self.records += len(lines)
+        
+        self._write_or_queue(unsaved + lines)
+    
+    def _write_or_queue(self, lines: List[str]) -> None:
+        if not lines:
+            return
+        if self.writer is not None:
+            for line in lines:
+                self.writer(line)
+            return
+        
+        self.write_lines(lines)
+        if self.needs_compaction():
+            self.compact()
+    
+    def _unsaved_lines(self) -> List[str]:
+        """Upisuje sažetke neupisanih sesija u log i vraća njihove redove indeksa."""
+        lines = []
+        if self.unsaved and not self.exists:
+            lines.append(json.dumps({'summaries': self.summaries_file}) + "\n")
+            self.exists = True
+        for session_id, summary in self.unsaved.items():
+            entry = self.entries.get(session_id)
+            if entry is None:
+                continue
+            if summary is not None:
+                entry['summary_offset'], entry['summary_length'] = self._write_summary(summary)
+            lines.append(json.dumps(dict(entry, session_id=session_id), ensure_ascii=False) + "\n")
+        self.records += len(lines)
+        self.unsaved = {}
+        return lines
+    
+    def save_unsaved(self) -> None:
+        """
+        Upisuje zapise dodane s persist=False izravno u indeks, mimo writera.
+        Vlasnik indeksa ga poziva pod istim lockom pod kojim upisuje redove writera.
+        """
+        lines = self._unsaved_lines()
+        if lines:
+            self.write_lines(lines)
+    
+    def write_lines(self, lines: List[str]) -> None:
+        """Dodaje gotove redove na kraj indeksa."""
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write("".join(lines))
+            if self.fsync:
+                _sync(f)
+    
+    def needs_compaction(self) -> bool:
+        return self.records > INDEX_COMPACT_FACTOR * max(len(self.entries), 16)
+    
+    def _write_summary(self, summary: str, path: Optional[str] = None) -> Tuple[int, int]:
+        """Dodaje sažetak na kraj loga i vraća njegov offset i dužinu u bajtovima."""
+        data = summary.encode('utf-8')
+        with open(path or self._summaries_path(), 'ab') as f:
+            offset = f.tell()
+            f.write(data)
+            if self.fsync and path is None:
+                _sync(f)
+        return offset, len(data)
+    
+    def read_summary(self, session_id: str) -> Optional[str]:
+        """Čita sažetak sesije iz loga sažetaka prema offsetu iz indeksa."""
+        if self.unsaved.get(session_id) is not None:
+            return self.unsaved[session_id]
+        entry = self.entries.get(session_id)
+        if entry is None or entry.get('summary_offset') is None:
+            return None
+        with open(self._summaries_path(), 'rb') as f:
+            f.seek(entry['summary_offset'])
+            return f.read(entry['summary_length']).decode('utf-8')
+    
+    def update(self, session_id: str, created_at: str, message_count: int,
+               agents_used: List[str], summary: Optional[str] = None, persist: bool = True) -> None:
+        """
+        Zapisuje nove metapodatke sesije.
+        
+        Args:
+            session_id: ID sesije
+            created_at: Vrijeme kreiranja sesije
+            message_count: Broj poruka u sesiji
+            agents_used: Korišteni agenti
+            summary: Novi sažetak ili None ako se sažetak nije promijenio
+            persist: False ako se zapis upisuje tek uz sljedeću promjenu indeksa
+        """
+        if not persist:
+            self.entries[session_id] = {
+                'created_at': created_at,
+                'message_count': message_count,
+                'agents_used': list(agents_used),
+                'summary_offset': None,
+                'summary_length': 0
+            }
+            self.unsaved[session_id] = summary
+            self.order.add(session_id, created_at)
+            return
+        
+        # Neupisani zapisi idu na disk prije promjene koja se na njih može nadovezati
+        if session_id in self.unsaved:
+            self._write_or_queue(self._unsaved_lines())
+        
+        previous = self.entries.get(session_id, {})
+        entry = {
+            'created_at': created_at,
+            'message_count': message_count,
+            'agents_used': list(agents_used),
+            'summary_offset': previous.get('summary_offset'),
+            'summary_length': previous.get('summary_length', 0)
+        }
+        if summary is not None:
+            entry['summary_offset'], entry['summary_length'] = self._write_summary(summary)
+        
+        if entry == previous:
+            return
+        self.entries[session_id] = entry
+        self.order.add(session_id, created_at)
+        self._append(dict(entry, session_id=session_id))
+    
+    def delete(self, session_id: str) -> None:
+        """Uklanja sesiju iz indeksa."""
+        self.order.remove(session_id)
+        if session_id in self.unsaved:
+            # Sesija nikad nije upisana u indeks, pa ni brisanje nema što upisati
+            del self.unsaved[session_id]
+            self.entries.pop(session_id, None)
+            return
+        if self.entries.pop(session_id, None) is not None:
+            self._append({'session_id': session_id, 'deleted': True})
+    
+    def compact(self) -> None:
+        """
+        Prepisuje indeks i log sažetaka tako da sadrže samo aktualne zapise.
+        Novi log sažetaka dobiva novo ime, pa indeks uvijek pokazuje na log
+        s kojim su njegovi offseti zapisani, čak i ako se proces prekine usred kompakcije.
+        """
+        generation = int(self.summaries_file.split(".")[1]) + 1
+        new_summaries = f"{SUMMARIES_PREFIX}.{generation}.log"
+        new_summaries_path = self._summaries_path(new_summaries)
+        if os.path.exists(new_summaries_path):
+            os.remove(new_summaries_path)
+        
+        lines = [json.dumps({'summaries': new_summaries})]
+        for session_id, entry in self.entries.items():
+            summary = self.read_summary(session_id)
+            if summary is not None:
+                entry['summary_offset'], entry['summary_length'] = self._write_summary(summary, new_summaries_path)
+            lines.append(json.dumps(dict(entry, session_id=session_id), ensure_ascii=False))
+        
+        if self.fsync and os.path.exists(new_summaries_path):
+            with open(new_summaries_path, 'ab') as f:
+                _sync(f)
+        
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+            if self.fsync:
+                _sync(f)
+        os.replace(tmp_path, self.path)
+        
+        old_summaries_path = self._summaries_path()
+        self.unsaved = {}
+        self.summaries_file = new_summaries
+        self.records = len(lines)
+        self.exists = True
+        if os.path.exists(old_summaries_path):
+            os.remove(old_summaries_path)
+
+def _locked(method):
+    """Izvršava metodu pohrane pod njenim lockom."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+class MemoryStorage:
+    """
+    Sučelje za pohranu sesija koje koristi MemoryManager.
+    
+    Poruka je rječnik s ključevima agent, message, response i timestamp.
+    Metapodaci sesije su rječnik s ključevima session_id, created_at, summary,
+    agents_used i message_count.
+    """
+    
+    def has_session(self, session_id: str) -> bool:
+        """Provjerava postoji li sesija."""
+        raise NotImplementedError
+    
+    def append_message(self, session_id: str, entry: Dict[str, Any], created_at: str) -> int:
+        """
+        Dodaje poruku u sesiju, kreirajući sesiju ako ne postoji.
+        
+        Args:
+            session_id: ID sesije
+            entry: Poruka
+            created_at: Vrijeme kreiranja ako je sesija nova
+            
+        Returns:
+            Broj poruka u sesiji nakon dodavanja
+        """
+        raise NotImplementedError
+    
+    def get_messages(self, session_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Vraća poruke sesije (samo zadnjih limit ako je zadan), od starije prema novijoj."""
+        raise NotImplementedError
+    
+    def get_summary(self, session_id: str) -> Optional[str]:
+        """Vraća sažetak sesije ili None ako sesija ne postoji."""
+        raise NotImplementedError
+    
+    def get_summary_state(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Vraća stanje sažetka sesije ili None ako sesija ne postoji.
+        
+        Returns:
+            Rječnik sa summary, watermark (redni broj prve poruke koja još nije
+            u sažetku) i tiers (razine sažetka, od najfinije prema najgrubljoj)
+        """
+        raise NotImplementedError
+    
+    def get_unsummarized_messages(self, session_id: str) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Vraća poruke koje još nisu uključene u sažetak.
+        
+        Returns:
+            Poruke od watermarka nadalje i redni broj iza zadnje vraćene poruke
+            (novi watermark kada su te poruke sažete)
+        """
+        raise NotImplementedError
+    
+    def set_summary(self, session_id: str, summary: str, keep_last: int,
+                    watermark: Optional[int] = None, tiers: Optional[List[Dict[str, Any]]] = None) -> None:
+        """
+        Sprema sažetak sesije.
+        
+        Args:
+            session_id: ID sesije
+            summary: Novi sažetak
+            keep_last: Broj zadnjih poruka koje se zadržavaju u cijelosti
+            watermark: Redni broj prve poruke koja nije u sažetku (zadano: sve poruke su u sažetku)
+            tiers: Razine sažetka
+            
+        Poruke od watermarka nadalje se nikad ne brišu, čak i ako ih je više od keep_last.
+        """
+        raise NotImplementedError
+    
+    def list_sessions(self) -> List[Dict[str, Any]]:
+        """Vraća metapodatke svih sesija, novije prvo."""
+        raise NotImplementedError
+    
+    def list_sessions_page(self, limit: int = SESSIONS_PAGE_SIZE,
+                           after: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Vraća stranicu metapodataka sesija, novije prvo.
+        
+        Args:
+            limit: Broj sesija na stranici
+            after: Kursor iz prethodne stranice (None za prvu stranicu)
+            
+        Returns:
+            Metapodaci sesija i kursor sljedeće stranice (None ako je zadnja)
+            
+        Raises:
+            ValueError: Ako kursor nije ispravan
+        """
+        raise NotImplementedError
+    
+    def delete_session(self, session_id: str) -> bool:
+        """Briše sesiju; vraća True ako je sesija postojala."""
+        raise NotImplementedError
+    
+    def flush(self) -> None:
+        """Upisuje na disk sve promjene koje još čekaju u memoriji."""
+        pass
+    
+    def close(self) -> None:
+        """Upisuje preostale promjene i oslobađa resurse pohrane."""
+        pass
+
+def _init_summary_state(session_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Dopunjuje podatke sesije rednim brojevima poruka i stanjem sažetka.
+    Sesije spremljene prije uvođenja watermarka brojimo od poruka koje imaju;
+    ako već imaju sažetak, smatramo da su sve njihove poruke u njemu.
+    """
+    messages = session_data.setdefault('messages', [])
+    if 'next_seq' not in session_data:
+        session_data['next_seq'] = len(messages)
+    if 'summary_watermark' not in session_data:
+        has_summary = session_data.get('summary', "Nova sesija započeta.") != "Nova sesija započeta."
+        session_data['summary_watermark'] = session_data['next_seq'] if has_summary else 0
+    session_data.setdefault('summary_tiers', [])
+    return session_data
+
+def _trim_summarized(session_data: Dict[str, Any], keep_last: int) -> None:
+    """Zadržava zadnjih keep_last poruka i sve poruke koje još nisu sažete."""
+    messages = session_data['messages']
+    keep = max(keep_last, session_data['next_seq'] - session_data['summary_watermark'])
+    session_data['messages'] = messages[max(len(messages) - keep, 0):]
+
+class FileMemoryStorage(MemoryStorage):
+    """
+    Pohrana sesija u fajlove.
+    
+    Svaka sesija na disku ima snapshot i append-only journal
+    (<session_id>.jsonl) s jednim zapisom po promjeni. Spremanje poruke
+    dodaje samo jedan red u journal, a journal se povremeno kompaktira u snapshot.
+    Snapshot je binarni (<session_id>.snap, vidi session_snapshot) ili JSON
+    (<session_id>.json); oba formata se čitaju, a piše se format iz snapshot_format.
+    
+    Pri pokretanju se čita samo indeks sesija (SessionIndex); poruke sesije se
+    učitavaju s diska tek pri prvom pristupu.
+    
+    Zapisi journala i indeksa se ne pišu u threadu zahtjeva: sesija se u
+    memoriji mijenja odmah, a zapisi idu u WriteBehindQueue koji ih u pozadini
+    upisuje grupno, za sve promijenjene sesije odjednom. Kompakcija journala u
+    snapshot izvršava se nakon grupnog upisa.
+    """
+    
+    def __init__(self, directory: str, snapshot_format: str = SNAPSHOT_FORMAT,
+                 durability: str = MEMORY_DURABILITY, flush_interval: Optional[float] = None,
+                 read_only: bool = False):
+        """
+        Args:
+            directory: Direktorij memorije
+            snapshot_format: "binary" ili "json"
+            durability: "fsync" ili "os" (vidi MEMORY_DURABILITY)
+            flush_interval: Najdulje čekanje zapisa prije upisa (zadano MEMORY_FLUSH_INTERVAL, 0 za trenutni upis)
+            read_only: Samo čitanje sesija (npr. prijenos u SQLite); indeks na disku se ne mijenja
+        """
+        self.directory = directory
+        self.read_only = read_only
+        self.snapshot_format = snapshot_format
+        self.fsync = durability == "fsync"
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        
+        # Sesije učitane u memoriju (ostale su samo u indeksu). Keš je ograničen
+        # zajedničkim budžetom memorije; izbačena sesija je već na disku
+        # (snapshot + journal) pa se samo otpušta i kasnije ponovno učitava.
+        self.sessions = SessionCache("memory_manager", on_evict=lambda session_id, session_data: None)
+        
+        # Broj zapisa u journalu svake sesije od zadnje kompakcije
+        self.journal_sizes = {}
+        
+        # Pohranu koriste i request threadovi i pozadinsko sažimanje
+        self._lock = threading.RLock()
+        
+        # Odgođeni upis journala i indeksa; sesije čiji je journal narastao
+        # kompaktiraju se nakon upisa
+        queue_options = {} if flush_interval is None else {'interval': flush_interval}
+        self.write_behind = WriteBehindQueue(self._write_records, self._after_write, **queue_options)
+        self._compact_due = set()
+        
+        # Indeks svih sesija na disku
+        self.index = SessionIndex(
+            directory,
+            writer=lambda line: self.write_behind.add(INDEX_FILE, line),
+            fsync=self.fsync
+        )
+        
+        # Učitaj indeks postojećih sesija
+        self._load_sessions()
+    
+    def _snapshot_path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{session_id}.json")
+    
+    def _binary_snapshot_path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{session_id}{SNAPSHOT_EXTENSION}")
+    
+    def _journal_path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{session_id}.jsonl")
+    
+    def _load_sessions(self):
+        """
+        Učitava indeks sesija. Sesije koje postoje na disku, a nisu u indeksu
+        (npr. memorija iz starije verzije), se jednom učitaju i dodaju u indeks.
+        Pohrana samo za čitanje ih dodaje samo u indeks u memoriji.
+        """
+        try:
+            self.index.load()
+            
+            session_ids = set()
+            for filename in os.listdir(self.directory):
+                if filename.startswith("_"):
+                    continue
+                if filename.endswith((".json", ".jsonl", SNAPSHOT_EXTENSION)):
+                    session_ids.add(filename.split(".")[0])
+            
+            for session_id in session_ids:
+                if session_id in self.index:
+                    continue
+                session_data = self._load_session(session_id)
+                if session_data is None:
+                    continue
+                # Poruke ne zadržavamo u memoriji, učitat će se pri prvom pristupu;
+                # zapis indeksa se upisuje pri prvom upisu write-behind reda (_after_write)
+                self._update_index(session_id, session_data, summary_changed=True, persist=False)
+            
+            # Sesije čiji su fajlovi obrisani izvana uklanjamo iz indeksa
+            # (pohrana samo za čitanje ih preskače pri čitanju)
+            if not self.read_only:
+                for session_id in list(self.index.entries):
+                    if session_id not in session_ids:
+                        self.index.delete(session_id)
+        except Exception as e:
+            print(f"Greška pri učitavanju sesija: {e}")
+    
+    def _get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Vraća podatke sesije, učitavajući ih s diska pri prvom pristupu."""
+        session_data = self.sessions.get(session_id)
+        if session_data is None and session_id in self.index:
+            try:
+                session_data = self._load_session(session_id)
+            except Exception as e:
+                print(f"Greška pri učitavanju sesije {session_id}: {e}")
+                return None
+            if session_data is not None:
+                self.sessions[session_id] = session_data
+        return session_data
+    
+    def _update_index(self, session_id: str, session_data: Dict[str, Any], summary_changed: bool = False,
+                      persist: bool = True) -> None:
+        """
+        Osvježava zapis sesije u indeksu iz podataka u memoriji.
+        
+        Podatke predaje pozivatelj: sesija je mogla već biti izbačena iz keša
+        (budžet memorije je zajednički), pa se ne čitaju ponovno iz keša.
+        """
+        try:
+            self.index.update(
+                session_id,
+                created_at=session_data.get('created_at', 'Nepoznato vrijeme'),
+                message_count=len(session_data.get('messages', [])),
+                agents_used=list(session_data.get('agents_used', [])),
+                summary=session_data.get('summary') if summary_changed else None,
+                persist=persist
+            )
+        except Exception as e:
+            print(f"Greška pri ažuriranju indeksa sesije {session_id}: {e}")
+    
+    def _load_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Učitava snapshot sesije i na njega primjenjuje zapise iz journala,
+        a zatim zapise koji još čekaju upis na disk.
+        """
+        with self.write_behind.io_lock:
+            session_data, journal_size = self._read_session_files(session_id)
+            for line in self.write_behind.pending(session_id):
+                session_data = self._apply_record(session_data, json.loads(line))
+        
+        if session_data is None:
+            return None
+        
+        self.journal_sizes[session_id] = journal_size
+        return session_data
+    
+    def _read_session_files(self, session_id: str) -> Tuple[Optional[Dict[str, Any]], int]:
+        """Čita snapshot i journal sesije; vraća podatke sesije i broj zapisa u journalu."""
+        session_data = None
+        
+        # Binarni snapshot ima prednost (JSON može ostati nakon pretvaranja s --keep-json)
+        binary_path = self._binary_snapshot_path(session_id)
+        snapshot_path = self._snapshot_path(session_id)
+        if os.path.exists(binary_path):
+            session_data = _init_summary_state(read_snapshot(binary_path))
+        elif os.path.exists(snapshot_path):
+            with open(snapshot_path, 'r', encoding='utf-8') as f:
+                session_data = _init_summary_state(json.load(f))
+        
+        journal_size = 0
+        journal_path = self._journal_path(session_id)
+        if os.path.exists(journal_path):
+            valid_bytes = 0
+            with open(journal_path, 'rb') as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("nepotpun zapis")
+                        record = json.loads(line.decode('utf-8'))
+                    except ValueError:
+                        # Nepotpun zadnji red (prekid usred pisanja) se odbacuje
+                        break
+                    session_data = self._apply_record(session_data, record)
+                    journal_size += 1
+                    valid_bytes += len(line)
+            
+            # Odsijecamo oštećeni kraj da novi zapisi ne bi bili nastavak nepotpunog reda
+            if valid_bytes < os.path.getsize(journal_path):
+                with open(journal_path, 'r+b') as f:
+                    f.truncate(valid_bytes)
+        
+        return session_data, journal_size
+    
+    def _apply_record(self, session_data: Optional[Dict[str, Any]], record: Dict[str, Any]) -> Dict[str, Any]:
+        """Primjenjuje jedan zapis iz journala na podatke sesije."""
+        if session_data is None:
+            session_data = _init_summary_state({
+                'messages': [],
+                'created_at': record.get('created_at', datetime.now().isoformat()),
+                'agents_used': [],
+                'summary': "Nova sesija započeta."
+            })
+        
+        op = record.get('op')
+        if op == 'message':
+            session_data['messages'].append(record['entry'])
+            session_data['next_seq'] += 1
+            agents = session_data.get('agents_used', [])
+            if record['entry']['agent'] not in agents:
+                session_data['agents_used'] = list(agents) + [record['entry']['agent']]
+        elif op == 'summary':
+            session_data['summary'] = record['summary']
+            session_data['summary_watermark'] = record.get('watermark', session_data['next_seq'])
+            session_data['summary_tiers'] = record.get('tiers', [])
+            _trim_summarized(session_data, record['keep_last'])
+        
+        return session_data
+    
+    def _append_journal(self, session_id: str, record: Dict[str, Any]) -> None:
+        """Predaje zapis journala sesije odgođenom upisu."""
+        self.write_behind.add(session_id, json.dumps(record, ensure_ascii=False) + "\n")
+    
+    def _write_records(self, batch: Dict[str, List[str]]) -> Dict[str, List[str]]:
+        """
+        Grupni upis: dodaje zapise na kraj journala svake promijenjene sesije
+        i indeksa. Poziva ga WriteBehindQueue pod io_lockom.
+        
+        Returns:
+            Zapisi koje nije bilo moguće upisati (ponovno se pokušavaju)
+        """
+        failed = {}
+        for key, lines in batch.items():
+            try:
+                if key == INDEX_FILE:
+                    self.index.write_lines(lines)
+                    continue
+                
+                with open(self._journal_path(key), 'a', encoding='utf-8') as f:
+                    f.write("".join(lines))
+                    if self.fsync:
+                        _sync(f)
+                self.journal_sizes[key] = self.journal_sizes.get(key, 0) + len(lines)
+                if self.journal_sizes[key] >= JOURNAL_COMPACT_EVERY:
+                    self._compact_due.add(key)
+            except Exception as e:
+                print(f"Greška pri spremanju sesije {key}: {e}")
+                failed[key] = lines
+        return failed
+    
+    def _after_write(self) -> None:
+        """
+        Nakon grupnog upisa kompaktira narasle journale i indeks te jednom upisuje
+        sesije preuzete iz starog formata. Upis (i after_write) se izvršava i pri
+        close(), pa indeks nastaje i kada se u memoriju nikad ništa ne zapiše.
+        """
+        if self.read_only:
+            return
+        if not self._compact_due and not self.index.needs_compaction() and not self.index.unsaved:
+            return
+        with self._lock, self.write_behind.io_lock:
+            if self.index.unsaved:
+                try:
+                    self.index.save_unsaved()
+                except Exception as e:
+                    print(f"Greška pri upisu indeksa sesija: {e}")
+            
+            for session_id in list(self._compact_due):
+                self._compact_due.discard(session_id)
+                session_data = self._get_session(session_id)
+                if session_data is not None:
+                    self._save_session(session_id, session_data)
+            
+            if self.index.needs_compaction():
+                try:
+                    # Indeks u memoriji već sadrži sve zapise koji čekaju upis
+                    self.write_behind.discard(INDEX_FILE)
+                    self.index.compact()
+                except Exception as e:
+                    print(f"Greška pri kompakciji indeksa sesija: {e}")
+    
+    def _save_session(self, session_id: str, session_data: Dict[str, Any]) -> None:
+        """
+        Kompaktira sesiju: zapisuje cijeli snapshot i prazni journal.
+        Snapshot se piše u privremeni fajl i atomski zamjenjuje stari.
+        Poziva se pod lockom pohrane i io_lockom, pa snapshot sadrži i sve
+        zapise sesije koji još čekaju upis; oni se zato odbacuju.
+        """
+        try:
+            if self.snapshot_format == "binary":
+                write_snapshot(self._binary_snapshot_path(session_id), session_data, fsync=self.fsync)
+                stale_path = self._snapshot_path(session_id)
+            else:
+                file_path = self._snapshot_path(session_id)
+                tmp_path = file_path + ".tmp"
+                
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(session_data, f, ensure_ascii=False, indent=2)
+                    if self.fsync:
+                        _sync(f)
+                os.replace(tmp_path, file_path)
+                stale_path = self._binary_snapshot_path(session_id)
+            
+            # Snapshot u drugom formatu je zastario
+            if os.path.exists(stale_path):
+                os.remove(stale_path)
+            
+            # Svi zapisi iz journala (i oni koji čekaju upis) su sada u snapshotu
+            self.write_behind.discard(session_id)
+            journal_path = self._journal_path(session_id)
+            if os.path.exists(journal_path):
+                os.remove(journal_path)
+            self.journal_sizes[session_id] = 0
+        except Exception as e:
+            print(f"Greška pri spremanju sesije {session_id}: {e}")
+    
+    @_locked
+    def has_session(self, session_id: str) -> bool:
+        return session_id in self.sessions or session_id in self.index
+    
+    @_locked
+    def append_message(self, session_id: str, entry: Dict[str, Any], created_at: str) -> int:
+        session_data = self._get_session(session_id)
+        is_new = session_data is None
+        if is_new:
+            session_data = _init_summary_state({
+                'messages': [],
+                'created_at': created_at,
+                'agents_used': [],
+                'summary': "Nova sesija započeta."
+            })
+            self.sessions[session_id] = session_data
+        
+        agents = session_data.setdefault('agents_used', [])
+        if entry['agent'] not in agents:
+            agents.append(entry['agent'])
+        session_data['messages'].append(entry)
+        session_data['next_seq'] += 1
+        self.sessions.grow(session_id, entry)
+        
+        # Dodaj poruku u journal sesije (jedan red, bez prepisivanja cijele sesije)
+        self._append_journal(session_id, {
+            'op': 'message',
+            'created_at': session_data['created_at'],
+            'entry': entry
+        })
+        self._update_index(session_id, session_data, summary_changed=is_new)
+        
+        return len(session_data['messages'])
+    
+    @_locked
+    def get_messages(self, session_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        session_data = self._get_session(session_id)
+        if not session_data:
+            return []
+        messages = session_data.get('messages', [])
+        if limit is not None:
+            return messages[-limit:] if limit > 0 else []
+        return list(messages)
+    
+    @_locked
+    def get_summary(self, session_id: str) -> Optional[str]:
+        session_data = self.sessions.get(session_id)
+        if session_data is not None:
+            return session_data.get('summary', "")
+        
+        # Sažetak neučitane sesije čitamo iz indeksa, bez učitavanja poruka
+        if session_id in self.index:
+            try:
+                return self.index.read_summary(session_id)
+            except Exception as e:
+                print(f"Greška pri čitanju sažetka sesije {session_id}: {e}")
+        return None
+    
+    @_locked
+    def get_summary_state(self, session_id: str) -> Optional[Dict[str, Any]]:
+        session_data = self._get_session(session_id)
+        if session_data is None:
+            return None
+        return {
+            'summary': session_data.get('summary', ""),
+            'watermark': session_data['summary_watermark'],
+            'tiers': [dict(tier) for tier in session_data['summary_tiers']]
+        }
+    
+    @_locked
+    def get_unsummarized_messages(self, session_id: str) -> Tuple[List[Dict[str, Any]], int]:
+        session_data = self._get_session(session_id)
+        if session_data is None:
+            return [], 0
+        messages = session_data['messages']
+        first_seq = session_data['next_seq'] - len(messages)
+        start = max(session_data['summary_watermark'] - first_seq, 0)
+        return messages[start:], session_data['next_seq']
+    
+    @_locked
+    def set_summary(self, session_id: str, summary: str, keep_last: int,
+                    watermark: Optional[int] = None, tiers: Optional[List[Dict[str, Any]]] = None) -> None:
+        session_data = self._get_session(session_id)
+        if session_data is None:
+            return
+        
+        if watermark is None:
+            watermark = session_data['next_seq']
+        session_data['summary'] = summary
+        session_data['summary_watermark'] = watermark
+        session_data['summary_tiers'] = tiers or []
+        _trim_summarized(session_data, keep_last)
+        self.sessions.resize(session_id)
+        
+        # Zabilježi sažetak u journal
+        self._append_journal(session_id, {
+            'op': 'summary',
+            'summary': summary,
+            'keep_last': keep_last,
+            'watermark': watermark,
+            'tiers': session_data['summary_tiers']
+        })
+        self._update_index(session_id, session_data, summary_changed=True)
+    
+    def _session_info(self, session_id: str) -> Dict[str, Any]:
+        entry = self.index.entries[session_id]
+        return {
+            'session_id': session_id,
+            'created_at': entry.get('created_at', 'Nepoznato vrijeme'),
+            'summary': self.get_summary(session_id) or 'Nema sažetka',
+            'agents_used': entry.get('agents_used', []),
+            'message_count': entry.get('message_count', 0)
+        }
+    
+    @_locked
+    def list_sessions(self) -> List[Dict[str, Any]]:
+        # Indeks je već sortiran po vremenu kreiranja
+        return [self._session_info(session_id) for session_id in reversed(self.index.order)]
+    
+    @_locked
+    def list_sessions_page(self, limit: int = SESSIONS_PAGE_SIZE,
+                           after: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        items, next_cursor = self.index.order.page(limit, after)
+        return [self._session_info(session_id) for _, session_id in items], next_cursor
+    
+    @_locked
+    def delete_session(self, session_id: str) -> bool:
+        if not self.has_session(session_id):
+            return False
+        
+        self.sessions.pop(session_id, None)
+        
+        # Obriši snapshot, journal i zapise sesije koji čekaju upis
+        with self.write_behind.io_lock:
+            self.write_behind.discard(session_id)
+            self._compact_due.discard(session_id)
+            self.journal_sizes.pop(session_id, None)
+            for file_path in (self._snapshot_path(session_id), self._binary_snapshot_path(session_id),
+                              self._journal_path(session_id)):
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+        
+        try:
+            self.index.delete(session_id)
+        except Exception as e:
+            print(f"Greška pri ažuriranju indeksa sesije {session_id}: {e}")
+        
+        return True
+
+    def flush(self) -> None:
+        self.write_behind.flush()
+    
+    def close(self) -> None:
+        self.write_behind.close()
+        # Sesije su na disku; oslobađamo njihov dio zajedničkog budžeta memorije
+        self.sessions.clear()
+
+class SQLiteMemoryStorage(MemoryStorage):
+    """
+    Pohrana sesija u SQLite bazu (WAL način rada).
+    
+    Poruke su u tablici messages s primarnim ključem (session_id, seq), pa su
+    zadnje poruke sesije jedan indeksirani upit. Tablica sessions ima indeks po
+    created_at za listanje sesija. U memoriji se ne drži ništa osim konekcije.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            created_at TEXT NOT NULL,
+            summary TEXT NOT NULL,
+            agents_used TEXT NOT NULL DEFAULT '[]',
+            message_count INTEGER NOT NULL DEFAULT 0,
+            next_seq INTEGER NOT NULL DEFAULT 0,
+            summary_watermark INTEGER NOT NULL DEFAULT 0,
+            summary_tiers TEXT NOT NULL DEFAULT '[]'
+        );
+        CREATE INDEX IF NOT EXISTS idx_sessions_created ON sessions (created_at, session_id);
+        CREATE TABLE IF NOT EXISTS messages (
+            session_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            agent TEXT NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (session_id, seq)
+        ) WITHOUT ROWID;
+    """
+    
+    def __init__(self, db_path: str, durability: str = MEMORY_DURABILITY):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        
+        # Jedna konekcija dijeljena između threadova FastAPI-ja, zaštićena lockom
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # WAL s NORMAL ne gubi konzistentnost, ali zadnje transakcije mogu nestati pri padu sustava
+        self._conn.execute("PRAGMA synchronous=FULL" if durability == "fsync" else "PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        
+        # Baze kreirane prije uvođenja watermarka dobivaju nove stupce
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(sessions)")}
+        with self._conn:
+            if 'summary_watermark' not in columns:
+                self._conn.execute("ALTER TABLE sessions ADD COLUMN summary_watermark INTEGER NOT NULL DEFAULT 0")
+                self._conn.execute("UPDATE sessions SET summary_watermark = next_seq WHERE summary != 'Nova sesija započeta.'")
+            if 'summary_tiers' not in columns:
+                self._conn.execute("ALTER TABLE sessions ADD COLUMN summary_tiers TEXT NOT NULL DEFAULT '[]'")
+            # Indeks (created_at, session_id) zamjenjuje stari indeks samo po created_at
+            self._conn.execute("DROP INDEX IF EXISTS idx_sessions_created_at")
+    
+    def has_session(self, session_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row is not None
+    
+    def append_message(self, session_id: str, entry: Dict[str, Any], created_at: str) -> int:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO sessions (session_id, created_at, summary) VALUES (?, ?, ?)",
+                (session_id, created_at, "Nova sesija započeta.")
+            )
+            agents_json, seq, message_count = self._conn.execute(
+                "SELECT agents_used, next_seq, message_count FROM sessions WHERE session_id = ?",
+                (session_id,)
+            ).fetchone()
+            
+            agents = json.loads(agents_json)
+            if entry['agent'] not in agents:
+                agents.append(entry['agent'])
+            
+            self._conn.execute(
+                "INSERT INTO messages (session_id, seq, agent, data) VALUES (?, ?, ?, ?)",
+                (session_id, seq, entry['agent'], json.dumps(entry, ensure_ascii=False))
+            )
+            self._conn.execute(
+                "UPDATE sessions SET agents_used = ?, next_seq = ?, message_count = ? WHERE session_id = ?",
+                (json.dumps(agents, ensure_ascii=False), seq + 1, message_count + 1, session_id)
+            )
+        return message_count + 1
+    
+    def get_messages(self, session_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            if limit is None:
+                rows = self._conn.execute(
+                    "SELECT data FROM messages WHERE session_id = ? ORDER BY seq",
+                    (session_id,)
+                ).fetchall()
+            else:
+                # Zadnjih N poruka čitamo unatrag po indeksu pa okrećemo redoslijed
+                rows = self._conn.execute(
+                    "SELECT data FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT ?",
+                    (session_id, max(limit, 0))
+                ).fetchall()
+                rows.reverse()
+        return [json.loads(row[0]) for row in rows]
+    
+    def get_summary(self, session_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row[0] if row else None
+    
+    def get_summary_state(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, summary_watermark, summary_tiers FROM sessions WHERE session_id = ?",
+                (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'summary': row[0], 'watermark': row[1], 'tiers': json.loads(row[2])}
+    
+    def get_unsummarized_messages(self, session_id: str) -> Tuple[List[Dict[str, Any]], int]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary_watermark, next_seq FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return [], 0
+            watermark, next_seq = row
+            rows = self._conn.execute(
+                "SELECT data FROM messages WHERE session_id = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                (session_id, watermark, next_seq)
+            ).fetchall()
+        return [json.loads(r[0]) for r in rows], next_seq
+    
+    def set_summary(self, session_id: str, summary: str, keep_last: int,
+                    watermark: Optional[int] = None, tiers: Optional[List[Dict[str, Any]]] = None) -> None:
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT next_seq, message_count FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return
+            next_seq, message_count = row
+            if watermark is None:
+                watermark = next_seq
+            
+            # Brišemo samo sažete poruke starije od zadnjih keep_last
+            cutoff = min(next_seq - keep_last, watermark)
+            self._conn.execute(
+                "DELETE FROM messages WHERE session_id = ? AND seq < ?",
+                (session_id, cutoff)
+            )
+            self._conn.execute(
+                "UPDATE sessions SET summary = ?, summary_watermark = ?, summary_tiers = ?, message_count = ? "
+                "WHERE session_id = ?",
+                (summary, watermark, json.dumps(tiers or [], ensure_ascii=False),
+                 min(message_count, next_seq - cutoff), session_id)
+            )
+    
+    def list_sessions(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT session_id, created_at, summary, agents_used, message_count "
+                "FROM sessions ORDER BY created_at DESC"
+            ).fetchall()
+        return [
+            {
+                'session_id': session_id,
+                'created_at': created_at,
+                'summary': summary or 'Nema sažetka',
+                'agents_used': json.loads(agents_used),
+                'message_count': message_count
+            }
+            for session_id, created_at, summary, agents_used, message_count in rows
+        ]
+    
+    def list_sessions_page(self, limit: int = SESSIONS_PAGE_SIZE,
+                           after: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        # Keyset stranica po indeksu (created_at, session_id)
+        query = "SELECT session_id, created_at, summary, agents_used, message_count FROM sessions"
+        params: List[Any] = []
+        if after is not None:
+            query += " WHERE (created_at, session_id) < (?, ?)"
+            params.extend(decode_cursor(after))
+        query += " ORDER BY created_at DESC, session_id DESC LIMIT ?"
+        params.append(max(limit, 0) + 1)
+        
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        sessions = [
+            {
+                'session_id': session_id,
+                'created_at': created_at,
+                'summary': summary or 'Nema sažetka',
+                'agents_used': json.loads(agents_used),
+                'message_count': message_count
+            }
+            for session_id, created_at, summary, agents_used, message_count in rows
+        ]
+        next_cursor = encode_cursor(rows[-1][1], rows[-1][0]) if has_more and rows else None
+        return sessions, next_cursor
+    
+    def delete_session(self, session_id: str) -> bool:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            deleted = self._conn.execute(
+                "DELETE FROM sessions WHERE session_id = ?", (session_id,)
+            ).rowcount
+        return deleted > 0
+    
+    def is_empty(self) -> bool:
+        """Provjerava je li baza bez ijedne sesije."""
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM sessions LIMIT 1").fetchone() is None
+    
+    def import_sessions(self, source: FileMemoryStorage) -> int:
+        """
+        Prenosi sesije iz fajlova u bazu, jednu po jednu.
+        
+        Args:
+            source: Pohrana u fajlovima
+            
+        Returns:
+            Broj prenesenih sesija
+        """
+        imported = 0
+        for session_id in list(source.index.entries):
+            session_data = source._get_session(session_id)
+            # Poruke ne zadržavamo u memoriji izvora
+            source.sessions.pop(session_id, None)
+            if not session_data:
+                continue
+            
+            messages = session_data['messages']
+            first_seq = session_data['next_seq'] - len(messages)
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO sessions (session_id, created_at, summary, agents_used, message_count, "
+                    "next_seq, summary_watermark, summary_tiers) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (session_id, session_data.get('created_at', 'Nepoznato vrijeme'),
+                     session_data.get('summary', "Nova sesija započeta."),
+                     json.dumps(list(session_data.get('agents_used', [])), ensure_ascii=False),
+                     len(messages), session_data['next_seq'], session_data['summary_watermark'],
+                     json.dumps(session_data['summary_tiers'], ensure_ascii=False))
+                )
+                self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+                self._conn.executemany(
+                    "INSERT INTO messages (session_id, seq, agent, data) VALUES (?, ?, ?, ?)",
+                    [
+                        (session_id, first_seq + i, msg.get('agent', ''), json.dumps(msg, ensure_ascii=False))
+                        for i, msg in enumerate(messages)
+                    ]
+                )
+            imported += 1
+        return imported
+    
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+def create_memory_storage(backend: str, directory: str, db_path: Optional[str] = None) -> MemoryStorage:
+    """
+    Kreira pohranu sesija prema nazivu backenda.
+    
+    Args:
+        backend: "file" (snapshot + journal fajlovi) ili "sqlite"
+        directory: Direktorij memorije
+        db_path: Putanja do SQLite baze (zadano <directory>/_memory.db)
+        
+    Returns:
+        Instanca pohrane
+    """
+    if backend == "sqlite":
+        storage = SQLiteMemoryStorage(db_path or os.path.join(directory, "_memory.db"))
+        # Nova baza jednom preuzima sesije spremljene u fajlove
+        if storage.is_empty() and any(
+            not name.startswith("_") and name.endswith((".json", ".jsonl", SNAPSHOT_EXTENSION))
+            for name in os.listdir(directory)
+        ):
+            source = FileMemoryStorage(directory, read_only=True)
+            try:
+                imported = storage.import_sessions(source)
+            finally:
+                source.close()
+            print(f"Preneseno {imported} sesija iz fajlova u SQLite bazu")
+        return storage
+    if backend != "file":
+        print(f"Nepoznat backend memorije '{backend}', koristim fajlove")
+    return FileMemoryStorage(directory)
@@ -0,0 +1,504 @@
+import os
+import sys
+import shutil
+import pickle
+import hashlib
+import tempfile
+import threading
+import functools
+import weakref
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Callable, Hashable, Tuple, List, Iterator
+
+# Ukupni budžet memorije za sve sesije u procesu (u bajtovima)
+SESSION_CACHE_MAX_BYTES = int(os.getenv("SESSION_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+
+def approx_size(obj: Any) -> int:
+    """
+    Procjenjuje veličinu objekta u memoriji zajedno s objektima koje sadrži
+    (rječnici, liste, tuple i setovi se obilaze rekurzivno).
+
+    Args:
+        obj: Objekt za mjerenje
+
+    Returns:
+        Približna veličina u bajtovima
+    """
+    size = 0
+    seen = set()
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+    return size
+
+def session_info(session: Any) -> Dict[str, Any]:
+    """
+    Mali metapodaci sesije koji ostaju u memoriji i kada je sesija izbačena:
+    created_at i last_used (ako ih sesija ima) te broj poruka.
+
+    Args:
+        session: Podaci sesije
+
+    Returns:
+        Rječnik metapodataka (prazan ako sesija nije rječnik)
+    """
+    if not isinstance(session, dict):
+        return {}
+    info = {"message_count": len(session.get("messages", ()))}
+    for field in ("created_at", "last_used"):
+        if field in session:
+            info[field] = session[field]
+    return info
+
+class SessionCachePool:
+    """
+    Zajednički budžet memorije za sve kešove sesija u procesu.
+
+    Pool vodi jedan LRU redoslijed preko svih kešova, pa se pri prekoračenju
+    budžeta izbacuje sesija koja najdulje nije korištena, bez obzira kojem
+    kešu pripada. Sesije prikvačene za promjenu (SessionCache.pinned) se ne izbacuju.
+
+    Lock poola štiti samo stanje u memoriji; zapisivanje izbačenih sesija na
+    disk izvršavaju kešovi nakon otpuštanja locka (put i grow vraćaju te poslove).
+    """
+
+    def __init__(self, max_bytes: int = SESSION_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.evictions = 0
+        self._lru: "OrderedDict[Tuple[int, Hashable], int]" = OrderedDict()
+        self._caches: "weakref.WeakValueDictionary[int, SessionCache]" = weakref.WeakValueDictionary()
+        self.lock = threading.RLock()
+
+    def register(self, cache: "SessionCache") -> None:
+        with self.lock:
+            self._caches[id(cache)] = cache
+
+    def put(self, cache: "SessionCache", key: Hashable, size: int) -> List[Callable[[], None]]:
+        """
+        Postavlja veličinu sesije, označava je kao zadnje korištenu i provodi budžet.
+
+        Returns:
+            Poslovi izbacivanja koje pozivatelj izvršava nakon otpuštanja locka
+        """
+        with self.lock:
+            lru_key = (id(cache), key)
+            self.total_bytes += size - self._lru.pop(lru_key, 0)
+            self._lru[lru_key] = size
+            return self._enforce(lru_key)
+
+    def grow(self, cache: "SessionCache", key: Hashable, delta: int) -> List[Callable[[], None]]:
+        """Povećava zabilježenu veličinu sesije (npr. nakon dodavanja poruke)."""
+        with self.lock:
+            lru_key = (id(cache), key)
+            if lru_key not in self._lru:
+                return []
+            self._lru[lru_key] += delta
+            self.total_bytes += delta
+            self._lru.move_to_end(lru_key)
+            return self._enforce(lru_key)
+
+    def touch(self, cache: "SessionCache", key: Hashable) -> None:
+        with self.lock:
+            lru_key = (id(cache), key)
+            if lru_key in self._lru:
+                self._lru.move_to_end(lru_key)
+
+    def forget(self, cache_id: int, key: Hashable) -> None:
+        with self.lock:
+            self.total_bytes -= self._lru.pop((cache_id, key), 0)
+
+    def forget_cache(self, cache_id: int) -> None:
+        """Uklanja sve sesije keša koji više ne postoji."""
+        with self.lock:
+            for lru_key in [k for k in self._lru if k[0] == cache_id]:
+                self.total_bytes -= self._lru.pop(lru_key)
+
+    def _enforce(self, protected: Tuple[int, Hashable]) -> List[Callable[[], None]]:
+        # Zadnje korištena sesija se nikad ne izbacuje, čak ni kad sama prelazi budžet
+        excess = self.total_bytes - self.max_bytes
+        victims = []
+        for lru_key, size in self._lru.items():
+            if excess <= 0:
+                break
+            cache = self._caches.get(lru_key[0])
+            if lru_key == protected or (cache is not None and lru_key[1] in cache._pins):
+                continue
+            victims.append(lru_key)
+            excess -= size
+
+        jobs = []
+        for lru_key in victims:
+            self.total_bytes -= self._lru.pop(lru_key)
+            self.evictions += 1
+
+            cache = self._caches.get(lru_key[0])
+            if cache is not None:
+                job = cache._begin_evict(lru_key[1])
+                if job is not None:
+                    jobs.append(job)
+        return jobs
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "max_bytes": self.max_bytes,
+                "total_bytes": self.total_bytes,
+                "sessions": len(self._lru),
+                "evictions": self.evictions,
+                "caches": len(self._caches)
+            }
+
+# Globalni pool koji dijele svi kešovi sesija
+session_cache_pool = SessionCachePool()
+
+class _InFlight:
+    """Oznaka sesije koja se upravo zapisuje na disk (value je sesija) ili učitava (value je None)."""
+
+    __slots__ = ("value", "done")
+
+    def __init__(self, value: Any = None):
+        self.value = value
+        self.done = threading.Event()
+
+def _run_jobs(jobs: List[Callable[[], None]]) -> None:
+    for job in jobs:
+        job()
+
+class SessionCache(MutableMapping):
+    """
+    Rječnik sesija ograničen zajedničkim budžetom memorije (SessionCachePool).
+
+    Kada pool izbaci sesiju, ona se predaje funkciji on_evict (ako je zadana,
+    npr. kada je sesija već perzistirana) ili se zapisuje u privremeni fajl
+    procesa i pri sljedećem pristupu transparentno učitava natrag. Zapisivanje
+    i učitavanje se izvršavaju izvan locka poola; sesija koja je na putu
+    prema disku ili s diska ima oznaku (_InFlight) na koju čeka samo tko
+    treba baš tu sesiju. Metapodaci izbačene sesije (session_info) ostaju u
+    memoriji, pa ih info() vraća bez učitavanja.
+
+    Sesije koje se mijenjaju na mjestu treba mijenjati unutar pinned(), a nakon
+    promjene prijaviti kroz grow() ili resize() kako bi procjena memorije ostala točna.
+    """
+
+    def __init__(self, name: str, on_evict: Optional[Callable[[Hashable, Any], None]] = None,
+                 pool: Optional[SessionCachePool] = None):
+        """
+        Args:
+            name: Naziv keša u statistici
+            on_evict: Funkcija koja prima izbačenu sesiju; bez nje se sesija zapisuje na disk
+            pool: Pool s budžetom memorije (zadano globalni session_cache_pool)
+        """
+        self.name = name
+        self.on_evict = on_evict
+        self.pool = pool or session_cache_pool
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.reloads = 0
+
+        self._data: Dict[Hashable, Any] = {}
+        self._spilled: Dict[Hashable, str] = {}
+        self._info: Dict[Hashable, Dict[str, Any]] = {}
+        self._inflight: Dict[Hashable, _InFlight] = {}
+        # Prikvačene sesije: broj korisnika i lock promjene
+        self._pins: Dict[Hashable, list] = {}
+        self._spill_dir: Optional[str] = None
+        self._spill_seq = 0
+
+        self.pool.register(self)
+        weakref.finalize(self, self.pool.forget_cache, id(self))
+
+    def _spill_path(self, key: Hashable) -> str:
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix=f"session_cache_{self.name}_")
+            weakref.finalize(self, shutil.rmtree, self._spill_dir, True)
+        # Svako izbacivanje ima svoj fajl, pa zakašnjeli zapis ne može prebrisati noviji
+        self._spill_seq += 1
+        digest = hashlib.blake2b(repr(key).encode("utf-8"), digest_size=16).hexdigest()
+        return os.path.join(self._spill_dir, f"{digest}.{self._spill_seq}.pkl")
+
+    def _begin_evict(self, key: Hashable) -> Optional[Callable[[], None]]:
+        """Poziva ga pool pod lockom: sesija izlazi iz memorije; vraća posao zapisivanja."""
+        value = self._data.pop(key, None)
+        if value is None:
+            return None
+        self.evictions += 1
+
+        if self.on_evict is not None:
+            return functools.partial(self.on_evict, key, value)
+
+        marker = _InFlight(value)
+        self._inflight[key] = marker
+        self._info[key] = session_info(value)
+        return functools.partial(self._spill, key, marker, self._spill_path(key))
+
+    def _spill(self, key: Hashable, marker: _InFlight, path: str) -> None:
+        """Zapisuje izbačenu sesiju na disk, izvan locka poola."""
+        try:
+            with open(path, "wb") as f:
+                pickle.dump(marker.value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            # Sesiju koju ne možemo zapisati zadržavamo u memoriji
+            print(f"Greška pri izbacivanju sesije {key} iz memorije: {e}")
+            with self.pool.lock:
+                if self._inflight.get(key) is marker:
+                    del self._inflight[key]
+                    self._info.pop(key, None)
+                    self._data[key] = marker.value
+            marker.done.set()
+            return
+
+        with self.pool.lock:
+            current = self._inflight.get(key) is marker
+            if current:
+                del self._inflight[key]
+                self._spilled[key] = path
+        if not current:
+            # Sesija je u međuvremenu obrisana ili zamijenjena
+            _remove(path)
+        marker.done.set()
+
+    def _take(self, key: Hashable, reload: bool) -> Tuple[bool, Any]:
+        """
+        Vraća (postoji, sesija). Izbačena sesija se čita s diska izvan locka
+        poola; s reload=True vraća se u memoriju, inače ostaje na disku.
+        """
+        while True:
+            waiting = None
+            with self.pool.lock:
+                if key in self._data:
+                    return True, self._data[key]
+                if key in self._inflight:
+                    waiting = self._inflight[key]
+                elif key not in self._spilled:
+                    return False, None
+                elif reload:
+                    # Sesija se učitava; ostali koji je trebaju čekaju na oznaku
+                    path = self._spilled.pop(key)
+                    marker = _InFlight()
+                    self._inflight[key] = marker
+                else:
+                    path = self._spilled[key]
+
+            if waiting is not None:
+                waiting.done.wait()
+                continue
+
+            if not reload:
+                try:
+                    return True, _read_pickle(path)
+                except FileNotFoundError:
+                    # Sesiju je u međuvremenu učitao ili obrisao drugi thread
+                    continue
+
+            try:
+                value = _read_pickle(path)
+            except Exception:
+                with self.pool.lock:
+                    if self._inflight.get(key) is marker:
+                        del self._inflight[key]
+                        self._spilled[key] = path
+                marker.done.set()
+                raise
+
+            size = approx_size(value)
+            with self.pool.lock:
+                current = self._inflight.get(key) is marker
+                if current:
+                    del self._inflight[key]
+                    self._info.pop(key, None)
+                    self._data[key] = value
+                    self.reloads += 1
+                    jobs = self.pool.put(self, key, size)
+            _remove(path)
+            marker.done.set()
+            if current:
+                _run_jobs(jobs)
+                return True, value
+            # Sesija je obrisana ili zamijenjena dok se učitavala - tražimo ponovno
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self.pool.lock:
+            if key in self._data:
+                self.hits += 1
+                self.pool.touch(self, key)
+                return self._data[key]
+            self.misses += 1
+        found, value = self._take(key, reload=True)
+        return value if found else default
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Vraća sesiju bez vraćanja u memoriju i bez mijenjanja LRU redoslijeda."""
+        found, value = self._take(key, reload=False)
+        return value if found else default
+
+    def info(self, key: Hashable, default: Any = None) -> Any:
+        """Vraća metapodatke sesije (session_info) bez učitavanja izbačene sesije."""
+        with self.pool.lock:
+            if key in self._data:
+                return session_info(self._data[key])
+            return self._info.get(key, default)
+
+    @contextmanager
+    def pinned(self, key: Hashable, create: Optional[Callable[[], Any]] = None) -> Iterator[Any]:
+        """
+        Drži sesiju u memoriji dok se mijenja na mjestu: prikvačenu sesiju pool ne
+        izbacuje, a promjene iste sesije iz više threadova se izvršavaju jedna po jedna.
+
+        Args:
+            key: Ključ sesije
+            create: Funkcija koja stvara novu sesiju ako je nema
+
+        Yields:
+            Sesija (None ako je nema i create nije zadan)
+        """
+        with self.pool.lock:
+            pin = self._pins.setdefault(key, [0, threading.RLock()])
+            pin[0] += 1
+        try:
+            with pin[1]:
+                value = self.get(key)
+                if value is None and create is not None:
+                    value = create()
+                    self[key] = value
+                yield value
+        finally:
+            with self.pool.lock:
+                pin[0] -= 1
+                if not pin[0]:
+                    del self._pins[key]
+
+    def __getitem__(self, key: Hashable) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def _discard(self, key: Hashable) -> Optional[str]:
+        """Pod lockom uklanja sesiju s diska i iz oznaka; vraća fajl za brisanje."""
+        self._info.pop(key, None)
+        marker = self._inflight.pop(key, None)
+        if marker is not None:
+            # Zapisivanje/učitavanje u tijeku vidi da oznaka više ne vrijedi i samo počisti
+            return None
+        return self._spilled.pop(key, None)
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        size = approx_size(value)
+        with self.pool.lock:
+            stale = self._discard(key)
+            self._data[key] = value
+            jobs = self.pool.put(self, key, size)
+        _remove(stale)
+        _run_jobs(jobs)
+
+    def __delitem__(self, key: Hashable) -> None:
+        with self.pool.lock:
+            if key not in self:
+                raise KeyError(key)
+            self._data.pop(key, None)
+            stale = self._discard(key)
+            self.pool.forget(id(self), key)
+        _remove(stale)
+
+    def pop(self, key: Hashable, *default: Any) -> Any:
+        found, value = self._take(key, reload=False)
+        if not found:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        try:
+            del self[key]
+        except KeyError:
+            pass
+        return value
+
+    def clear(self) -> None:
+        with self.pool.lock:
+            stale = [path for path in (self._discard(key) for key in list(self)) if path]
+            for key in list(self._data):
+                self.pool.forget(id(self), key)
+            self._data.clear()
+        for path in stale:
+            _remove(path)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._data or key in self._spilled or key in self._inflight
+
+    def __iter__(self):
+        with self.pool.lock:
+            return iter(list(self._data) + list(self._spilled) + list(self._inflight))
+
+    def __len__(self) -> int:
+        with self.pool.lock:
+            return len(self._data) + len(self._spilled) + len(self._inflight)
+
+    def grow(self, key: Hashable, added: Any) -> None:
+        """Dodaje veličinu novog objekta (npr. poruke) na procjenu veličine sesije."""
+        _run_jobs(self.pool.grow(self, key, approx_size(added)))
+
+    def resize(self, key: Hashable) -> None:
+        """Ponovno mjeri cijelu sesiju (nakon većih promjena, npr. skraćivanja)."""
+        jobs = []
+        with self.pool.lock:
+            if key in self._data:
+                jobs = self.pool.put(self, key, approx_size(self._data[key]))
+        _run_jobs(jobs)
+
+    def stats(self) -> Dict[str, Any]:
+        """Vraća statistiku korištenja keša."""
+        with self.pool.lock:
+            return {
+                "name": self.name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "reloads": self.reloads,
+                "in_memory": len(self._data),
+                "spilled": len(self._spilled),
+                "in_flight": len(self._inflight)
+            }
+
+_MISSING = object()
+
+def _read_pickle(path: str) -> Any:
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+def _remove(path: Optional[str]) -> None:
+    if path is None:
+        return
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def get_session_cache_stats() -> Dict[str, Any]:
+    """
+    Vraća statistiku zajedničkog budžeta i svih kešova sesija,
+    zbrojenu po nazivu keša.
+
+    Returns:
+        Rječnik sa statistikom poola i kešova
+    """
+    with session_cache_pool.lock:
+        caches: Dict[str, Dict[str, Any]] = {}
+        for cache in list(session_cache_pool._caches.values()):
+            stats = cache.stats()
+            total = caches.setdefault(stats.pop("name"), {key: 0 for key in stats})
+            for key, value in stats.items():
+                total[key] += value
+        return {"pool": session_cache_pool.stats(), "caches": caches}
@@ -0,0 +1,114 @@
+import json
+import base64
+import bisect
+from typing import Dict, List, Any, Optional, Tuple, Iterable, Iterator, Hashable
+
+# Zadana i maksimalna veličina stranice pri listanju sesija
+SESSIONS_PAGE_SIZE = 50
+SESSIONS_PAGE_MAX = 500
+
+def encode_cursor(created_at: Any, session_id: str) -> str:
+    """
+    Kodira poziciju u listi sesija (created_at, session_id) u neprozirni kursor.
+
+    Args:
+        created_at: Vrijeme kreiranja zadnje vraćene sesije
+        session_id: ID zadnje vraćene sesije
+
+    Returns:
+        Kursor za parametar after
+    """
+    data = json.dumps([created_at, session_id], ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii').rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    """
+    Dekodira kursor iz encode_cursor.
+
+    Raises:
+        ValueError: Ako kursor nije ispravan
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, session_id = json.loads(data.decode('utf-8'))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Neispravan kursor: {cursor}") from e
+    if not isinstance(session_id, str):
+        raise ValueError(f"Neispravan kursor: {cursor}")
+    return created_at, session_id
+
+class SessionOrder:
+    """
+    Sesije sortirane po (created_at, session_id), održavane pri dodavanju i brisanju.
+
+    Stranica sesija (novije prvo) je binarno pretraživanje i isječak liste,
+    pa cijena listanja ovisi o veličini stranice, a ne o broju sesija.
+    """
+
+    def __init__(self, items: Iterable[Tuple[Hashable, Any]] = ()):
+        """
+        Args:
+            items: Početni parovi (session_id, created_at)
+        """
+        self._created: Dict[Hashable, Any] = dict(items)
+        self._keys: List[Tuple[Any, Hashable]] = sorted(
+            (created_at, session_id) for session_id, created_at in self._created.items()
+        )
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, session_id: object) -> bool:
+        return session_id in self._created
+
+    def __iter__(self) -> Iterator[Hashable]:
+        """ID-evi sesija, starije prvo."""
+        return (session_id for _, session_id in self._keys)
+
+    def __reversed__(self) -> Iterator[Hashable]:
+        """ID-evi sesija, novije prvo."""
+        return (session_id for _, session_id in reversed(self._keys))
+
+    def add(self, session_id: Hashable, created_at: Any) -> None:
+        """Dodaje sesiju (ili joj mijenja vrijeme kreiranja)."""
+        if self._created.get(session_id, _MISSING) == created_at:
+            return
+        self.remove(session_id)
+        self._created[session_id] = created_at
+        bisect.insort(self._keys, (created_at, session_id))
+
+    def remove(self, session_id: Hashable) -> None:
+        created_at = self._created.pop(session_id, _MISSING)
+        if created_at is _MISSING:
+            return
+        position = bisect.bisect_left(self._keys, (created_at, session_id))
+        del self._keys[position]
+
+    def page(self, limit: int, after: Optional[str] = None) -> Tuple[List[Tuple[Any, Hashable]], Optional[str]]:
+        """
+        Vraća stranicu sesija, novije prvo.
+
+        Args:
+            limit: Broj sesija na stranici
+            after: Kursor zadnje sesije prethodne stranice
+
+        Returns:
+            Parovi (created_at, session_id) i kursor sljedeće stranice (None ako je zadnja)
+
+        Raises:
+            ValueError: Ako kursor nije ispravan
+        """
+        end = len(self._keys)
+        if after is not None:
+            created_at, session_id = decode_cursor(after)
+            try:
+                end = bisect.bisect_left(self._keys, (created_at, session_id))
+            except TypeError as e:
+                raise ValueError(f"Neispravan kursor: {after}") from e
+
+        start = max(end - max(limit, 0), 0)
+        items = self._keys[start:end][::-1]
+        next_cursor = encode_cursor(*items[-1]) if items and start > 0 else None
+        return items, next_cursor
+
+_MISSING = object()
@@ -0,0 +1,156 @@
+import os
+import json
+import mmap
+import zlib
+import struct
+from typing import Dict, List, Any, Tuple
+
+# zstd je brži i bolje komprimira, ali je opcionalan; bez njega se koristi zlib
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Ekstenzija binarnog snapshota sesije
+SNAPSHOT_EXTENSION = ".snap"
+
+# Zaglavlje fajla: magic, verzija formata i codec
+SNAPSHOT_MAGIC = b"AGSN"
+SNAPSHOT_VERSION = 1
+HEADER = struct.Struct("<4sBB")
+
+# Svaki zapis počinje dužinom komprimiranog sadržaja
+RECORD_LENGTH = struct.Struct("<I")
+
+CODEC_ZLIB = 0
+CODEC_ZSTD = 1
+SNAPSHOT_CODEC = CODEC_ZSTD if zstandard is not None else CODEC_ZLIB
+
+# Broj poruka po zapisu; poruke se komprimiraju u blokovima jer su pojedinačno premale
+SNAPSHOT_BLOCK_MESSAGES = 64
+
+def _compress(data: bytes, codec: int) -> bytes:
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return zlib.compress(data, 6)
+
+def _decompress(data, codec: int) -> bytes:
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("snapshot je komprimiran zstd-om, a 'zstandard' paket nije instaliran")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+def write_snapshot(path: str, session_data: Dict[str, Any], codec: int = SNAPSHOT_CODEC, fsync: bool = False) -> int:
+    """
+    Zapisuje sesiju u binarni snapshot.
+
+    Prvi zapis su podaci sesije bez poruka, a iza njega slijede blokovi od
+    SNAPSHOT_BLOCK_MESSAGES poruka. Fajl se piše u privremeni fajl i atomski
+    zamjenjuje stari.
+
+    Args:
+        path: Putanja snapshota
+        session_data: Podaci sesije
+        codec: CODEC_ZLIB ili CODEC_ZSTD
+        fsync: Sinkroniziraj fajl na disk prije zamjene starog snapshota
+
+    Returns:
+        Veličina snapshota u bajtovima
+    """
+    messages = session_data.get('messages', [])
+    meta = {key: value for key, value in session_data.items() if key != 'messages'}
+
+    records = [meta]
+    for start in range(0, len(messages), SNAPSHOT_BLOCK_MESSAGES):
+        records.append(messages[start:start + SNAPSHOT_BLOCK_MESSAGES])
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, codec))
+        for record in records:
+            payload = _compress(json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), codec)
+            f.write(RECORD_LENGTH.pack(len(payload)))
+            f.write(payload)
+        size = f.tell()
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return size
+
+def read_snapshot(path: str) -> Dict[str, Any]:
+    """
+    Čita binarni snapshot sesije. Fajl se mapira u memoriju, pa se zapisi
+    dekomprimiraju izravno iz mape, bez kopiranja cijelog fajla.
+
+    Args:
+        path: Putanja snapshota
+
+    Returns:
+        Podaci sesije
+
+    Raises:
+        ValueError: Ako fajl nije ispravan snapshot
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < HEADER.size:
+            raise ValueError(f"{path} nije snapshot sesije")
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            magic, version, codec = HEADER.unpack_from(data, 0)
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                raise ValueError(f"{path} nije snapshot sesije (verzija {version})")
+
+            records = []
+            offset = HEADER.size
+            while offset < len(data):
+                if offset + RECORD_LENGTH.size > len(data):
+                    raise ValueError(f"{path}: nepotpun zapis")
+                (length,) = RECORD_LENGTH.unpack_from(data, offset)
+                offset += RECORD_LENGTH.size
+                if offset + length > len(data):
+                    raise ValueError(f"{path}: nepotpun zapis")
+                with memoryview(data)[offset:offset + length] as payload:
+                    records.append(json.loads(_decompress(payload, codec)))
+                offset += length
+
+    if not records:
+        raise ValueError(f"{path}: snapshot nema podataka sesije")
+
+    session_data = records[0]
+    session_data['messages'] = [message for block in records[1:] for message in block]
+    return session_data
+
+def convert_json_snapshots(directory: str, keep_json: bool = False) -> Tuple[int, int, int]:
+    """
+    Pretvara JSON snapshote sesija (<session_id>.json) u binarne snapshote.
+    Journali sesija ostaju netaknuti.
+
+    Args:
+        directory: Direktorij memorije
+        keep_json: Zadrži originalne JSON fajlove
+
+    Returns:
+        Broj pretvorenih sesija, ukupna veličina JSON fajlova i ukupna veličina snapshota
+    """
+    converted = 0
+    json_bytes = 0
+    snapshot_bytes = 0
+    for filename in sorted(os.listdir(directory)):
+        if filename.startswith("_") or not filename.endswith(".json"):
+            continue
+
+        json_path = os.path.join(directory, filename)
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                session_data = json.load(f)
+            snapshot_path = json_path[:-len(".json")] + SNAPSHOT_EXTENSION
+            snapshot_bytes += write_snapshot(snapshot_path, session_data)
+            json_bytes += os.path.getsize(json_path)
+            if not keep_json:
+                os.remove(json_path)
+            converted += 1
+        except Exception as e:
+            print(f"Greška pri pretvaranju {filename}: {e}")
+    return converted, json_bytes, snapshot_bytes
@@ -1,9 +1,657 @@
-session_memory = {}
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Dict, List, Any, Optional, Iterator, Tuple
+
+from .session_cache import SessionCache
+from .session_order import SessionOrder, SESSIONS_PAGE_SIZE, encode_cursor, decode_cursor
+
+# Backend za historiju /chat sesija: "memory" (zadano), "sqlite" ili "redis"
+SESSION_STORE_BACKEND = os.getenv("SESSION_STORE", "memory")
+
+# Putanja do SQLite baze (zadano memory/_sessions.db)
+SESSION_STORE_DB_PATH = os.getenv(
+    "SESSION_STORE_DB_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "memory", "_sessions.db")
+)
+
+# Redis konekcija i prefiks ključeva
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_KEY_PREFIX = os.getenv("SESSION_STORE_REDIS_PREFIX", "agent:session:")
+
+# Budžet tokena za historiju koju agent dobiva uz novu poruku
+AGENT_HISTORY_MAX_TOKENS = int(os.getenv("AGENT_HISTORY_MAX_TOKENS", "4000"))
+
+# Model prema kojem se broje tokeni poruka u indeksu agenata
+AGENT_HISTORY_MODEL = "gpt-4o"
+
+# Koliko poruka agenta se čita odjednom pri punjenju budžeta
+AGENT_HISTORY_PAGE = 16
+
+def agent_chat_messages(entry: Dict[str, Any]) -> List[Dict[str, str]]:
+    """
+    Pretvara poruku iz sesije u poruke za chat API (korisnik + odgovor agenta).
+    
+    Args:
+        entry: Poruka iz sesije
+        
+    Returns:
+        Lista poruka s ključevima role i content
+    """
+    messages = []
+    if "message" in entry:
+        messages.append({"role": "user", "content": entry["message"]})
+    response = entry.get("response")
+    if isinstance(response, dict) and "response" in response:
+        messages.append({"role": "assistant", "content": response["response"]})
+    return messages
+
+def entry_tokens(entry: Dict[str, Any]) -> int:
+    """Broj tokena koje poruka zauzima u historiji agenta (sadržaj + 4 tokena po poruci)."""
+    from .token_counter import count_tokens_batch
+    
+    messages = agent_chat_messages(entry)
+    counts = count_tokens_batch([str(m["content"] or "") for m in messages], AGENT_HISTORY_MODEL)
+    return sum(counts) + 4 * len(messages)
+
+def _fill_window(entries: Iterator[Tuple[Dict[str, Any], int]],
+                 max_tokens: Optional[int]) -> Tuple[List[Dict[str, Any]], bool]:
+    """Uzima poruke (od najnovije) dok ne potroši budžet; vraća ih od starije prema novijoj."""
+    selected = []
+    used_tokens = 0
+    truncated = False
+    for entry, tokens in entries:
+        if max_tokens is not None and used_tokens + tokens > max_tokens:
+            truncated = True
+            break
+        used_tokens += tokens
+        selected.append(entry)
+    selected.reverse()
+    return selected, truncated
+
+class SessionStore:
+    """
+    Sučelje za pohranu historije /chat sesija.
+
+    Poruka je rječnik s ključevima agent, message i response. Implementacije
+    koje dijele stanje izvan procesa (SQLite, Redis) omogućuju da više uvicorn
+    workera vidi iste sesije bez sticky routinga.
+
+    Za kompatibilnost sa starim session_memory rječnikom store podržava
+    `session_id in store`, `store[session_id]` i `store.keys()`.
+    """
+
+    def append(self, session_id: str, entry: Dict[str, Any]) -> None:
+        """Dodaje poruku na kraj sesije, kreirajući sesiju ako ne postoji."""
+        raise NotImplementedError
+
+    def get(self, session_id: str) -> List[Dict[str, Any]]:
+        """Vraća sve poruke sesije ili praznu listu ako sesija ne postoji."""
+        raise NotImplementedError
+
+    def has_session(self, session_id: str) -> bool:
+        """Provjerava postoji li sesija."""
+        raise NotImplementedError
+
+    def list_sessions(self) -> List[str]:
+        """Vraća ID-eve svih sesija, starije prvo."""
+        raise NotImplementedError
+
+    def list_sessions_page(self, limit: int = SESSIONS_PAGE_SIZE,
+                           after: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Vraća stranicu sesija po vremenu kreiranja, novije prvo.
+        
+        Args:
+            limit: Broj sesija na stranici
+            after: Kursor iz prethodne stranice (None za prvu stranicu)
+            
+        Returns:
+            Sesije (session_id, created_at, message_count) i kursor sljedeće stranice
+            
+        Raises:
+            ValueError: Ako kursor nije ispravan
+        """
+        raise NotImplementedError
+
+    def delete(self, session_id: str) -> bool:
+        """Briše sesiju; vraća True ako je sesija postojala."""
+        raise NotImplementedError
+
+    def count(self, session_id: str) -> int:
+        """Vraća broj poruka u sesiji."""
+        raise NotImplementedError
+
+    def get_recent(self, session_id: str, limit: int) -> List[Dict[str, Any]]:
+        """Vraća zadnjih limit poruka sesije, starije prvo."""
+        raise NotImplementedError
+
+    def iter_agent_entries(self, session_id: str, agent: str) -> Iterator[Tuple[Dict[str, Any], int]]:
+        """Vraća poruke jednog agenta s brojem tokena, od najnovije prema starijima."""
+        raise NotImplementedError
+
+    def get_agent_window(self, session_id: str, agent: str,
+                         max_tokens: Optional[int] = AGENT_HISTORY_MAX_TOKENS) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Vraća najnovije poruke agenta koje stanu u budžet tokena.
+        
+        Poruke se čitaju iz indeksa agenta od najnovije prema starijima dok se
+        ne potroši budžet, pa cijena ovisi samo o broju korištenih poruka.
+        
+        Args:
+            session_id: ID sesije
+            agent: Naziv agenta
+            max_tokens: Budžet tokena (None za cijelu historiju agenta)
+            
+        Returns:
+            Poruke (starije prvo) i oznaka jesu li starije poruke izostavljene
+        """
+        return _fill_window(self.iter_agent_entries(session_id, agent), max_tokens)
+
+    def get_agent_history(self, session_id: str, agent: str,
+                          max_tokens: Optional[int] = AGENT_HISTORY_MAX_TOKENS) -> List[Dict[str, str]]:
+        """
+        Vraća historiju agenta spremnu za chat API, unutar budžeta tokena.
+        
+        Returns:
+            Lista poruka s ključevima role i content, starije prvo
+        """
+        window, _ = self.get_agent_window(session_id, agent, max_tokens)
+        history = []
+        for entry in window:
+            history.extend(agent_chat_messages(entry))
+        return history
+
+    def __contains__(self, session_id: object) -> bool:
+        return isinstance(session_id, str) and self.has_session(session_id)
+
+    def __getitem__(self, session_id: str) -> List[Dict[str, Any]]:
+        if not self.has_session(session_id):
+            raise KeyError(session_id)
+        return self.get(session_id)
+
+    def keys(self) -> List[str]:
+        return self.list_sessions()
+
+class InMemorySessionStore(SessionStore):
+    """
+    Sesije u memoriji procesa (ograničene zajedničkim budžetom SessionCache).
+    Uz poruke se za svakog agenta vodi lista (indeks poruke, broj tokena),
+    a SessionOrder drži sesije sortirane po vremenu kreiranja.
+    """
+
+    def __init__(self):
+        self.sessions = SessionCache("session_store")
+        self.order = SessionOrder()
+
+    def append(self, session_id: str, entry: Dict[str, Any]) -> None:
+        tokens = entry_tokens(entry)
+        # Prikvačena sesija ostaje u memoriji od dohvaćanja do prijave nove veličine;
+        # inače je drugi thread može izbaciti (zapisati na disk) prije promjene
+        with self.sessions.pinned(session_id, create=lambda: {"messages": [], "by_agent": {}}) as session:
+            if not session["messages"]:
+                self.order.add(session_id, time.time())
+            session["by_agent"].setdefault(entry.get("agent"), []).append((len(session["messages"]), tokens))
+            session["messages"].append(entry)
+            self.sessions.grow(session_id, entry)
+
+    def get(self, session_id: str) -> List[Dict[str, Any]]:
+        session = self.sessions.get(session_id)
+        return session["messages"] if session else []
+
+    def has_session(self, session_id: str) -> bool:
+        return session_id in self.sessions
+
+    def list_sessions(self) -> List[str]:
+        return list(self.order)
+
+    def list_sessions_page(self, limit: int = SESSIONS_PAGE_SIZE,
+                           after: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        items, next_cursor = self.order.page(limit, after)
+        sessions = []
+        for created_at, session_id in items:
+            # Metapodaci se čitaju bez učitavanja izbačene sesije i bez mijenjanja LRU redoslijeda
+            info = self.sessions.info(session_id)
+            sessions.append({
+                "session_id": session_id,
+                "created_at": created_at,
+                "message_count": info["message_count"] if info else 0
+            })
+        return sessions, next_cursor
+
+    def delete(self, session_id: str) -> bool:
+        self.order.remove(session_id)
+        return self.sessions.pop(session_id, None) is not None
+
+    def count(self, session_id: str) -> int:
+        return len(self.get(session_id))
+
+    def get_recent(self, session_id: str, limit: int) -> List[Dict[str, Any]]:
+        messages = self.get(session_id)
+        return messages[-limit:] if limit > 0 else []
+
+    def iter_agent_entries(self, session_id: str, agent: str) -> Iterator[Tuple[Dict[str, Any], int]]:
+        session = self.sessions.get(session_id)
+        if not session:
+            return
+        messages = session["messages"]
+        for index, tokens in reversed(session["by_agent"].get(agent, [])):
+            yield messages[index], tokens
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sesije u SQLite bazi (WAL način rada), dijeljene između procesa na istom
+    računalu. Svaki proces ima svoju konekciju; pisanja čekaju na zaključanu
+    bazu do busy_timeout.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS chat_sessions (
+            session_id TEXT PRIMARY KEY,
+            created_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_chat_sessions_created ON chat_sessions (created_at, session_id);
+        CREATE TABLE IF NOT EXISTS chat_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            data TEXT NOT NULL,
+            agent TEXT,
+            tokens INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS idx_chat_messages_session ON chat_messages (session_id, id);
+    """
+
+    def __init__(self, db_path: str = SESSION_STORE_DB_PATH):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        
+        # Baze bez indeksa agenata dobivaju nove stupce, a stare poruke agenta i
+        # broj tokena jednom, pri migraciji (user_version 1), a ne pri svakom čitanju
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(chat_messages)")}
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        with self._conn:
+            if "agent" not in columns:
+                self._conn.execute("ALTER TABLE chat_messages ADD COLUMN agent TEXT")
+                self._conn.execute("ALTER TABLE chat_messages ADD COLUMN tokens INTEGER")
+            if version < 1:
+                rows = self._conn.execute("SELECT id, data FROM chat_messages WHERE tokens IS NULL").fetchall()
+                for row_id, data in rows:
+                    entry = json.loads(data)
+                    self._conn.execute(
+                        "UPDATE chat_messages SET agent = ?, tokens = ? WHERE id = ?",
+                        (entry.get("agent"), entry_tokens(entry), row_id)
+                    )
+                self._conn.execute("PRAGMA user_version = 1")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_chat_messages_agent ON chat_messages (session_id, agent, id)"
+            )
+            # Indeks (created_at, session_id) zamjenjuje stari indeks samo po created_at
+            self._conn.execute("DROP INDEX IF EXISTS idx_chat_sessions_created_at")
+
+    def append(self, session_id: str, entry: Dict[str, Any]) -> None:
+        tokens = entry_tokens(entry)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO chat_sessions (session_id, created_at) VALUES (?, ?)",
+                (session_id, time.time())
+            )
+            self._conn.execute(
+                "INSERT INTO chat_messages (session_id, data, agent, tokens) VALUES (?, ?, ?, ?)",
+                (session_id, json.dumps(entry, ensure_ascii=False, default=str), entry.get("agent"), tokens)
+            )
+
+    def get(self, session_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM chat_messages WHERE session_id = ? ORDER BY id", (session_id,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def has_session(self, session_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM chat_sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row is not None
+
+    def list_sessions(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT session_id FROM chat_sessions ORDER BY created_at"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def list_sessions_page(self, limit: int = SESSIONS_PAGE_SIZE,
+                           after: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        # Keyset stranica po indeksu (created_at, session_id); čita se jedan
+        # redak više da se zna postoji li sljedeća stranica
+        query = "SELECT session_id, created_at FROM chat_sessions"
+        params: List[Any] = []
+        if after is not None:
+            query += " WHERE (created_at, session_id) < (?, ?)"
+            params.extend(decode_cursor(after))
+        query += " ORDER BY created_at DESC, session_id DESC LIMIT ?"
+        params.append(max(limit, 0) + 1)
+        
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            sessions = [
+                {
+                    "session_id": session_id,
+                    "created_at": created_at,
+                    "message_count": self._conn.execute(
+                        "SELECT COUNT(*) FROM chat_messages WHERE session_id = ?", (session_id,)
+                    ).fetchone()[0]
+                }
+                for session_id, created_at in rows
+            ]
+        
+        next_cursor = encode_cursor(rows[-1][1], rows[-1][0]) if has_more and rows else None
+        return sessions, next_cursor
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chat_messages WHERE session_id = ?", (session_id,))
+            deleted = self._conn.execute(
+                "DELETE FROM chat_sessions WHERE session_id = ?", (session_id,)
+            ).rowcount
+        return deleted > 0
+
+    def count(self, session_id: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM chat_messages WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+
+    def get_recent(self, session_id: str, limit: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM chat_messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+                (session_id, max(limit, 0))
+            ).fetchall()
+        return [json.loads(row[0]) for row in reversed(rows)]
+
+    def iter_agent_entries(self, session_id: str, agent: str) -> Iterator[Tuple[Dict[str, Any], int]]:
+        last_id = None
+        while True:
+            # Stranice po indeksu (session_id, agent, id), od najnovije poruke
+            with self._lock:
+                if last_id is None:
+                    rows = self._conn.execute(
+                        "SELECT id, data, tokens FROM chat_messages WHERE session_id = ? AND agent = ? "
+                        "ORDER BY id DESC LIMIT ?",
+                        (session_id, agent, AGENT_HISTORY_PAGE)
+                    ).fetchall()
+                else:
+                    rows = self._conn.execute(
+                        "SELECT id, data, tokens FROM chat_messages WHERE session_id = ? AND agent = ? AND id < ? "
+                        "ORDER BY id DESC LIMIT ?",
+                        (session_id, agent, last_id, AGENT_HISTORY_PAGE)
+                    ).fetchall()
+            for row_id, data, tokens in rows:
+                entry = json.loads(data)
+                yield entry, tokens if tokens is not None else entry_tokens(entry)
+            if len(rows) < AGENT_HISTORY_PAGE:
+                return
+            last_id = rows[-1][0]
+
+def _text(item: Any) -> str:
+    """Redis klijent bez decode_responses vraća bytes."""
+    return item.decode("utf-8") if isinstance(item, bytes) else item
+
+class RedisSessionStore(SessionStore):
+    """
+    Sesije u Redisu, dijeljene između procesa i računala.
+
+    Poruke sesije su Redis lista <prefiks><session_id>, a sorted set
+    <prefiks>index pamti sve sesije s vremenom kreiranja kao scoreom.
+    Lista <prefiks><session_id>:agent:<agent> sadrži poruke jednog agenta s
+    brojem tokena, a set <prefiks><session_id>:agents nazive tih agenata.
+    """
+
+    def __init__(self, client: Any = None, url: str = REDIS_URL, prefix: str = REDIS_KEY_PREFIX):
+        """
+        Args:
+            client: Postojeći Redis klijent (npr. fakeredis u testovima)
+            url: Redis URL ako klijent nije zadan
+            prefix: Prefiks svih ključeva
+        """
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self.index_key = f"{prefix}index"
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.prefix}{session_id}"
+
+    def _agent_key(self, session_id: str, agent: str) -> str:
+        return f"{self.prefix}{session_id}:agent:{agent}"
+
+    def append(self, session_id: str, entry: Dict[str, Any]) -> None:
+        data = json.dumps(entry, ensure_ascii=False, default=str)
+        agent = str(entry.get("agent"))
+        pipe = self.client.pipeline(transaction=True)
+        pipe.zadd(self.index_key, {session_id: time.time()}, nx=True)
+        pipe.rpush(self._key(session_id), data)
+        pipe.sadd(f"{self._key(session_id)}:agents", agent)
+        pipe.rpush(self._agent_key(session_id, agent), json.dumps({"tokens": entry_tokens(entry), "entry": data}))
+        pipe.execute()
+
+    def get(self, session_id: str) -> List[Dict[str, Any]]:
+        return [json.loads(item) for item in self.client.lrange(self._key(session_id), 0, -1)]
+
+    def has_session(self, session_id: str) -> bool:
+        return self.client.zscore(self.index_key, session_id) is not None
+
+    def list_sessions(self) -> List[str]:
+        return [_text(item) for item in self.client.zrange(self.index_key, 0, -1)]
+
+    def list_sessions_page(self, limit: int = SESSIONS_PAGE_SIZE,
+                           after: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        limit = max(limit, 0)
+        if after is None:
+            items = self.client.zrevrange(self.index_key, 0, limit, withscores=True)
+        else:
+            created_at, session_id = decode_cursor(after)
+            if isinstance(created_at, bool) or not isinstance(created_at, (int, float)):
+                raise ValueError(f"Neispravan kursor: {after}")
+            rank = self.client.zrevrank(self.index_key, session_id)
+            if rank is not None:
+                items = self.client.zrevrange(self.index_key, rank + 1, rank + limit + 1, withscores=True)
+            else:
+                # Sesija iz kursora je obrisana; kao u SessionOrder.page nastavlja se iza
+                # (created_at, session_id): prvo sesije s istim vremenom i manjim ID-em, zatim starije
+                items = [
+                    (item, score)
+                    for item, score in self.client.zrevrangebyscore(
+                        self.index_key, created_at, created_at, withscores=True
+                    )
+                    if _text(item) < session_id
+                ][:limit + 1]
+                if len(items) <= limit:
+                    items += self.client.zrevrangebyscore(
+                        self.index_key, f"({created_at}", "-inf", start=0, num=limit + 1 - len(items), withscores=True
+                    )
+        
+        has_more = len(items) > limit
+        items = [(_text(item), score) for item, score in items[:limit]]
+        pipe = self.client.pipeline(transaction=False)
+        for session_id, _ in items:
+            pipe.llen(self._key(session_id))
+        counts = pipe.execute() if items else []
+        
+        sessions = [
+            {"session_id": session_id, "created_at": score, "message_count": count}
+            for (session_id, score), count in zip(items, counts)
+        ]
+        next_cursor = encode_cursor(items[-1][1], items[-1][0]) if has_more and items else None
+        return sessions, next_cursor
+
+    def delete(self, session_id: str) -> bool:
+        agents_key = f"{self._key(session_id)}:agents"
+        agent_keys = [
+            self._agent_key(session_id, _text(agent))
+            for agent in self.client.smembers(agents_key)
+        ]
+        pipe = self.client.pipeline(transaction=True)
+        pipe.zrem(self.index_key, session_id)
+        pipe.delete(self._key(session_id), agents_key, *agent_keys)
+        removed, _ = pipe.execute()
+        return bool(removed)
+
+    def count(self, session_id: str) -> int:
+        return self.client.llen(self._key(session_id))
+
+    def get_recent(self, session_id: str, limit: int) -> List[Dict[str, Any]]:
+        if limit <= 0:
+            return []
+        return [json.loads(item) for item in self.client.lrange(self._key(session_id), -limit, -1)]
+
+    def iter_agent_entries(self, session_id: str, agent: str) -> Iterator[Tuple[Dict[str, Any], int]]:
+        key = self._agent_key(session_id, agent)
+        end = -1
+        while True:
+            # Stranice s kraja liste agenta, od najnovije poruke
+            items = self.client.lrange(key, end - AGENT_HISTORY_PAGE + 1, end)
+            for item in reversed(items):
+                record = json.loads(item)
+                yield json.loads(record["entry"]), record["tokens"]
+            if len(items) < AGENT_HISTORY_PAGE:
+                return
+            end -= AGENT_HISTORY_PAGE
+
+def create_session_store(backend: str = SESSION_STORE_BACKEND) -> SessionStore:
+    """
+    Kreira store sesija prema nazivu backenda. Ako odabrani backend nije
+    dostupan, koristi se store u memoriji.
+
+    Args:
+        backend: "memory", "sqlite" ili "redis"
+
+    Returns:
+        Instanca SessionStore
+    """
+    try:
+        if backend == "sqlite":
+            return SQLiteSessionStore()
+        if backend == "redis":
+            store = RedisSessionStore()
+            store.client.ping()
+            return store
+    except Exception as e:
+        print(f"Store sesija '{backend}' nije dostupan ({e}), koristim memoriju")
+        return InMemorySessionStore()
+
+    if backend != "memory":
+        print(f"Nepoznat store sesija '{backend}', koristim memoriju")
+    return InMemorySessionStore()
+
+class SessionHistory:
+    """
+    Lijeni pogled na historiju sesije koji main.py predaje agentima umjesto
+    liste poruka. Podržava `if history`, len(), iteraciju i rezanje zadnjih
+    poruka (history[-3:]), a for_agent() vraća historiju jednog agenta iz
+    indeksa agenta bez čitanja cijele sesije.
+    """
+
+    def __init__(self, store: SessionStore, session_id: str):
+        self.store = store
+        self.session_id = session_id
+
+    def __bool__(self) -> bool:
+        return self.store.has_session(self.session_id)
+
+    def __len__(self) -> int:
+        return self.store.count(self.session_id)
+
+    def __iter__(self):
+        return iter(self.store.get(self.session_id))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice) and index.stop is None and index.step is None \
+                and index.start is not None and index.start < 0:
+            return self.store.get_recent(self.session_id, -index.start)
+        return self.store.get(self.session_id)[index]
+
+    def for_agent(self, agent: str, max_tokens: Optional[int] = AGENT_HISTORY_MAX_TOKENS) -> List[Dict[str, str]]:
+        return self.store.get_agent_history(self.session_id, agent, max_tokens)
+
+    def agent_window(self, agent: str, max_tokens: Optional[int] = AGENT_HISTORY_MAX_TOKENS) -> Tuple[List[Dict[str, Any]], bool]:
+        return self.store.get_agent_window(self.session_id, agent, max_tokens)
+
+def agent_window(previous_messages, agent: str,
+                 max_tokens: Optional[int] = AGENT_HISTORY_MAX_TOKENS) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Vraća najnovije poruke agenta koje stanu u budžet tokena.
+    
+    Args:
+        previous_messages: SessionHistory ili obična lista poruka sesije
+        agent: Naziv agenta
+        max_tokens: Budžet tokena (None za cijelu historiju agenta)
+        
+    Returns:
+        Poruke (starije prvo) i oznaka jesu li starije poruke izostavljene
+    """
+    if isinstance(previous_messages, SessionHistory):
+        return previous_messages.agent_window(agent, max_tokens)
+    
+    # Obična lista: isti budžet, od najnovije poruke agenta
+    entries = (
+        (entry, entry_tokens(entry))
+        for entry in reversed(previous_messages or [])
+        if entry.get("agent") == agent
+    )
+    return _fill_window(entries, max_tokens)
+
+def agent_history(previous_messages, agent: str, max_tokens: Optional[int] = AGENT_HISTORY_MAX_TOKENS) -> List[Dict[str, str]]:
+    """
+    Vraća historiju agenta za chat API unutar budžeta tokena.
+    
+    Args:
+        previous_messages: SessionHistory ili obična lista poruka sesije
+        agent: Naziv agenta
+        max_tokens: Budžet tokena (None za cijelu historiju agenta)
+        
+    Returns:
+        Lista poruka s ključevima role i content, starije prvo
+    """
+    window, _ = agent_window(previous_messages, agent, max_tokens)
+    history = []
+    for entry in window:
+        history.extend(agent_chat_messages(entry))
+    return history
+
+# Globalni store sesija; ime session_memory je zadržano zbog postojećeg koda
+session_memory = create_session_store()
 
 def save_to_session(session_id, agent, message, response):
-    if session_id not in session_memory:
-        session_memory[session_id] = []
-    session_memory[session_id].append({"agent": agent, "message": message, "response": response})
+    session_memory.append(session_id, {"agent": agent, "message": message, "response": response})
 
 def get_session(session_id):
-    return session_memory.get(session_id, [])
\ No newline at end of file
+    return session_memory.get(session_id)
+
+def get_session_history(session_id):
+    return SessionHistory(session_memory, session_id)
+
+def list_sessions():
+    return session_memory.list_sessions()
+
+def list_sessions_page(limit=SESSIONS_PAGE_SIZE, after=None):
+    return session_memory.list_sessions_page(limit, after)
+
+def delete_session(session_id):
+    return session_memory.delete(session_id)
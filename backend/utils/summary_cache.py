@@ -0,0 +1,209 @@
+import os
+import time
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from .chunk_cache import content_hash
+
+# Putanja do baze keša sažetaka (zadano memory/_summary_cache.db)
+SUMMARY_CACHE_PATH = os.getenv(
+    "SUMMARY_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "memory", "_summary_cache.db")
+)
+
+# Maksimalni broj sažetaka u kešu; najdulje nekorišteni se izbacuju
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "10000"))
+
+# Koliko sekundi sažetak vrijedi od trenutka kada je stvoren
+SUMMARY_CACHE_TTL = float(os.getenv("SUMMARY_CACHE_TTL", str(7 * 24 * 3600)))
+
+def summary_key(text: str, max_tokens: int, model: str, previous_summary: Optional[str] = None) -> str:
+    """
+    Vraća ključ sažetka: hash teksta, limita tokena, modela i prethodnog sažetka.
+
+    Args:
+        text: Tekst koji se sažima
+        max_tokens: Maksimalni broj tokena sažetka
+        model: Model koji sažima
+        previous_summary: Sažetak u koji se tekst ugrađuje (ako postoji)
+
+    Returns:
+        Hex string ključa
+    """
+    return content_hash("\0".join([model, str(max_tokens), previous_summary or "", text]))
+
+def prefix_keys(blocks: List[str], max_tokens: int, model: str) -> List[str]:
+    """
+    Vraća ključeve svih prefiksa niza blokova (npr. formatiranih poruka).
+
+    Ključ prefiksa 1..i je hash ključa prefiksa 1..i-1 i bloka i, pa se svi
+    ključevi računaju jednim prolazom, a sažetak poruka 1..n se može pronaći
+    i kada sesija naraste na 1..n+k.
+
+    Args:
+        blocks: Blokovi teksta redom
+        max_tokens: Maksimalni broj tokena sažetka
+        model: Model koji sažima
+
+    Returns:
+        Lista ključeva, po jedan za svaki prefiks
+    """
+    keys = []
+    key = content_hash(f"prefix\0{model}\0{max_tokens}")
+    for block in blocks:
+        key = content_hash(f"{key}\0{block}")
+        keys.append(key)
+    return keys
+
+class SummaryCache:
+    """
+    Perzistentni keš sažetaka u SQLite bazi, adresiran sadržajem.
+
+    Sažetak se sprema pod hash ulaza (summary_key ili prefix_keys). Unosi
+    stariji od TTL-a se ne vraćaju, a kada keš premaši maksimalnu veličinu
+    izbacuju se unosi koji najdulje nisu korišteni (LRU).
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS summaries (
+            key TEXT PRIMARY KEY,
+            summary TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_summaries_last_used ON summaries (last_used);
+    """
+
+    def __init__(self, db_path: str = SUMMARY_CACHE_PATH, max_entries: int = SUMMARY_CACHE_MAX_ENTRIES,
+                 ttl: float = SUMMARY_CACHE_TTL):
+        """
+        Args:
+            db_path: Putanja do baze
+            max_entries: Maksimalni broj sažetaka
+            ttl: Trajanje sažetka u sekundama
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.prefix_hits = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._size = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        # Baza se otvara tek pri prvom korištenju keša
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.SCHEMA)
+            with conn:
+                conn.execute("DELETE FROM summaries WHERE created_at < ?", (time.time() - self.ttl,))
+            self._size = conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[str]:
+        """Vraća sažetak za ključ ili None ako ne postoji ili je istekao."""
+        found = self.get_longest([key])
+        if found is None:
+            return None
+        return found[1]
+
+    def get_longest(self, keys: List[str]) -> Optional[Tuple[int, str]]:
+        """
+        Traži najdulji prefiks koji ima sažetak.
+
+        Args:
+            keys: Ključevi prefiksa, od najkraćeg prema najduljem
+
+        Returns:
+            Indeks pronađenog ključa i njegov sažetak, ili None
+        """
+        if not keys:
+            return None
+        try:
+            with self._lock:
+                conn = self._connect()
+                now = time.time()
+                found: Dict[str, str] = {}
+                # Upit u dijelovima zbog limita broja parametara u SQLite-u
+                for start in range(0, len(keys), 500):
+                    part = keys[start:start + 500]
+                    rows = conn.execute(
+                        f"SELECT key, summary FROM summaries WHERE key IN ({','.join('?' * len(part))}) "
+                        "AND created_at >= ?",
+                        (*part, now - self.ttl)
+                    ).fetchall()
+                    found.update(rows)
+
+                for index in range(len(keys) - 1, -1, -1):
+                    if keys[index] in found:
+                        with conn:
+                            conn.execute("UPDATE summaries SET last_used = ? WHERE key = ?", (now, keys[index]))
+                        self.hits += 1
+                        if index < len(keys) - 1:
+                            self.prefix_hits += 1
+                        return index, found[keys[index]]
+                self.misses += 1
+                return None
+        except sqlite3.Error as e:
+            print(f"Greška pri čitanju keša sažetaka: {e}")
+            return None
+
+    def set(self, key: str, summary: str) -> None:
+        """Sprema sažetak i izbacuje najdulje nekorištene unose ako je keš pun."""
+        try:
+            with self._lock:
+                conn = self._connect()
+                now = time.time()
+                with conn:
+                    exists = conn.execute("SELECT 1 FROM summaries WHERE key = ?", (key,)).fetchone()
+                    conn.execute(
+                        "INSERT OR REPLACE INTO summaries (key, summary, created_at, last_used) VALUES (?, ?, ?, ?)",
+                        (key, summary, now, now)
+                    )
+                    if not exists:
+                        self._size += 1
+                    if self._size > self.max_entries:
+                        # Izbacujemo i istekle unose, a zatim najdulje nekorištene
+                        conn.execute("DELETE FROM summaries WHERE created_at < ?", (now - self.ttl,))
+                        conn.execute(
+                            "DELETE FROM summaries WHERE key IN "
+                            "(SELECT key FROM summaries ORDER BY last_used LIMIT max((SELECT COUNT(*) FROM summaries) - ?, 0))",
+                            (self.max_entries,)
+                        )
+                        self._size = conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Greška pri spremanju u keš sažetaka: {e}")
+
+    def clear(self) -> None:
+        """Briše keš i resetira brojače."""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM summaries")
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+            self.prefix_hits = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Vraća statistiku korištenja keša."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "prefix_hits": self.prefix_hits,
+                "misses": self.misses,
+                "size": self._size,
+                "max_entries": self.max_entries
+            }
+
+# Globalni keš sažetaka
+summary_cache = SummaryCache()
@@ -0,0 +1,105 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Set, Optional
+
+# Koliko sekundi nakon zadnje poruke sesije čekamo prije sažimanja
+SUMMARY_DEBOUNCE_SECONDS = 2.0
+
+# Maksimalni broj sažimanja koja se izvršavaju istovremeno
+SUMMARY_MAX_WORKERS = 2
+
+class SummaryQueue:
+    """
+    Pozadinski red za sažimanje sesija.
+
+    Svaka sesija u redu ima rok; novi zahtjev za istu sesiju pomiče rok
+    (debounce), pa nekoliko brzih poruka rezultira jednim sažetkom. Sažimanja
+    se izvršavaju u ograničenom poolu threadova, a ista sesija se nikad ne
+    sažima u dva threada istovremeno: zahtjev koji stigne tijekom sažimanja
+    ponovno pokreće sažimanje nakon što trenutno završi.
+    """
+
+    def __init__(self, summarize: Callable[[str], None],
+                 debounce_seconds: float = SUMMARY_DEBOUNCE_SECONDS,
+                 max_workers: int = SUMMARY_MAX_WORKERS):
+        """
+        Args:
+            summarize: Funkcija koja sažima sesiju s danim ID-om
+            debounce_seconds: Vrijeme mirovanja sesije prije sažimanja
+            max_workers: Maksimalni broj istovremenih sažimanja
+        """
+        self.summarize = summarize
+        self.debounce_seconds = debounce_seconds
+        self.max_workers = max_workers
+
+        # Rokovi sesija koje čekaju sažimanje i sesije koje se upravo sažimaju
+        self._due: Dict[str, float] = {}
+        self._running: Set[str] = set()
+        self._cond = threading.Condition()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._scheduler: Optional[threading.Thread] = None
+
+    def schedule(self, session_id: str) -> None:
+        """Zakazuje sažimanje sesije nakon debounce perioda."""
+        with self._cond:
+            self._due[session_id] = time.monotonic() + self.debounce_seconds
+            self._ensure_started()
+            self._cond.notify_all()
+
+    def pending(self) -> int:
+        """Vraća broj sesija koje čekaju ili se upravo sažimaju."""
+        with self._cond:
+            return len(self._due) + len(self._running)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Odmah pokreće sva zakazana sažimanja i čeka da završe.
+
+        Args:
+            timeout: Maksimalno vrijeme čekanja u sekundama
+
+        Returns:
+            True ako je red prazan, False ako je isteklo vrijeme
+        """
+        with self._cond:
+            now = time.monotonic()
+            for session_id in self._due:
+                self._due[session_id] = now
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: not self._due and not self._running, timeout)
+
+    def _ensure_started(self) -> None:
+        if self._scheduler is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="summary")
+            self._scheduler = threading.Thread(target=self._run, name="summary-scheduler", daemon=True)
+            self._scheduler.start()
+
+    def _run(self) -> None:
+        """Petlja koja sesije s isteklim rokom predaje poolu."""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                next_due = None
+                for session_id, due in list(self._due.items()):
+                    if session_id in self._running:
+                        # Sesija se već sažima; čeka se kraj tog sažimanja
+                        continue
+                    if due <= now:
+                        del self._due[session_id]
+                        self._running.add(session_id)
+                        self._executor.submit(self._work, session_id)
+                    elif next_due is None or due < next_due:
+                        next_due = due
+
+                self._cond.wait(None if next_due is None else next_due - now)
+
+    def _work(self, session_id: str) -> None:
+        try:
+            self.summarize(session_id)
+        except Exception as e:
+            print(f"Greška pri sažimanju sesije {session_id}: {e}")
+        finally:
+            with self._cond:
+                self._running.discard(session_id)
+                self._cond.notify_all()
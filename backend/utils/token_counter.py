@@ -1,5 +1,8 @@
 import tiktoken
-from typing import Dict, List, Union, Optional
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Union, Optional, Tuple, Any
 
 # Modelirani enkodera za različite modele
 MODEL_MAX_TOKENS = {
@@ -29,9 +32,104 @@ MODEL_MAX_TOKENS = {
     "default": 4096
 }
 
+# Registar enkodera - svaki enkoder se učitava samo jednom po procesu
+_ENCODER_REGISTRY: Dict[str, Any] = {}
+_ENCODER_LOCK = threading.Lock()
+
+# Maksimalni broj zapamćenih brojeva tokena
+TOKEN_CACHE_SIZE = 8192
+
+class TokenCountCache:
+    """
+    Ograničeni LRU keš brojeva tokena.
+    Ključ je (hash teksta, naziv enkodiranja), tako da keš ne drži same tekstove.
+    """
+    
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Tuple[bytes, str], int]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(text: str, encoding_name: str) -> Tuple[bytes, str]:
+        """Generira ključ za keš na osnovu teksta i enkodiranja"""
+        digest = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        return (digest, encoding_name)
+    
+    def get(self, key: Tuple[bytes, str]) -> Optional[int]:
+        """Dohvaća broj tokena iz keša i označava ga kao nedavno korišten"""
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def put(self, key: Tuple[bytes, str], value: int) -> None:
+        """Dodaje broj tokena u keš i izbacuje najstariji unos ako je keš pun"""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def clear(self) -> None:
+        """Briše keš i resetira brojače"""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+    
+    def stats(self) -> Dict[str, int]:
+        """Vraća statistiku korištenja keša"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._data),
+                "maxsize": self.maxsize
+            }
+
+# Globalni keš brojeva tokena
+token_count_cache = TokenCountCache()
+
+def get_encoder(model: str = "gpt-4o"):
+    """
+    Vraća tiktoken enkoder za zadani model iz registra.
+    Enkoder se kreira samo pri prvom pozivu za dano enkodiranje.
+    
+    Args:
+        model: Naziv modela
+        
+    Returns:
+        tiktoken enkoder
+    """
+    encoding_name = get_encoding_name(model)
+    encoder = _ENCODER_REGISTRY.get(encoding_name)
+    if encoder is None:
+        with _ENCODER_LOCK:
+            encoder = _ENCODER_REGISTRY.get(encoding_name)
+            if encoder is None:
+                encoder = tiktoken.encoding_for_model(encoding_name)
+                _ENCODER_REGISTRY[encoding_name] = encoder
+    return encoder
+
+def get_token_cache_stats() -> Dict[str, int]:
+    """Vraća hit/miss statistiku keša brojeva tokena."""
+    return token_count_cache.stats()
+
+def clear_token_cache() -> None:
+    """Briše keš brojeva tokena."""
+    token_count_cache.clear()
+
 def num_tokens_from_string(text: str, model: str = "gpt-4o") -> int:
     """
     Vraća broj tokena u tekstu za zadani model.
+    Rezultati se pamte u LRU kešu pa ponovljeni tekstovi ne prolaze kroz enkoder.
     
     Args:
         text: Tekst za brojanje tokena
@@ -40,21 +138,79 @@ def num_tokens_from_string(text: str, model: str = "gpt-4o") -> int:
     Returns:
         Broj tokena u tekstu
     """
+    if not text:
+        return 0
+    
     try:
-        # Prilagodi model na format za koji tiktoken ima enkoder
-        encoding_name = get_encoding_name(model)
+        # Dobavi enkoder iz registra
+        encoder = get_encoder(model)
         
-        # Dobavi enkoder
-        encoder = tiktoken.encoding_for_model(encoding_name)
-        
-        # Izbroji tokene
-        tokens = encoder.encode(text)
-        return len(tokens)
+        # Provjeri keš prije enkodiranja
+        key = TokenCountCache.make_key(text, encoder.name)
+        count = token_count_cache.get(key)
+        if count is None:
+            count = len(encoder.encode(text))
+            token_count_cache.put(key, count)
+        return count
     except Exception as e:
         # Fallback na procjenu: otprilike 4 karaktera = 1 token
         print(f"Greška pri brojanju tokena: {e}. Koristim aproksimaciju.")
         return len(text) // 4
 
+def count_tokens_batch(texts: List[str], model: str = "gpt-4o", num_threads: int = 8) -> List[int]:
+    """
+    Vraća broj tokena za svaki tekst u listi.
+    Tekstovi koji nisu u kešu enkodiraju se jednim batch pozivom
+    koji tiktoken paralelizira kroz thread pool.
+    
+    Args:
+        texts: Lista tekstova za brojanje tokena
+        model: Naziv modela za koji se broje tokeni
+        num_threads: Broj threadova za batch enkodiranje
+        
+    Returns:
+        Lista brojeva tokena, istim redoslijedom kao ulazni tekstovi
+    """
+    counts: List[int] = [0] * len(texts)
+    
+    try:
+        encoder = get_encoder(model)
+    except Exception as e:
+        print(f"Greška pri brojanju tokena: {e}. Koristim aproksimaciju.")
+        return [len(text) // 4 for text in texts]
+    
+    # Prvo skupljamo tekstove kojih nema u kešu (isti tekst enkodiramo samo jednom)
+    pending: Dict[Tuple[bytes, str], List[int]] = {}
+    pending_texts: List[str] = []
+    for i, text in enumerate(texts):
+        if not text:
+            continue
+        key = TokenCountCache.make_key(text, encoder.name)
+        if key in pending:
+            pending[key].append(i)
+            continue
+        count = token_count_cache.get(key)
+        if count is None:
+            pending[key] = [i]
+            pending_texts.append(text)
+        else:
+            counts[i] = count
+    
+    if pending_texts:
+        try:
+            encoded = encoder.encode_batch(pending_texts, num_threads=num_threads)
+            missing_counts = [len(tokens) for tokens in encoded]
+        except Exception:
+            # Batch ne uspijeva ako jedan tekst ne može biti enkodiran - brojimo pojedinačno
+            missing_counts = [num_tokens_from_string(text, model) for text in pending_texts]
+        
+        for (key, indices), count in zip(pending.items(), missing_counts):
+            token_count_cache.put(key, count)
+            for i in indices:
+                counts[i] = count
+    
+    return counts
+
 def get_encoding_name(model: str) -> str:
     """
     Vraća naziv enkodiranja za tiktoken na temelju modela.
@@ -105,18 +261,16 @@ def count_message_tokens(messages: List[Dict[str, str]], model: str = "gpt-4o")
     Returns:
         Ukupan broj tokena u porukama
     """
-    # Format poruka kao string za brojanje tokena
-    text = ""
-    for message in messages:
-        role = message.get("role", "user")
-        content = message.get("content", "")
-        # Dodamo malo ekstra tokena za format poruke
-        text += f"{role}: {content}\n\n"
+    # Svaku poruku formatiramo zasebno i brojimo sve odjednom
+    texts = [
+        f"{message.get('role', 'user')}: {message.get('content', '')}\n\n"
+        for message in messages
+    ]
     
     # Dodajemo mali overhead za format poruka
     overhead = 4 * len(messages)  # Otprilike 4 tokena po poruci za metapodatke
     
-    return num_tokens_from_string(text, model) + overhead
+    return sum(count_tokens_batch(texts, model)) + overhead
 
 def estimate_tokens_left(messages: List[Dict[str, str]], model: str = "gpt-4o") -> int:
     """
@@ -168,8 +322,7 @@ def truncate_text_to_fit(text: str, max_tokens: int, model: str = "gpt-4o") -> s
         return text
     
     # Ako je prevelik, skraćujemo ga iterativno
-    encoding_name = get_encoding_name(model)
-    encoder = tiktoken.encoding_for_model(encoding_name)
+    encoder = get_encoder(model)
     
     tokens = encoder.encode(text)
     truncated_tokens = tokens[:max_tokens]
@@ -0,0 +1,154 @@
+import os
+import threading
+from typing import Callable, Dict, List, Optional
+
+# Koliko sekundi zapis najdulje čeka u memoriji prije upisa na disk
+WRITE_BEHIND_INTERVAL = float(os.getenv("MEMORY_FLUSH_INTERVAL", "0.2"))
+
+# Broj zapisa na čekanju nakon kojeg se upis pokreće odmah
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("MEMORY_FLUSH_MAX_PENDING", "256"))
+
+class WriteBehindQueue:
+    """
+    Odgođeni upis zapisa na disk (write-behind) s grupnim commitom.
+
+    Zapisi se skupljaju u memoriji po ključu (npr. po sesiji), a pozadinski
+    thread ih upisuje nakon intervala ili kada ih se nakupi dovoljno, sve
+    ključeve jednim prolazom. Upis se izvršava pod io_lockom; tko čita s diska
+    pod istim lockom vidi sve već preuzete zapise upisane, a ostale dobiva
+    kroz pending().
+
+    S intervalom 0 svaki zapis se upisuje odmah, u threadu koji ga je dodao.
+    """
+
+    def __init__(self, write: Callable[[Dict[str, List[str]]], Dict[str, List[str]]],
+                 after_write: Optional[Callable[[], None]] = None,
+                 interval: float = WRITE_BEHIND_INTERVAL,
+                 max_pending: int = WRITE_BEHIND_MAX_PENDING):
+        """
+        Args:
+            write: Funkcija koja upisuje zapise po ključu i vraća zapise koje nije uspjela upisati
+            after_write: Funkcija koja se poziva nakon svakog upisa, izvan io_locka
+            interval: Najdulje čekanje zapisa u sekundama
+            max_pending: Broj zapisa na čekanju koji odmah pokreće upis
+        """
+        self.write = write
+        self.after_write = after_write
+        self.interval = interval
+        self.max_pending = max_pending
+
+        self.io_lock = threading.RLock()
+        self.flushes = 0
+        self.records_written = 0
+
+        self._pending: Dict[str, List[str]] = {}
+        self._count = 0
+        self._stopping = False
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, key: str, record: str) -> None:
+        """Dodaje zapis za ključ; upisat će se u sljedećem grupnom upisu."""
+        with self._cond:
+            self._pending.setdefault(key, []).append(record)
+            self._count += 1
+            if self.interval > 0:
+                self._ensure_started()
+                if self._count >= self.max_pending:
+                    self._cond.notify_all()
+                return
+        self.flush()
+
+    def pending(self, key: str) -> List[str]:
+        """Vraća zapise ključa koji još nisu upisani."""
+        with self._cond:
+            return list(self._pending.get(key, []))
+
+    def discard(self, key: str) -> None:
+        """Odbacuje neupisane zapise ključa (npr. kada su već sadržani u snapshotu)."""
+        with self._cond:
+            self._count -= len(self._pending.pop(key, []))
+
+    def flush(self) -> bool:
+        """
+        Upisuje sve zapise na čekanju u threadu pozivatelja.
+
+        Returns:
+            True ako su svi zapisi upisani
+        """
+        written = self._flush_once()
+        if self.after_write is not None:
+            self.after_write()
+        return written
+
+    def close(self) -> bool:
+        """Zaustavlja pozadinski thread i upisuje preostale zapise."""
+        with self._cond:
+            thread = self._thread
+            self._stopping = True
+            self._cond.notify_all()
+        if thread is not None:
+            thread.join()
+        with self._cond:
+            self._thread = None
+            self._stopping = False
+        return self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                "pending": self._count,
+                "flushes": self.flushes,
+                "records_written": self.records_written
+            }
+
+    def _ensure_started(self) -> None:
+        if self._thread is None and not self._stopping:
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                # Prvi zapis pokreće interval; zapisi koji stignu u tom intervalu idu u isti upis
+                self._cond.wait_for(lambda: self._count or self._stopping)
+                if self._stopping:
+                    return
+                self._cond.wait_for(lambda: self._count >= self.max_pending or self._stopping, self.interval)
+                if self._stopping:
+                    return
+
+            if not self._flush_once():
+                # Neuspjeli zapisi se ponovno pokušavaju nakon intervala
+                with self._cond:
+                    self._cond.wait(self.interval)
+                continue
+
+            if self.after_write is not None:
+                try:
+                    self.after_write()
+                except Exception as e:
+                    print(f"Greška nakon upisa na disk: {e}")
+
+    def _flush_once(self) -> bool:
+        with self.io_lock:
+            with self._cond:
+                batch, self._pending, self._count = self._pending, {}, 0
+            if not batch:
+                return True
+
+            try:
+                failed = self.write(batch)
+            except Exception as e:
+                print(f"Greška pri upisu na disk: {e}")
+                failed = batch
+
+            with self._cond:
+                self.flushes += 1
+                self.records_written += sum(len(records) for records in batch.values())
+                for key, records in failed.items():
+                    # Neupisani zapisi idu ispred novijih zapisa istog ključa
+                    self._pending[key] = records + self._pending.get(key, [])
+                    self._count += len(records)
+                    self.records_written -= len(records)
+            return not failed
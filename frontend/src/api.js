@@ -450,10 +450,15 @@ export const getCurrentSessionId = () => {
   return currentSessionId;
 };
 
-// Dohvaćanje liste sesija
-export const getSessions = async () => {
+// Dohvaćanje jedne stranice sesija (novije prvo); odgovor sadrži
+// { sessions, next }, a next se šalje kao after za sljedeću stranicu
+export const getSessions = async ({ limit = 50, after = null } = {}) => {
   try {
-    const response = await fetch(`${API_BASE_URL}/sessions`);
+    const params = new URLSearchParams({ limit: String(limit) });
+    if (after) {
+      params.set('after', after);
+    }
+    const response = await fetch(`${API_BASE_URL}/sessions?${params.toString()}`);
     
     if (!response.ok) {
       throw new Error(`API error: ${response.statusText}`);
@@ -1,13 +1,34 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useMemo, useCallback, useRef } from 'react';
 import { FaTrash, FaExternalLinkAlt, FaSearch, FaClock } from 'react-icons/fa';
-import { getAllSessions, deleteSession } from '../api';
+import { getAllSessions, getSessions, deleteSession, deleteSessionLocal } from '../api';
 import './SessionExplorer.css';
 
+// Broj sesija koje se dohvaćaju s backenda po stranici
+const PAGE_SIZE = 50;
+
+// Udaljenost od dna liste (u pikselima) na kojoj se učitava sljedeća stranica
+const LOAD_MORE_THRESHOLD = 200;
+
+// Pretvara sesiju s backenda u oblik koji koristi lista, uz lokalne metapodatke (naziv, zadnja poruka)
+const toListSession = (session, localSessions) => {
+  const local = localSessions.get(session.session_id) || {};
+  const createdAt = typeof session.created_at === 'number'
+    ? new Date(session.created_at * 1000).toISOString()
+    : session.created_at;
+  return {
+    ...local,
+    id: session.session_id,
+    timestamp: local.timestamp || createdAt,
+    messageCount: session.message_count
+  };
+};
+
 /**
  * Komponenta za prikaz i upravljanje historijom sesija
  * 
  * @param {Object} props - Props komponente
- * @param {Array} props.sessions - Lista sesija (opciono, ako nije proslijeđeno, poziva getAllSessions)
+ * @param {Array} props.sessions - Lista sesija (opciono, ako nije proslijeđeno, sesije se
+ *   učitavaju s backenda po stranicama dok korisnik skrola, novije prvo)
  * @param {Function} props.onSelectSession - Funkcija koja se poziva pri odabiru sesije
  * @param {Function} props.onDeleteSession - Funkcija koja se poziva pri brisanju sesije
  * @returns {JSX.Element} SessionExplorer komponenta
@@ -15,34 +36,68 @@ import './SessionExplorer.css';
 const SessionExplorer = ({ sessions: propSessions, onSelectSession, onDeleteSession }) => {
   const [sessions, setSessions] = useState(propSessions || []);
   const [searchTerm, setSearchTerm] = useState('');
-  const [filteredSessions, setFilteredSessions] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loading, setLoading] = useState(false);
+  const [error, setError] = useState(null);
+  const loadingRef = useRef(false);
+
+  // Lokalni metapodaci sesija (naziv, zadnja poruka) po ID-u
+  const localSessions = useMemo(
+    () => new Map(getAllSessions().map(session => [session.id, session])),
+    []
+  );
+
+  // Dohvati sljedeću stranicu sesija s backenda
+  const loadPage = useCallback(async (after = null) => {
+    if (loadingRef.current) return;
+    loadingRef.current = true;
+    setLoading(true);
+    try {
+      const page = await getSessions({ limit: PAGE_SIZE, after });
+      const pageSessions = page.sessions.map(session => toListSession(session, localSessions));
+      setSessions(prevSessions => (after ? [...prevSessions, ...pageSessions] : pageSessions));
+      setNextCursor(page.next);
+      setError(null);
+    } catch (e) {
+      setError('Greška pri učitavanju sesija.');
+    } finally {
+      loadingRef.current = false;
+      setLoading(false);
+    }
+  }, [localSessions]);
 
   // Učitaj sesije ako nisu proslijeđene kroz props
   useEffect(() => {
     if (!propSessions) {
-      setSessions(getAllSessions());
+      loadPage();
     } else {
       setSessions(propSessions);
+      setNextCursor(null);
     }
-  }, [propSessions]);
+  }, [propSessions, loadPage]);
 
-  // Filtriraj sesije pri promjeni search izraza
-  useEffect(() => {
+  // Filtriraj učitane sesije pri promjeni search izraza
+  const filteredSessions = useMemo(() => {
     if (!searchTerm.trim()) {
-      setFilteredSessions(sessions);
-    } else {
-      const term = searchTerm.toLowerCase();
-      setFilteredSessions(
-        sessions.filter(
-          session => 
-            session.id.toLowerCase().includes(term) || 
-            (session.name && session.name.toLowerCase().includes(term)) ||
-            (session.lastMessage && session.lastMessage.toLowerCase().includes(term))
-        )
-      );
+      return sessions;
     }
+    const term = searchTerm.toLowerCase();
+    return sessions.filter(
+      session => 
+        session.id.toLowerCase().includes(term) || 
+        (session.name && session.name.toLowerCase().includes(term)) ||
+        (session.lastMessage && session.lastMessage.toLowerCase().includes(term))
+    );
   }, [searchTerm, sessions]);
 
+  // Učitaj sljedeću stranicu kada se lista skrola blizu dna
+  const handleScroll = (e) => {
+    const { scrollTop, scrollHeight, clientHeight } = e.currentTarget;
+    if (nextCursor && scrollHeight - scrollTop - clientHeight < LOAD_MORE_THRESHOLD) {
+      loadPage(nextCursor);
+    }
+  };
+
   // Formatiraj timestamp u čitljivi datum
   const formatDate = (timestamp) => {
     if (!timestamp) return 'Nepoznato vrijeme';
@@ -62,13 +117,18 @@ const SessionExplorer = ({ sessions: propSessions, onSelectSession, onDeleteSess
   };
 
   // Hendlaj brisanje sesije
-  const handleDeleteSession = (sessionId, e) => {
+  const handleDeleteSession = async (sessionId, e) => {
     e.stopPropagation();
     if (window.confirm('Da li ste sigurni da želite obrisati ovu sesiju?')) {
-      const success = deleteSession(sessionId);
-      if (success) {
+      try {
+        if (!propSessions) {
+          await deleteSession(sessionId);
+        }
+        deleteSessionLocal(sessionId);
         setSessions(prevSessions => prevSessions.filter(s => s.id !== sessionId));
         if (onDeleteSession) onDeleteSession(sessionId);
+      } catch (err) {
+        setError('Greška pri brisanju sesije.');
       }
     }
   };
@@ -94,12 +154,15 @@ const SessionExplorer = ({ sessions: propSessions, onSelectSession, onDeleteSess
         </div>
       </div>
 
-      <div className="sessions-list">
+      <div className="sessions-list" onScroll={handleScroll}>
+        {error && <div className="sessions-error">{error}</div>}
         {filteredSessions.length === 0 ? (
           <div className="no-sessions">
-            {searchTerm.trim() 
-              ? 'Nema rezultata za vašu pretragu.' 
-              : 'Nema dostupnih sesija.'}
+            {loading
+              ? 'Učitavanje sesija...'
+              : searchTerm.trim() 
+                ? 'Nema rezultata za vašu pretragu.' 
+                : 'Nema dostupnih sesija.'}
           </div>
         ) : (
           filteredSessions.map(session => (
@@ -121,6 +184,9 @@ const SessionExplorer = ({ sessions: propSessions, onSelectSession, onDeleteSess
                 {session.lastMessage && (
                   <div className="session-message">{session.lastMessage}</div>
                 )}
+                {session.messageCount !== undefined && (
+                  <div className="session-id">Poruka: {session.messageCount}</div>
+                )}
               </div>
               
               <div className="session-actions">
@@ -142,6 +208,15 @@ const SessionExplorer = ({ sessions: propSessions, onSelectSession, onDeleteSess
             </div>
           ))
         )}
+        {nextCursor && (
+          <button
+            className="sessions-load-more"
+            onClick={() => loadPage(nextCursor)}
+            disabled={loading}
+          >
+            {loading ? 'Učitavanje...' : 'Učitaj još'}
+          </button>
+        )}
       </div>
     </div>
   );